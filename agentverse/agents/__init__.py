@@ -3,5 +3,5 @@ from agentverse.registry import Registry
 
 agent_registry = Registry(name="AgentRegistry")
 
-from .base import BaseAgent
+from .base import BaseAgent, BatchStep
 # from .conversation_agent_v2 import UserAgent, RecAgent, ItemAgent
@@ -1,12 +1,15 @@
+import inspect
 import logging
 from logging import getLogger
 from abc import abstractmethod, ABC
-from typing import List, NamedTuple, Set, Union
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Union
 from pydantic import BaseModel, Field
 from agentverse.llms import BaseLLM
 from agentverse.memory import BaseMemory
 from agentverse.message import Message
 from agentverse.parser import OutputParser
+from agentverse.profiling import profiled
+from agentverse.agents.reask import Correction, ReaskResult, aparse_with_reask, parse_with_reask
 
 class BaseAgent(BaseModel, ABC):
     llm: BaseLLM
@@ -15,6 +18,15 @@ class BaseAgent(BaseModel, ABC):
     max_retry: int = Field(default=3)
     agent_mode: str = Field(default='user')
     async_mode: bool = Field(default=True)
+
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs):
+        super().__pydantic_init_subclass__(**kwargs)
+        # 具体 agent 的 step / astep 自动计入 profiler
+        for name in ("step", "astep"):
+            attr = vars(cls).get(name)
+            if inspect.isfunction(attr) and not getattr(attr, "__profiled__", False):
+                setattr(cls, name, profiled(f"agent.{cls.__name__}.{name}")(attr))
     
     @abstractmethod
     def step(self, env_description: str = "") -> Message:
@@ -26,6 +38,36 @@ class BaseAgent(BaseModel, ABC):
         """Asynchronous version of step"""
         pass
     
+    def get_state(self) -> Dict[str, Any]:
+        """除 llm 与 output_parser 外的全部字段，ShardedRunner 在 epoch 边界据此把状态合并回主进程"""
+        return {name: getattr(self, name) for name in type(self).model_fields if name not in ("llm", "output_parser")}
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        for name, value in state.items():
+            current = getattr(self, name, None)
+            # pickle 过的记忆不带 llm / embedder，沿用当前记忆上的
+            if isinstance(value, BaseMemory) and isinstance(current, BaseMemory):
+                value.adopt_handles(current)
+            setattr(self, name, value)
+
+    def generate_and_parse(
+        self, prompts: Sequence[str], method: str = "parse", correction: Correction = None
+    ) -> ReaskResult:
+        """调用 llm 并用 output_parser 解析，格式错误的输出最多重问 max_retry 次"""
+        return parse_with_reask(self.llm, self.output_parser, prompts, method, self.max_retry, correction)
+
+    async def agenerate_and_parse(
+        self,
+        prompts: Sequence[str],
+        method: str = "parse",
+        correction: Correction = None,
+        max_concurrency: Optional[int] = None,
+    ) -> ReaskResult:
+        """异步版本，每轮重问合成一批发送"""
+        return await aparse_with_reask(
+            self.llm, self.output_parser, prompts, method, self.max_retry, correction, max_concurrency
+        )
+
     @abstractmethod
     def reset(self) -> None:
         """Reset the agent"""
@@ -70,4 +112,26 @@ class BaseAgent(BaseModel, ABC):
         else:
             raise ValueError(
                 "input argument `receiver` must be a string or a set of string"
-            )
\ No newline at end of file
+            )
+
+
+class BatchStep(ABC):
+    """
+    可合批的单步：StepScheduler 只对继承了它的 agent 调用 prepare_prompt，
+    两个钩子必须一起实现（缺一个时 agent 无法实例化）。
+
+        class UserAgent(BaseAgent, BatchStep):
+            def prepare_prompt(self, env_description=""): ...
+            def finish_step(self, env_description, parsed): ...
+    """
+
+    @abstractmethod
+    def prepare_prompt(self, env_description: str = "") -> Optional[str]:
+        """
+        返回本步要发送的 prompt，交给调度器与同一 LLM、同一解析器的 prompt 合批发送，
+        解析结果随后交给 finish_step()。返回 None 时这一步改为调用 astep。
+        """
+
+    @abstractmethod
+    def finish_step(self, env_description: str, parsed: Any) -> Message:
+        """由 output_parser 的解析结果生成本步的 Message"""
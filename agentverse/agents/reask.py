@@ -0,0 +1,135 @@
+"""
+解析失败重问：模型输出格式不对（OutputParserError）时，只把失败的 prompt 重新发送，
+可选在末尾追加格式纠正提示，最多重问 max_retry 次。每一轮的重问合成一批，
+异步路径走 LLM 的批量接口。上游调用本身失败（异常）不重问，交给 LLM 层的重试。
+
+    result = await aparse_with_reask(llm, RecommenderParser(), prompts, max_retry=3,
+                                     correction=RECOMMENDER_CORRECTION)
+    for idx in result.failed:
+        ...
+"""
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Union
+
+from agentverse.llms.base import BaseLLM, LLMResult, abatch_generate
+from agentverse.llms.telemetry import MetricsCollector, llm_metrics
+from agentverse.parser import BatchParseResult, OutputParser, OutputParserError
+
+# 纠正提示：字符串直接追加；函数则根据这次的解析错误生成
+Correction = Union[str, Callable[[OutputParserError], str], None]
+# 所有 prompt 共用一个重问上限，或与 prompts 等长、逐条指定
+MaxRetry = Union[int, Sequence[int]]
+
+RECOMMENDER_CORRECTION = (
+    "\n\nYour previous answer could not be parsed. Answer strictly in the format:\n"
+    "Choice: <your choice>\nExplanation: <your explanation>"
+)
+
+
+class ReaskResult(NamedTuple):
+    """与 prompts 按下标对齐；attempts 为每条实际发送的次数"""
+    values: List[Any]
+    errors: List[Optional[BaseException]]
+    attempts: List[int]
+
+    @property
+    def failed(self) -> List[int]:
+        return [idx for idx, error in enumerate(self.errors) if error is not None]
+
+
+class _Reask:
+    """同步与异步共用的状态：哪些下标还需要重发，以及重发时用的 prompt"""
+
+    def __init__(self, parser: OutputParser, prompts: Sequence[str], method: str, max_retry: MaxRetry,
+                 correction: Correction, metrics: MetricsCollector):
+        self.parser = parser
+        self.prompts = list(prompts)
+        if isinstance(max_retry, int):
+            self.max_retry = [max_retry] * len(self.prompts)
+        else:
+            self.max_retry = list(max_retry)
+            if len(self.max_retry) != len(self.prompts):
+                raise ValueError("max_retry 的长度必须与 prompts 一致")
+        self.method = method
+        self.correction = correction
+        self.metrics = metrics
+        self.values: List[Any] = [None] * len(self.prompts)
+        self.errors: List[Optional[BaseException]] = [None] * len(self.prompts)
+        self.attempts = [0] * len(self.prompts)
+        self.pending = list(range(len(self.prompts)))
+        self.outgoing = list(self.prompts)
+
+    def batch(self) -> List[str]:
+        return [self.outgoing[idx] for idx in self.pending]
+
+    def settle(self, attempt: int, outputs: Sequence[Union[LLMResult, BaseException]]):
+        parsed: BatchParseResult = self.parser.parse_batch(outputs, method=self.method)
+        retry, failures = [], 0
+        for idx, value, error in zip(self.pending, parsed.values, parsed.errors):
+            self.attempts[idx] += 1
+            self.values[idx] = value
+            self.errors[idx] = error
+            if isinstance(error, OutputParserError):
+                failures += 1
+                # 每条 prompt 按自己的 max_retry 决定是否还能重问
+                if self.attempts[idx] <= self.max_retry[idx]:
+                    retry.append(idx)
+                    self.outgoing[idx] = self.prompts[idx] + self._suffix(error)
+        self.metrics.record_parse(
+            type(self.parser).__name__, self.method, attempt,
+            total=len(self.pending), failures=failures,
+        )
+        self.pending = retry
+
+    def _suffix(self, error: OutputParserError) -> str:
+        if self.correction is None:
+            return ""
+        if callable(self.correction):
+            return self.correction(error)
+        return self.correction
+
+    def result(self) -> ReaskResult:
+        return ReaskResult(self.values, self.errors, self.attempts)
+
+
+def _generate(llm: BaseLLM, prompt: str) -> Union[LLMResult, Exception]:
+    try:
+        return llm.generate_response(prompt)
+    except Exception as e:
+        return e
+
+
+def parse_with_reask(
+    llm: BaseLLM,
+    parser: OutputParser,
+    prompts: Sequence[str],
+    method: str = "parse",
+    max_retry: MaxRetry = 3,
+    correction: Correction = None,
+    metrics: Optional[MetricsCollector] = None,
+) -> ReaskResult:
+    """逐条调用 llm.generate_response；解析失败的 prompt 最多再发送 max_retry 次"""
+    state = _Reask(parser, prompts, method, max_retry, correction, llm_metrics if metrics is None else metrics)
+    attempt = 0
+    while state.pending:
+        state.settle(attempt, [_generate(llm, prompt) for prompt in state.batch()])
+        attempt += 1
+    return state.result()
+
+
+async def aparse_with_reask(
+    llm: BaseLLM,
+    parser: OutputParser,
+    prompts: Sequence[str],
+    method: str = "parse",
+    max_retry: MaxRetry = 3,
+    correction: Correction = None,
+    max_concurrency: Optional[int] = None,
+    metrics: Optional[MetricsCollector] = None,
+) -> ReaskResult:
+    """异步版本：每一轮把所有待发送的 prompt 作为一批发出"""
+    state = _Reask(parser, prompts, method, max_retry, correction, llm_metrics if metrics is None else metrics)
+    attempt = 0
+    while state.pending:
+        state.settle(attempt, await abatch_generate(llm, state.batch(), max_concurrency))
+        attempt += 1
+    return state.result()
@@ -0,0 +1,185 @@
+"""
+并发调度一群 agent 的单步：AgentCF 的前向 / 反向要在成百上千个 user-item 对上各走一步。
+
+- 同时在途的 LLM 请求受两级限制：每个 LLM 实例按 llm_concurrency() 得到的上限，
+  以及可选的全局 max_concurrency
+- 继承了 BatchStep 的 agent 不调用 astep：同一 LLM、同一解析器实例的 prompt 合成一组，
+  每一轮作为一次批量调用发出，整组用 parse_batch 解析，格式错误的按各自的 max_retry
+  只重发失败项（见 reask.py），再交给 finish_step() 生成 Message
+- 其余 agent 直接调用 astep（async_mode=False 的在线程里调用 step）
+- 返回的 Message 与传入的 agents 按下标对齐，与完成先后无关
+
+    scheduler = StepScheduler(max_concurrency=64)
+    messages = await scheduler.astep(user_agents + item_agents, env_description)
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from agentverse.agents.base import BaseAgent, BatchStep
+from agentverse.agents.reask import Correction, aparse_with_reask
+from agentverse.llms.base import BaseLLM, abatch_generate
+from agentverse.message import Message
+
+# LLM 没有声明 max_concurrency 时的默认上限
+DEFAULT_CONCURRENCY = 32
+
+
+def llm_concurrency(llm: BaseLLM) -> int:
+    """
+    单个 LLM 实例允许同时在途的请求数：取 max_concurrency，配置了 RPM 时不超过
+    每分钟可发出的请求数（多 key 时按 key 数放大），更多的协程只会在限流器上排队。
+    """
+    limit = getattr(llm, "max_concurrency", None) or DEFAULT_CONCURRENCY
+    pool = getattr(llm, "pool", None)
+    rpm = getattr(pool, "rpm", None)
+    if rpm:
+        keys = len(pool.api_key_list) if getattr(pool, "multi_key", False) else 1
+        limit = min(limit, rpm * keys)
+    return max(1, limit)
+
+
+class _Limits:
+    """一次调度内共享的信号量：先占 LLM 自己的名额，再占全局名额"""
+
+    def __init__(self, llms: Sequence[BaseLLM], max_concurrency: Optional[int]):
+        self._capacity: Dict[int, int] = {id(llm): llm_concurrency(llm) for llm in llms}
+        self._per_llm: Dict[int, asyncio.Semaphore] = {
+            key: asyncio.Semaphore(limit) for key, limit in self._capacity.items()
+        }
+        self._max_concurrency = max_concurrency
+        self._total = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        # 一次占多个名额时逐个获取；串行化获取过程，避免两组各占一部分后互相等待
+        self._acquiring = asyncio.Lock()
+
+    def capacity(self, llm: BaseLLM) -> int:
+        limit = self._capacity[id(llm)]
+        return min(limit, self._max_concurrency) if self._max_concurrency else limit
+
+    @asynccontextmanager
+    async def slot(self, llm: BaseLLM, n: int = 1):
+        """占 n 个名额（不超过 capacity），产出实际占到的个数"""
+        n = max(1, min(n, self.capacity(llm)))
+        semaphores = [self._per_llm[id(llm)]] + ([self._total] if self._total is not None else [])
+        acquired: List[asyncio.Semaphore] = []
+        try:
+            async with self._acquiring:
+                for semaphore in semaphores:
+                    for _ in range(n):
+                        await semaphore.acquire()
+                        acquired.append(semaphore)
+            yield n
+        finally:
+            for semaphore in acquired:
+                semaphore.release()
+
+
+class _LimitedLLM:
+    """给 aparse_with_reask 用的批量接口：每一轮整组一次批量调用，同时在途数不超过占到的名额"""
+
+    def __init__(self, llm: BaseLLM, limits: _Limits):
+        self.llm = llm
+        self.limits = limits
+
+    async def abatch_generate_response(self, prompts: Sequence[str], max_concurrency: Optional[int] = None):
+        async with self.limits.slot(self.llm, len(prompts)) as n:
+            return await abatch_generate(self.llm, prompts, n)
+
+
+class StepScheduler:
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        correction: Correction = None,
+        method: str = "parse",
+    ):
+        self.max_concurrency = max_concurrency
+        self.correction = correction
+        self.method = method
+
+    def step(
+        self,
+        agents: Sequence[BaseAgent],
+        env_description: Union[str, Sequence[str]] = "",
+        return_exceptions: bool = False,
+    ) -> List[Union[Message, BaseException]]:
+        return asyncio.run(self.astep(agents, env_description, return_exceptions))
+
+    async def astep(
+        self,
+        agents: Sequence[BaseAgent],
+        env_description: Union[str, Sequence[str]] = "",
+        return_exceptions: bool = False,
+    ) -> List[Union[Message, BaseException]]:
+        """
+        env_description 可以是所有 agent 共用的一个字符串，也可以与 agents 等长。
+        某个 agent 失败不影响其它 agent；全部结束后，return_exceptions=False 时
+        抛出下标最小的那个异常，否则异常对象留在对应位置。
+        """
+        if isinstance(env_description, str):
+            envs = [env_description] * len(agents)
+        else:
+            envs = list(env_description)
+            if len(envs) != len(agents):
+                raise ValueError("env_description 的长度必须与 agents 一致")
+
+        llms = list({id(agent.llm): agent.llm for agent in agents}.values())
+        limits = _Limits(llms, self.max_concurrency)
+        results: List[Any] = [None] * len(agents)
+
+        groups: Dict[Tuple[int, int], List[Tuple[int, str]]] = {}
+        singles: List[int] = []
+        for idx, agent in enumerate(agents):
+            prompt = agent.prepare_prompt(envs[idx]) if isinstance(agent, BatchStep) else None
+            if prompt is None:
+                singles.append(idx)
+            else:
+                # 同一个解析器实例才能合组：整组用它解析
+                groups.setdefault((id(agent.llm), id(agent.output_parser)), []).append((idx, prompt))
+
+        async def run_single(idx: int):
+            agent = agents[idx]
+            try:
+                async with limits.slot(agent.llm):
+                    if agent.async_mode:
+                        results[idx] = await agent.astep(envs[idx])
+                    else:
+                        results[idx] = await asyncio.to_thread(agent.step, envs[idx])
+            except Exception as e:
+                results[idx] = e
+
+        async def run_group(members: List[Tuple[int, str]]):
+            first = agents[members[0][0]]
+            try:
+                parsed = await aparse_with_reask(
+                    _LimitedLLM(first.llm, limits),
+                    first.output_parser,
+                    [prompt for _, prompt in members],
+                    method=self.method,
+                    max_retry=[agents[idx].max_retry for idx, _ in members],
+                    correction=self.correction,
+                    metrics=getattr(first.llm, "metrics", None),
+                )
+            except Exception as e:
+                # 整组失败只记在本组的 agent 上，不影响其它组
+                for idx, _ in members:
+                    results[idx] = e
+                return
+            for (idx, _), value, error in zip(members, parsed.values, parsed.errors):
+                if error is not None:
+                    results[idx] = error
+                    continue
+                try:
+                    results[idx] = agents[idx].finish_step(envs[idx], value)
+                except Exception as e:
+                    results[idx] = e
+
+        await asyncio.gather(
+            *(run_group(members) for members in groups.values()),
+            *(run_single(idx) for idx in singles),
+        )
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+        return results
@@ -0,0 +1,263 @@
+"""
+把 agent 群体分到多个工作进程上：asyncio 只能并发网络等待，解析、prompt 模板与
+memory 摘要等 CPU 工作仍在一个核上，按进程分片后才能用满多核。
+
+- 每个分片是一个常驻进程，启动时通过 agent_registry / llm_registry / output_parser_registry
+  构建自己那部分 agent；同一份 LLM 配置在进程内只构建一次，因此每个进程有自己的 OpenAIClientPool
+- LLM 配置中的 rpm / tpm / max_concurrency 按分片数均分，所有进程合计不超过全局预算
+- 每一步在各分片内用 StepScheduler 并发执行，结果按 specs 的下标拼回
+- agent 状态留在工作进程里，epoch 边界调用 end_epoch() 收回主进程；load_states() 把状态下发给所在分片
+
+    specs = [AgentSpec(agent_type="recagent", llm={"llm_type": "gpt-4", "api_key_list": keys, "rpm": 3500},
+                       output_parser="recommender", kwargs={...}), ...]
+    with ShardedRunner(specs, processes=32) as runner:
+        for epoch in range(epochs):
+            messages = runner.step(env_descriptions)
+            states = runner.end_epoch()
+
+使用 spawn 启动方式时，工作进程不会继承主进程里已注册的类，需要在 imports 中列出注册它们的模块。
+"""
+import asyncio
+import importlib
+import json
+import multiprocessing
+import os
+import pickle
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from pydantic import BaseModel, Field
+
+from agentverse.agents import agent_registry
+from agentverse.agents.base import BaseAgent
+from agentverse.agents.scheduler import StepScheduler
+from agentverse.llms import llm_registry
+from agentverse.message import Message
+from agentverse.parser import output_parser_registry
+
+# 按分片数均分的 LLM 配置项
+BUDGET_KEYS = ("rpm", "tpm", "max_concurrency")
+
+
+class AgentSpec(BaseModel):
+    agent_type: str
+    # llm_type 为 llm_registry 中的名称，其余为构造参数
+    llm: Dict[str, Any]
+    output_parser: str
+    kwargs: Dict[str, Any] = Field(default_factory=dict)
+
+
+def split_budget(llm_config: Dict[str, Any], shards: int) -> Dict[str, Any]:
+    """每个分片拿到的 LLM 配置：全局预算按分片数均分，至少为 1"""
+    config = dict(llm_config)
+    for key in BUDGET_KEYS:
+        if config.get(key):
+            config[key] = max(1, config[key] // shards)
+    return config
+
+
+def _portable(result: Any) -> Any:
+    # OpenAI 的异常对象带着 httpx 响应，不一定能 pickle，退化为 RuntimeError
+    if isinstance(result, BaseException):
+        try:
+            pickle.dumps(result)
+        except Exception:
+            return RuntimeError(f"{type(result).__name__}: {result}")
+    return result
+
+
+def _build_agents(specs: Sequence[AgentSpec], shards: int) -> Tuple[List[BaseAgent], List[Any]]:
+    llms: Dict[str, Any] = {}
+    agents = []
+    for spec in specs:
+        llm_key = json.dumps(spec.llm, sort_keys=True, default=str)
+        if llm_key not in llms:
+            config = split_budget(spec.llm, shards)
+            llms[llm_key] = llm_registry.build(config.pop("llm_type"), **config)
+        agents.append(agent_registry.build(
+            spec.agent_type,
+            llm=llms[llm_key],
+            output_parser=output_parser_registry.build(spec.output_parser),
+            **spec.kwargs,
+        ))
+    return agents, list(llms.values())
+
+
+def _shard_main(conn, specs: List[AgentSpec], shards: int, imports: Sequence[str], max_concurrency: Optional[int]):
+    try:
+        for module in imports:
+            importlib.import_module(module)
+        agents, llms = _build_agents(specs, shards)
+    except Exception as e:
+        conn.send(("error", _portable(e)))
+        return
+    conn.send(("ok", None))
+
+    scheduler = StepScheduler(max_concurrency=max_concurrency)
+    # 整个进程复用一个事件循环，异步客户端的连接池可以跨步复用
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            command, arg = conn.recv()
+            try:
+                if command == "step":
+                    results = loop.run_until_complete(scheduler.astep(agents, arg, return_exceptions=True))
+                    reply = [_portable(r) for r in results]
+                elif command == "get_state":
+                    reply = [agent.get_state() for agent in agents]
+                elif command == "load_state":
+                    for local_idx, state in arg:
+                        agents[local_idx].load_state(state)
+                    reply = None
+                elif command == "close":
+                    # 主进程发出 close 后不再发命令：每个 LLM 单独关闭，只回复一次后退出
+                    error = None
+                    for llm in llms:
+                        try:
+                            if hasattr(llm, "aclose"):
+                                loop.run_until_complete(llm.aclose())
+                            elif hasattr(llm, "close"):
+                                llm.close()
+                        except Exception as e:
+                            error = error or e
+                    conn.send(("ok", None) if error is None else ("error", _portable(error)))
+                    return
+                else:
+                    raise ValueError(f"unknown command {command!r}")
+                # 回复不能 pickle 时 send 在写管道之前就会抛出，此时改为回复错误，进程继续服务
+                conn.send(("ok", reply))
+            except Exception as e:
+                conn.send(("error", _portable(e)))
+    finally:
+        loop.close()
+        conn.close()
+
+
+class ShardedRunner:
+    def __init__(
+        self,
+        specs: Sequence[AgentSpec],
+        processes: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        imports: Sequence[str] = (),
+        start_method: Optional[str] = None,
+    ):
+        """
+        specs 按轮转方式分到 processes 个进程（默认 CPU 核数，不超过 agent 数）；
+        max_concurrency 为全局在途请求上限，同样按进程数均分。
+        """
+        if not specs:
+            raise ValueError("specs 不能为空")
+        self.specs = list(specs)
+        shards = max(1, min(processes or os.cpu_count() or 1, len(self.specs)))
+        # 轮转分配，user / item agent 交错排列时各分片负载也大致均衡
+        self.assignment: List[List[int]] = [list(range(s, len(self.specs), shards)) for s in range(shards)]
+        self.epoch = 0
+        self.states: List[Optional[Dict[str, Any]]] = [None] * len(self.specs)
+
+        ctx = multiprocessing.get_context(start_method)
+        shard_limit = max(1, max_concurrency // shards) if max_concurrency else None
+        self._conns = []
+        self._procs = []
+        for indices in self.assignment:
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(
+                target=_shard_main,
+                args=(child, [self.specs[i] for i in indices], shards, list(imports), shard_limit),
+                daemon=True,
+            )
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        try:
+            for conn in self._conns:
+                self._receive(conn)
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def shards(self) -> int:
+        return len(self.assignment)
+
+    @staticmethod
+    def _receive(conn) -> Any:
+        status, payload = conn.recv()
+        if status == "error":
+            raise payload
+        return payload
+
+    def _call(self, commands: List[Tuple[str, Any]]) -> List[Any]:
+        # 先全部发出再逐个接收，各分片并行执行
+        for conn, command in zip(self._conns, commands):
+            conn.send(command)
+        replies, error = [], None
+        for conn in self._conns:
+            try:
+                replies.append(self._receive(conn))
+            except Exception as e:
+                replies.append(None)
+                error = error or e
+        if error is not None:
+            raise error
+        return replies
+
+    def step(
+        self,
+        env_description: Union[str, Sequence[str]] = "",
+        return_exceptions: bool = False,
+    ) -> List[Union[Message, BaseException]]:
+        """每个 agent 走一步，返回与 specs 按下标对齐的 Message"""
+        if isinstance(env_description, str):
+            commands = [("step", env_description)] * self.shards
+        else:
+            envs = list(env_description)
+            if len(envs) != len(self.specs):
+                raise ValueError("env_description 的长度必须与 specs 一致")
+            commands = [("step", [envs[i] for i in indices]) for indices in self.assignment]
+        results: List[Any] = [None] * len(self.specs)
+        for indices, replies in zip(self.assignment, self._call(commands)):
+            for idx, reply in zip(indices, replies):
+                results[idx] = reply
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+        return results
+
+    def end_epoch(self) -> List[Dict[str, Any]]:
+        """epoch 边界：收回所有 agent 的状态，结果与 specs 按下标对齐"""
+        for indices, states in zip(self.assignment, self._call([("get_state", None)] * self.shards)):
+            for idx, state in zip(indices, states):
+                self.states[idx] = state
+        self.epoch += 1
+        return list(self.states)
+
+    def load_states(self, states: Dict[int, Dict[str, Any]]):
+        """把 {specs 下标: 状态} 下发到对应分片，例如把主进程合并后的 item 描述同步给所有分片"""
+        per_shard: List[List[Tuple[int, Dict[str, Any]]]] = [[] for _ in range(self.shards)]
+        for idx, state in states.items():
+            shard = idx % self.shards
+            per_shard[shard].append((idx // self.shards, state))
+            self.states[idx] = {**(self.states[idx] or {}), **state}
+        self._call([("load_state", batch) for batch in per_shard])
+
+    def close(self):
+        for conn, proc in zip(self._conns, self._procs):
+            if proc.is_alive():
+                try:
+                    conn.send(("close", None))
+                    conn.recv()
+                except (EOFError, OSError):
+                    pass
+            conn.close()
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        self._conns, self._procs = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,217 @@
+"""
+按需分页的 agent 仓库：每个用户一个 user agent、每个物品一个 item agent 时，
+全部常驻内存无法扩展到百万级目录。AgentStore 只在内存里保留最近使用的 capacity 个 agent（LRU），
+被换出的 agent 把 get_state()（prompt 字段、memory 内容、receiver 等，不含共享的 llm /
+output_parser，memory 里的 llm / embedder 也不落盘）pickle 后用 zlib 压缩，存进目录下的
+agents.sqlite，再次访问时用 factory 新建一个 agent 并 load_state() 恢复，共享句柄沿用 factory 注入的。
+
+    store = AgentStore(directory, capacity=10000,
+                       factory=lambda key: agent_registry.build("recagent", llm=llm, output_parser=parser, ...))
+    with store.checkout(batch_keys) as agents:
+        messages = await StepScheduler().astep(agents, env)
+    print(store.stats())
+
+checkout() 期间 agent 被钉住，不会在使用中被换出；换入 / 换出次数由 stats() 返回，
+同时计入 metrics（默认 llm_metrics），用于确定 capacity。
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Collection, Dict, Iterator, List, Optional, Sequence
+
+from agentverse.agents.base import BaseAgent
+from agentverse.llms.telemetry import MetricsCollector, llm_metrics
+
+
+class AgentStore:
+    def __init__(
+        self,
+        directory: str,
+        capacity: int,
+        factory: Callable[[str], BaseAgent],
+        name: str = "agents",
+        compress_level: int = 1,
+        metrics: Optional[MetricsCollector] = llm_metrics,
+    ):
+        if capacity < 1:
+            raise ValueError("capacity 至少为 1")
+        os.makedirs(directory, exist_ok=True)
+        self.capacity = capacity
+        self.factory = factory
+        self.name = name
+        self.compress_level = compress_level
+        self.metrics = metrics
+
+        self._lock = threading.RLock()
+        self._resident: "OrderedDict[str, BaseAgent]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._counts = {"hits": 0, "page_ins": 0, "page_outs": 0, "created": 0}
+
+        self.path = os.path.join(directory, f"{name}.sqlite")
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS agents (key TEXT PRIMARY KEY, state BLOB NOT NULL)")
+
+    # ------------------------------------------------------------------
+    # 序列化
+    # ------------------------------------------------------------------
+
+    def _dump(self, agent: BaseAgent) -> bytes:
+        return zlib.compress(pickle.dumps(agent.get_state(), protocol=pickle.HIGHEST_PROTOCOL), self.compress_level)
+
+    @staticmethod
+    def _load(blob: bytes) -> dict:
+        return pickle.loads(zlib.decompress(blob))
+
+    def _count(self, name: str, n: int = 1):
+        self._counts[name] += n
+        if self.metrics is not None:
+            self.metrics.inc(f"agent_store_{name}_total", n, store=self.name)
+
+    # ------------------------------------------------------------------
+    # 换入 / 换出
+    # ------------------------------------------------------------------
+
+    def _page_out(self, items: Sequence[tuple]):
+        if not items:
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO agents (key, state) VALUES (?, ?)",
+            [(key, self._dump(agent)) for key, agent in items],
+        )
+        self._count("page_outs", len(items))
+
+    def _evict(self, keep: Collection[str] = ()):
+        """换出最久未使用、且没有被钉住（也不在 keep 中）的 agent，直到不超过 capacity"""
+        overflow = len(self._resident) - self.capacity
+        if overflow <= 0:
+            return
+        victims = []
+        for key in self._resident:
+            if len(victims) == overflow:
+                break
+            if not self._pins.get(key) and key not in keep:
+                victims.append(key)
+        self._page_out([(key, self._resident[key]) for key in victims])
+        for key in victims:
+            del self._resident[key]
+
+    def _fetch(self, keys: List[str]) -> Dict[str, bytes]:
+        blobs = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT key, state FROM agents WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            blobs.update(rows)
+        return blobs
+
+    def get_many(self, keys: Sequence[str]) -> List[BaseAgent]:
+        """
+        按 keys 返回 agent；不在内存的从磁盘一次批量换入，磁盘上也没有的由 factory 新建。
+        未钉住的 key 不能超过 capacity，否则返回的 agent 会被立即换出、之后的修改丢失；
+        更大的批次请用 checkout()。
+        """
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            unpinned = sum(1 for key in unique if not self._pins.get(key))
+            if unpinned > self.capacity:
+                raise ValueError(
+                    f"一次最多取 {self.capacity} 个未钉住的 agent（收到 {unpinned} 个），更大的批次请用 checkout()"
+                )
+            missing = [key for key in unique if key not in self._resident]
+            blobs = self._fetch(missing) if missing else {}
+            for key in missing:
+                agent = self.factory(key)
+                if key in blobs:
+                    agent.load_state(self._load(blobs[key]))
+                    self._count("page_ins")
+                else:
+                    self._count("created")
+                self._resident[key] = agent
+            self._count("hits", len(unique) - len(missing))
+            for key in unique:
+                self._resident.move_to_end(key)
+            agents = [self._resident[key] for key in keys]
+            # 本次要返回的 agent 不换出；被其它 checkout 钉住的 agent 多时可暂时超过 capacity
+            self._evict(keep=set(unique))
+            return agents
+
+    def get(self, key: str) -> BaseAgent:
+        return self.get_many([key])[0]
+
+    __getitem__ = get
+
+    def put(self, key: str, agent: BaseAgent):
+        with self._lock:
+            self._resident[key] = agent
+            self._resident.move_to_end(key)
+            self._evict()
+
+    @contextmanager
+    def checkout(self, keys: Sequence[str]) -> Iterator[List[BaseAgent]]:
+        """取出一批 agent 并在 with 块内钉住，避免使用中被换出导致更新丢失"""
+        with self._lock:
+            for key in keys:
+                self._pins[key] = self._pins.get(key, 0) + 1
+            try:
+                agents = self.get_many(keys)
+            except BaseException:
+                self._unpin(keys)
+                raise
+        try:
+            yield agents
+        finally:
+            with self._lock:
+                self._unpin(keys)
+                self._evict()
+
+    def _unpin(self, keys: Sequence[str]):
+        for key in keys:
+            left = self._pins[key] - 1
+            if left:
+                self._pins[key] = left
+            else:
+                del self._pins[key]
+
+    # ------------------------------------------------------------------
+    # 其它
+    # ------------------------------------------------------------------
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._resident:
+                return True
+            return self._conn.execute("SELECT 1 FROM agents WHERE key = ?", (key,)).fetchone() is not None
+
+    @property
+    def resident(self) -> int:
+        return len(self._resident)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counts, "resident": len(self._resident), "pinned": len(self._pins)}
+
+    def flush(self):
+        """把内存中的 agent 全部写到磁盘（不换出），例如在 epoch 边界做检查点"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO agents (key, state) VALUES (?, ?)",
+                [(key, self._dump(agent)) for key, agent in self._resident.items()],
+            )
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._resident.clear()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,315 @@
+"""
+基于倒排文件（IVF）的近似最近邻索引，纯 numpy 实现
+
+- train()：对（归一化后的）向量做球面 k-means，得到 n_lists 个聚类中心
+- add()：增量插入；同一个 id 再次插入会覆盖旧向量（item agent 改写描述后重新 embedding）
+- compact()：丢掉被删除 / 覆盖的旧行；死行比例超过 compact_threshold 时自动执行
+- search()：每个 query 只扫描最相近的 nprobe 个倒排列表
+  nprobe 就是 recall / 延迟的权衡旋钮：nprobe = n_lists 时等价于精确搜索
+- evaluate_recall()：用精确 top-k 作为基准，报告不同 nprobe 下的 recall 与延迟
+- save() / load()：npz 格式落盘
+
+未 train 之前 search 退化为精确扫描，因此小规模 item 集合可以直接使用。
+"""
+from __future__ import annotations
+
+import time
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agentverse.embedding_utils import normalize, top_k_nearest_neighbors, _top_k_rows
+
+
+class IVFIndex:
+    def __init__(
+        self,
+        dim: int,
+        n_lists: int = 64,
+        nprobe: int = 8,
+        kmeans_iters: int = 10,
+        seed: int = 0,
+        compact_threshold: Optional[float] = 0.5,
+    ):
+        self.dim = dim
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        # 死行占已用行的比例超过该值时自动 compact，None 表示只能手动调用
+        self.compact_threshold = compact_threshold
+
+        self.centroids: Optional[np.ndarray] = None
+        # 行存储：向量按插入顺序追加，容量不足时倍增
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._size = 0
+        self._ids: List[Hashable] = []
+        self._assign = np.empty(0, dtype=np.int64)
+        self._alive = np.empty(0, dtype=bool)
+        self._row_of: Dict[Hashable, int] = {}
+        # 倒排列表：列表编号 -> 行号；_list_cache 为其 numpy 形式，变更后失效
+        self._lists: List[List[int]] = []
+        self._list_cache: Dict[int, np.ndarray] = {}
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    # ------------------------------------------------------------------
+    # 构建
+    # ------------------------------------------------------------------
+
+    def train(self, vectors: np.ndarray, sample_size: int = 50000):
+        """球面 k-means 训练聚类中心；已有向量会被重新分配到新的倒排列表"""
+        data = normalize(vectors)
+        rng = np.random.default_rng(self.seed)
+        if len(data) > sample_size:
+            data = data[rng.choice(len(data), sample_size, replace=False)]
+        n_lists = min(self.n_lists, len(data))
+        centroids = data[rng.choice(len(data), n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            counts = np.bincount(assign, minlength=n_lists)
+            # 空簇保留原中心
+            filled = counts > 0
+            centroids[filled] = sums[filled]
+            centroids = normalize(centroids)
+        self.centroids = centroids
+        self._rebuild_lists()
+
+    def _rebuild_lists(self):
+        self._lists = [[] for _ in range(len(self.centroids))]
+        self._list_cache = {}
+        rows = np.flatnonzero(self._alive[:self._size])
+        if len(rows):
+            self._assign[rows] = np.argmax(self._vectors[rows] @ self.centroids.T, axis=1)
+            for row, lst in zip(rows.tolist(), self._assign[rows].tolist()):
+                self._lists[lst].append(row)
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= len(self._vectors):
+            return
+        capacity = max(needed, 2 * len(self._vectors), 1024)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        assign = np.full(capacity, -1, dtype=np.int64)
+        assign[:self._size] = self._assign[:self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._vectors, self._assign, self._alive = vectors, assign, alive
+
+    def add(self, ids: Sequence[Hashable], vectors: np.ndarray):
+        """增量插入；已存在的 id 会被新向量替换"""
+        vectors = normalize(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"IVFIndex 维度为 {self.dim}，传入向量维度为 {vectors.shape[1]}")
+        if len(ids) != len(vectors):
+            raise ValueError("ids 与 vectors 数量不一致")
+        self.remove([i for i in ids if i in self._row_of])
+        self._reserve(len(ids))
+        start = self._size
+        rows = np.arange(start, start + len(ids))
+        self._vectors[rows] = vectors
+        self._alive[rows] = True
+        self._size += len(ids)
+        for row, item_id in zip(rows.tolist(), ids):
+            self._ids.append(item_id)
+            self._row_of[item_id] = row
+        if self.is_trained:
+            assign = np.argmax(vectors @ self.centroids.T, axis=1)
+            self._assign[rows] = assign
+            for row, lst in zip(rows.tolist(), assign.tolist()):
+                self._lists[lst].append(row)
+                self._list_cache.pop(lst, None)
+
+    def remove(self, ids: Sequence[Hashable]):
+        for item_id in ids:
+            row = self._row_of.pop(item_id, None)
+            if row is None:
+                continue
+            self._alive[row] = False
+            if self.is_trained:
+                self._list_cache.pop(int(self._assign[row]), None)
+        if self.compact_threshold is not None and self.dead_rows > self.compact_threshold * self._size:
+            self.compact()
+
+    @property
+    def dead_rows(self) -> int:
+        """已删除或被覆盖、但仍占着行存储的向量数"""
+        return self._size - len(self._row_of)
+
+    def compact(self):
+        """只保留存活的行并重新编号，_ids / _row_of 与倒排列表随之重建"""
+        rows = np.flatnonzero(self._alive[:self._size])
+        self._vectors = self._vectors[rows]
+        self._assign = self._assign[rows]
+        self._alive = np.ones(len(rows), dtype=bool)
+        self._ids = [self._ids[r] for r in rows.tolist()]
+        self._row_of = {item_id: row for row, item_id in enumerate(self._ids)}
+        self._size = len(rows)
+        if self.is_trained:
+            # 聚类中心不变，沿用原来的分配，不需要重新计算
+            self._lists = [[] for _ in range(len(self.centroids))]
+            self._list_cache = {}
+            for row, lst in enumerate(self._assign.tolist()):
+                self._lists[lst].append(row)
+
+    def _list_rows(self, lst: int) -> np.ndarray:
+        rows = self._list_cache.get(lst)
+        if rows is None:
+            rows = np.asarray(self._lists[lst], dtype=np.int64)
+            rows = rows[self._alive[rows]]
+            # 顺带压缩掉已删除的行
+            self._lists[lst] = rows.tolist()
+            self._list_cache[lst] = rows
+        return rows
+
+    @classmethod
+    def build(
+        cls,
+        ids: Sequence[Hashable],
+        vectors: np.ndarray,
+        n_lists: Optional[int] = None,
+        nprobe: int = 8,
+        **kwargs,
+    ) -> "IVFIndex":
+        """
+        从一批向量构建索引（可直接使用 OpenAIEmbedding 的 as_array 输出）。
+        n_lists 默认取 sqrt(n) 附近，这是 IVF 的常用经验值。
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(len(vectors))))
+        index = cls(vectors.shape[1], n_lists=n_lists, nprobe=nprobe, **kwargs)
+        index.add(ids, vectors)
+        if len(vectors):
+            index.train(vectors)
+        return index
+
+    @classmethod
+    def from_store(
+        cls,
+        store,
+        model: str,
+        texts: Sequence[str],
+        ids: Optional[Sequence[Hashable]] = None,
+        **kwargs,
+    ) -> "IVFIndex":
+        """从 EmbeddingStore 中读取 texts 的向量构建索引，ids 默认为下标"""
+        matrix, missing = store.get_many(model, texts)
+        if matrix is None or missing:
+            raise KeyError(f"EmbeddingStore 中缺少 {len(missing)} 条文本的向量，请先完成 embedding")
+        ids = list(range(len(texts))) if ids is None else list(ids)
+        return cls.build(ids, matrix, **kwargs)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[List[List[Hashable]], np.ndarray]:
+        """
+        返回 (ids, scores)：ids[i] 为第 i 个 query 的 top-k id 列表（按相似度降序），
+        scores 形状为 (n_queries, k)，不足 k 个时以 -inf 填充。
+        """
+        q = normalize(queries)
+        scores_out = np.full((len(q), k), -np.inf, dtype=np.float32)
+        ids_out: List[List[Hashable]] = []
+        if not self.is_trained:
+            alive = np.flatnonzero(self._alive[:self._size])
+            idx, scores = top_k_nearest_neighbors(q, self._vectors[alive], k, normalized=True)
+            scores_out[:, :scores.shape[1]] = scores
+            return [[self._ids[r] for r in alive[row]] for row in idx], scores_out
+
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probe_lists, _ = _top_k_rows(q @ self.centroids.T, nprobe)
+        for i, lists in enumerate(probe_lists):
+            rows = np.concatenate([self._list_rows(int(lst)) for lst in lists])
+            if len(rows) == 0:
+                ids_out.append([])
+                continue
+            idx, scores = _top_k_rows((self._vectors[rows] @ q[i])[None, :], k)
+            scores_out[i, :scores.shape[1]] = scores[0]
+            ids_out.append([self._ids[r] for r in rows[idx[0]]])
+        return ids_out, scores_out
+
+    def evaluate_recall(
+        self,
+        queries: np.ndarray,
+        k: int,
+        nprobe_values: Optional[Sequence[int]] = None,
+    ) -> List[Dict[str, float]]:
+        """以精确搜索为基准，报告每个 nprobe 下的 recall@k 与平均单 query 延迟（毫秒）"""
+        q = normalize(queries)
+        alive = np.flatnonzero(self._alive[:self._size])
+        exact_idx, _ = top_k_nearest_neighbors(q, self._vectors[alive], k, normalized=True)
+        exact = [set(self._ids[r] for r in alive[row]) for row in exact_idx]
+        if nprobe_values is None:
+            n = len(self.centroids) if self.is_trained else 1
+            nprobe_values = sorted({1, 2, 4, 8, 16, 32, n} & set(range(1, n + 1)))
+        report = []
+        for nprobe in nprobe_values:
+            start = time.perf_counter()
+            found, _ = self.search(q, k, nprobe=nprobe)
+            elapsed = time.perf_counter() - start
+            hits = sum(len(exact[i] & set(found[i])) for i in range(len(q)))
+            total = sum(len(e) for e in exact) or 1
+            report.append({
+                "nprobe": nprobe,
+                "recall": hits / total,
+                "latency_ms": 1000.0 * elapsed / max(1, len(q)),
+            })
+        return report
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _npz_path(path: str) -> str:
+        # np.savez 会给没有后缀的路径补上 .npz，load 时按同样规则找文件
+        return path if path.endswith(".npz") else path + ".npz"
+
+    def save(self, path: str):
+        alive = np.flatnonzero(self._alive[:self._size])
+        np.savez(
+            self._npz_path(path),
+            dim=self.dim,
+            n_lists=self.n_lists,
+            nprobe=self.nprobe,
+            kmeans_iters=self.kmeans_iters,
+            seed=self.seed,
+            # None（只手动 compact）存为 nan
+            compact_threshold=np.nan if self.compact_threshold is None else self.compact_threshold,
+            centroids=self.centroids if self.is_trained else np.empty((0, self.dim), dtype=np.float32),
+            vectors=self._vectors[alive],
+            ids=np.asarray([self._ids[r] for r in alive], dtype=object),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        data = np.load(cls._npz_path(path), allow_pickle=True)
+        threshold = float(data["compact_threshold"]) if "compact_threshold" in data.files else 0.5
+        index = cls(
+            int(data["dim"]),
+            n_lists=int(data["n_lists"]),
+            nprobe=int(data["nprobe"]),
+            kmeans_iters=int(data["kmeans_iters"]),
+            seed=int(data["seed"]),
+            compact_threshold=None if np.isnan(threshold) else threshold,
+        )
+        if len(data["centroids"]):
+            index.centroids = data["centroids"]
+            index._lists = [[] for _ in range(len(index.centroids))]
+        index.add(data["ids"].tolist(), data["vectors"])
+        return index
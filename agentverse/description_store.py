@@ -0,0 +1,321 @@
+"""
+列式文本存储：AgentCF 主要在演化文本（用户的自我介绍、CD 描述等），
+这里按字段把所有实体的文本存成列，而不是挂在每个 agent 对象上。
+
+每个字段一列：
+- arena：所有字符串的 UTF-8 字节首尾相接；更新时把新值追加到末尾，旧字节成为垃圾，compact() 回收
+- offsets / lengths：每行在 arena 中的位置（int64 / uint32）
+- versions：每行被修改的次数（uint32）
+- dirty：按位存储的脏标记，set() 置位，clear_dirty() 清除
+
+"重新编码所有改动过的物品"就是 dirty_rows() 一次 numpy 扫描，
+"为这一批渲染 prompt"就是按行号切片，不需要遍历对象图。
+
+快照：save(directory) 把每列写成 {field}.arena 与若干 .npy，最后写 meta.json；
+load(directory) 默认以内存映射方式打开，不把 arena 读进内存。加载后的修改写在内存中的
+追加区，数组为写时复制，不会改动磁盘上的快照。
+
+    store = DescriptionStore(["description"])
+    store.add_many(item_ids, description=initial_descriptions)
+    result = ItemAgentParser().parse_batch(outputs, method="parse_pretrain")
+    store.set_many("description", rows, result.values)   # None（解析失败）跳过
+    rows = store.dirty_rows("description")
+    vectors = embedder.generate_batch_response(store.get_many("description", rows), as_array=True)
+    store.clear_dirty("description", rows)
+"""
+from __future__ import annotations
+
+import json
+import os
+from string import Formatter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+_META = "meta.json"
+
+
+class StringColumn:
+    def __init__(self):
+        # 快照中的 arena（只读内存映射），新写入的字节追加在 _tail
+        self._base: Optional[np.ndarray] = None
+        self._base_len = 0
+        self._tail = bytearray()
+        self.size = 0
+        self.garbage = 0
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.lengths = np.zeros(0, dtype=np.uint32)
+        self.versions = np.zeros(0, dtype=np.uint32)
+        self.dirty = np.zeros(0, dtype=np.uint8)
+
+    # ------------------------------------------------------------------
+    # arena
+    # ------------------------------------------------------------------
+
+    @property
+    def arena_bytes(self) -> int:
+        return self._base_len + len(self._tail)
+
+    def _write(self, data: bytes) -> int:
+        offset = self._base_len + len(self._tail)
+        self._tail += data
+        return offset
+
+    def _read(self, offset: int, length: int) -> bytes:
+        if offset >= self._base_len:
+            start = offset - self._base_len
+            return bytes(self._tail[start:start + length])
+        return self._base[offset:offset + length].tobytes()
+
+    def _reserve(self, rows: int):
+        capacity = len(self.offsets)
+        if rows <= capacity:
+            return
+        capacity = max(rows, 2 * capacity, 16)
+
+        def grow(array: np.ndarray, size: int) -> np.ndarray:
+            grown = np.zeros(size, dtype=array.dtype)
+            grown[:len(array)] = array
+            return grown
+
+        self.offsets = grow(self.offsets, capacity)
+        self.lengths = grow(self.lengths, capacity)
+        self.versions = grow(self.versions, capacity)
+        self.dirty = grow(self.dirty, (capacity + 7) // 8)
+
+    # ------------------------------------------------------------------
+    # 读写
+    # ------------------------------------------------------------------
+
+    def append(self, values: Iterable[str]) -> None:
+        encoded = [v.encode("utf-8") for v in values]
+        self._reserve(self.size + len(encoded))
+        for data in encoded:
+            self.offsets[self.size] = self._write(data)
+            self.lengths[self.size] = len(data)
+            self.size += 1
+
+    def get(self, row: int) -> str:
+        return self._read(int(self.offsets[row]), int(self.lengths[row])).decode("utf-8")
+
+    def get_many(self, rows: Iterable[int]) -> List[str]:
+        offsets, lengths = self.offsets, self.lengths
+        return [self._read(int(offsets[r]), int(lengths[r])).decode("utf-8") for r in rows]
+
+    def set(self, row: int, value: str) -> bool:
+        """值不变时不做任何事并返回 False，避免无意义的重新编码"""
+        data = value.encode("utf-8")
+        old_length = int(self.lengths[row])
+        if len(data) == old_length and self._read(int(self.offsets[row]), old_length) == data:
+            return False
+        self.garbage += old_length
+        self.offsets[row] = self._write(data)
+        self.lengths[row] = len(data)
+        self.versions[row] += 1
+        self.dirty[row >> 3] |= np.uint8(1 << (row & 7))
+        return True
+
+    # ------------------------------------------------------------------
+    # 脏标记
+    # ------------------------------------------------------------------
+
+    def dirty_rows(self) -> np.ndarray:
+        bits = np.unpackbits(self.dirty, bitorder="little")[:self.size]
+        return np.flatnonzero(bits)
+
+    def clear_dirty(self, rows: Optional[Sequence[int]] = None) -> None:
+        if rows is None:
+            self.dirty[:] = 0
+            return
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.size == 0:
+            return
+        mask = np.zeros_like(self.dirty)
+        np.bitwise_or.at(mask, rows >> 3, (1 << (rows & 7)).astype(np.uint8))
+        self.dirty &= ~mask
+
+    # ------------------------------------------------------------------
+    # 回收 / 快照
+    # ------------------------------------------------------------------
+
+    def _packed(self) -> tuple:
+        """按行顺序紧凑排列的 arena 字节与对应的 offsets"""
+        lengths = self.lengths[:self.size].astype(np.int64)
+        offsets = np.zeros(self.size, dtype=np.int64)
+        if self.size:
+            np.cumsum(lengths[:-1], out=offsets[1:])
+        if self._base is None and self.garbage == 0 and np.array_equal(offsets, self.offsets[:self.size]):
+            return bytes(self._tail), offsets
+        arena = b"".join(self._read(int(o), int(n)) for o, n in zip(self.offsets[:self.size], lengths))
+        return arena, offsets
+
+    def compact(self) -> None:
+        arena, offsets = self._packed()
+        self._base, self._base_len = None, 0
+        self._tail = bytearray(arena)
+        self.offsets[:self.size] = offsets
+        self.garbage = 0
+
+    def save(self, prefix: str) -> None:
+        arena, offsets = self._packed()
+        _replace_bytes(prefix + ".arena", arena)
+        for name, array in (
+            ("offsets", offsets),
+            ("lengths", self.lengths[:self.size]),
+            ("versions", self.versions[:self.size]),
+            ("dirty", self.dirty[:(self.size + 7) // 8]),
+        ):
+            _replace_array(f"{prefix}.{name}.npy", array)
+
+    @classmethod
+    def load(cls, prefix: str, size: int, mmap: bool = True) -> "StringColumn":
+        column = cls()
+        mode = "c" if mmap else None
+        column.offsets = np.load(prefix + ".offsets.npy", mmap_mode=mode)
+        column.lengths = np.load(prefix + ".lengths.npy", mmap_mode=mode)
+        column.versions = np.load(prefix + ".versions.npy", mmap_mode=mode)
+        column.dirty = np.load(prefix + ".dirty.npy", mmap_mode=mode)
+        column.size = size
+        arena_len = os.path.getsize(prefix + ".arena")
+        if arena_len:
+            if mmap:
+                column._base = np.memmap(prefix + ".arena", dtype=np.uint8, mode="r")
+            else:
+                column._base = np.fromfile(prefix + ".arena", dtype=np.uint8)
+            column._base_len = arena_len
+        return column
+
+
+def _replace_bytes(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _replace_array(path: str, array: np.ndarray):
+    tmp = path + ".tmp.npy"
+    np.save(tmp, np.ascontiguousarray(array))
+    os.replace(tmp, path)
+
+
+class DescriptionStore:
+    def __init__(self, fields: Sequence[str]):
+        if not fields:
+            raise ValueError("fields 不能为空")
+        self.fields = list(fields)
+        self.columns: Dict[str, StringColumn] = {field: StringColumn() for field in self.fields}
+        self.keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def _column(self, field: str) -> StringColumn:
+        try:
+            return self.columns[field]
+        except KeyError:
+            raise KeyError(f"未知字段 {field!r}，可用字段：{self.fields}") from None
+
+    def row(self, key: str) -> int:
+        return self._rows[key]
+
+    def rows(self, keys: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self._rows[k] for k in keys), dtype=np.int64)
+
+    def add_many(self, keys: Sequence[str], **values: Sequence[str]) -> np.ndarray:
+        """追加新实体，未给出的字段为空字符串；返回分配到的行号"""
+        unknown = set(values) - set(self.fields)
+        if unknown:
+            raise KeyError(f"未知字段 {sorted(unknown)}，可用字段：{self.fields}")
+        if len(set(keys)) != len(keys) or any(k in self._rows for k in keys):
+            raise ValueError("key 重复")
+        start = len(self.keys)
+        for field in self.fields:
+            column_values = values.get(field)
+            if column_values is None:
+                column_values = [""] * len(keys)
+            elif len(column_values) != len(keys):
+                raise ValueError(f"字段 {field!r} 的取值个数与 keys 不一致")
+            self.columns[field].append(column_values)
+        for offset, key in enumerate(keys):
+            self._rows[key] = start + offset
+        self.keys.extend(keys)
+        return np.arange(start, len(self.keys), dtype=np.int64)
+
+    def add(self, key: str, **values: str) -> int:
+        return int(self.add_many([key], **{f: [v] for f, v in values.items()})[0])
+
+    def get(self, key: str, field: str) -> str:
+        return self._column(field).get(self._rows[key])
+
+    def get_many(self, field: str, rows: Iterable[int]) -> List[str]:
+        return self._column(field).get_many(rows)
+
+    def set(self, key: str, field: str, value: str) -> bool:
+        return self._column(field).set(self._rows[key], value)
+
+    def set_many(self, field: str, rows: Iterable[int], values: Iterable[Optional[str]]) -> int:
+        """
+        按行号批量写入，可以直接传 parse_batch 的 values：None（解析失败）的位置保持原值。
+        返回实际改变的行数。
+        """
+        column = self._column(field)
+        changed = 0
+        for row, value in zip(rows, values):
+            if value is not None and column.set(int(row), value):
+                changed += 1
+        return changed
+
+    def versions(self, field: str) -> np.ndarray:
+        column = self._column(field)
+        return column.versions[:column.size]
+
+    def dirty_rows(self, field: str) -> np.ndarray:
+        return self._column(field).dirty_rows()
+
+    def clear_dirty(self, field: str, rows: Optional[Sequence[int]] = None) -> None:
+        self._column(field).clear_dirty(rows)
+
+    def render(self, template: str, rows: Iterable[int], **extra: str) -> List[str]:
+        """用各字段的值填充 template（str.format 语法，另可用 {key}）"""
+        rows = list(rows)
+        names = {name for _, name, _, _ in Formatter().parse(template) if name}
+        used = [f for f in self.fields if f in names]
+        columns = {f: self.columns[f].get_many(rows) for f in used}
+        return [
+            template.format(key=self.keys[row], **{f: columns[f][i] for f in used}, **extra)
+            for i, row in enumerate(rows)
+        ]
+
+    def compact(self) -> None:
+        for column in self.columns.values():
+            column.compact()
+
+    def garbage_ratio(self) -> float:
+        total = sum(c.arena_bytes for c in self.columns.values())
+        return sum(c.garbage for c in self.columns.values()) / total if total else 0.0
+
+    def save(self, directory: str) -> None:
+        """写入快照：每列的文件先写完，最后原子替换 meta.json"""
+        os.makedirs(directory, exist_ok=True)
+        for field, column in self.columns.items():
+            column.save(os.path.join(directory, field))
+        meta = json.dumps({"fields": self.fields, "keys": self.keys}, ensure_ascii=False)
+        _replace_bytes(os.path.join(directory, _META), meta.encode("utf-8"))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "DescriptionStore":
+        with open(os.path.join(directory, _META), encoding="utf-8") as f:
+            meta = json.load(f)
+        store = cls(meta["fields"])
+        store.keys = meta["keys"]
+        store._rows = {key: row for row, key in enumerate(store.keys)}
+        store.columns = {
+            field: StringColumn.load(os.path.join(directory, field), len(store.keys), mmap)
+            for field in store.fields
+        }
+        return store
@@ -0,0 +1,118 @@
+"""
+Embedding 相似度工具，替代已移除的 openai.embeddings_utils
+
+- distances_from_embeddings / indices_of_nearest_neighbors_from_distances
+  保持旧接口的调用方式，内部改为 numpy 向量化
+- cosine_similarity_matrix：一批 query 对全部 item 一次矩阵乘法
+- top_k_nearest_neighbors：argpartition 取 top-k，避免全量排序；
+  chunk_size 分块扫描 item（可以是 np.memmap），适合放不进内存的 item 集合
+"""
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+ArrayLike = Union[np.ndarray, Sequence[Sequence[float]]]
+
+
+def _as_matrix(x: ArrayLike) -> np.ndarray:
+    matrix = np.asarray(x, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    return matrix
+
+
+def normalize(matrix: ArrayLike, eps: float = 1e-12) -> np.ndarray:
+    """按行做 L2 归一化，零向量保持为零"""
+    matrix = _as_matrix(matrix)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, eps)
+
+
+def cosine_similarity_matrix(
+    queries: ArrayLike,
+    items: ArrayLike,
+    normalized: bool = False,
+) -> np.ndarray:
+    """
+    返回形状为 (n_queries, n_items) 的余弦相似度矩阵。
+    normalized=True 表示输入已经按行归一化，直接做内积。
+    """
+    if normalized:
+        return _as_matrix(queries) @ _as_matrix(items).T
+    return normalize(queries) @ normalize(items).T
+
+
+def distances_from_embeddings(
+    query_embedding: Sequence[float],
+    embeddings: ArrayLike,
+    distance_metric: str = "cosine",
+) -> List[float]:
+    """与 openai.embeddings_utils 同名函数兼容：返回 query 到每个 embedding 的距离"""
+    query = _as_matrix(query_embedding)
+    matrix = _as_matrix(embeddings)
+    if distance_metric == "cosine":
+        distances = 1.0 - cosine_similarity_matrix(query, matrix)[0]
+    elif distance_metric == "L1":
+        distances = np.abs(matrix - query).sum(axis=1)
+    elif distance_metric == "L2":
+        distances = np.linalg.norm(matrix - query, axis=1)
+    elif distance_metric == "Linf":
+        distances = np.abs(matrix - query).max(axis=1)
+    else:
+        raise ValueError(f"不支持的 distance_metric: {distance_metric}")
+    return distances.tolist()
+
+
+def indices_of_nearest_neighbors_from_distances(distances: Sequence[float]) -> np.ndarray:
+    """与 openai.embeddings_utils 同名函数兼容：按距离从近到远排序的下标"""
+    return np.argsort(np.asarray(distances), kind="stable")
+
+
+def _top_k_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """对每一行取分数最高的 k 个（降序），返回 (列下标, 分数)"""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+    if k < scores.shape[1]:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+def top_k_nearest_neighbors(
+    queries: ArrayLike,
+    items: ArrayLike,
+    k: int,
+    chunk_size: Optional[int] = None,
+    normalized: bool = False,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    按余弦相似度为每个 query 取 top-k 个 item。
+    返回 (indices, scores)，形状均为 (n_queries, k)，按相似度降序排列。
+    chunk_size 不为空时分块扫描 items，内存占用只与 chunk_size * n_queries 有关。
+    """
+    q = _as_matrix(queries) if normalized else normalize(queries)
+    n_items = len(items)
+    if chunk_size is None or chunk_size >= n_items:
+        item_matrix = _as_matrix(items) if normalized else normalize(items)
+        return _top_k_rows(q @ item_matrix.T, k)
+
+    best_idx = np.empty((q.shape[0], 0), dtype=np.int64)
+    best_scores = np.empty((q.shape[0], 0), dtype=np.float32)
+    for start in range(0, n_items, chunk_size):
+        chunk = _as_matrix(items[start:start + chunk_size])
+        if not normalized:
+            chunk = normalize(chunk)
+        chunk_idx, chunk_scores = _top_k_rows(q @ chunk.T, k)
+        # 与当前的 top-k 合并后再取一次 top-k
+        merged_idx = np.concatenate([best_idx, chunk_idx + start], axis=1)
+        merged_scores = np.concatenate([best_scores, chunk_scores], axis=1)
+        pick, best_scores = _top_k_rows(merged_scores, k)
+        best_idx = np.take_along_axis(merged_idx, pick, axis=1)
+    return best_idx, best_scores
@@ -2,5 +2,5 @@ from agentverse.registry import Registry
 
 llm_registry = Registry(name="LLMRegistry")
 
-from .base import BaseLLM, BaseChatModel, BaseCompletionModel, LLMResult
+from .base import BaseLLM, BaseChatModel, BaseCompletionModel, LLMResult, abatch_generate, as_llm_result
 # from .openai import OpenAIChat, OpenAICompletion, OpenAIEmbedding
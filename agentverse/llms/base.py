@@ -1,5 +1,6 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Sequence, Union
 
 from pydantic import BaseModel, Field
 
@@ -29,3 +30,40 @@ class BaseChatModel(BaseLLM):
 
 class BaseCompletionModel(BaseLLM):
     pass    
+
+
+def as_llm_result(output: Any) -> LLMResult:
+    """
+    把 agenerate_response 的返回值统一成 LLMResult：OpenAIChat / OpenAICompletion 返回的是
+    每个 choice 的文本列表，只取第一个；拿不到用量时 token 数记 0。
+    """
+    if isinstance(output, LLMResult):
+        return output
+    if isinstance(output, (list, tuple)):
+        output = output[0] if output else ""
+    return LLMResult(content=output, send_tokens=0, recv_tokens=0, total_tokens=0)
+
+
+async def abatch_generate(
+    llm: BaseLLM,
+    prompts: Sequence[str],
+    max_concurrency: Optional[int] = None,
+) -> List[Union[LLMResult, Exception]]:
+    """
+    批量生成，结果与 prompts 按下标对齐，失败项为异常对象。
+    LLM 实现了 abatch_generate_response 时直接使用（带用量与有界并发）；
+    否则有界并发地逐条调用 agenerate_response，并用 as_llm_result 统一返回值。
+    """
+    if hasattr(llm, "abatch_generate_response"):
+        return await llm.abatch_generate_response(prompts, max_concurrency)
+    limit = max_concurrency or getattr(llm, "max_concurrency", None) or len(prompts) or 1
+    semaphore = asyncio.Semaphore(limit)
+
+    async def generate(prompt: str) -> Union[LLMResult, Exception]:
+        async with semaphore:
+            try:
+                return as_llm_result(await llm.agenerate_response(prompt))
+            except Exception as e:
+                return e
+
+    return list(await asyncio.gather(*(generate(p) for p in prompts)))
@@ -0,0 +1,153 @@
+"""
+按内容寻址的 LLM 响应缓存
+
+key = sha256(模型名 + messages + 采样参数)，value 为响应的 JSON 文本。
+两层结构：
+- 内存 LRU（OrderedDict），命中时不触碰磁盘
+- 可选的 SQLite 磁盘后端（WAL 模式，多进程可并发读），
+  超过 max_disk_bytes 时按最近访问时间淘汰
+
+temperature > 0 的调用默认不走缓存（同一个 prompt 本就期望不同的采样结果），
+cache_sampled=True 可以强制缓存，用于复现实验。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def cache_key(model: str, messages: Any, args: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "args": args},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_memory_items: int = 1024,
+        max_disk_bytes: Optional[int] = None,
+        cache_sampled: bool = False,
+    ):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.cache_sampled = cache_sampled
+        self.hits = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        if path is not None:
+            self._open(path)
+
+    def _open(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+        )
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self._disk_bytes = row[0]
+
+    def enabled_for(self, args: Dict[str, Any]) -> bool:
+        """temperature > 0 的调用默认绕过缓存"""
+        return self.cache_sampled or (args.get("temperature") or 0) <= 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key)
+                    )
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._remember(key, value)
+            if self._conn is None:
+                return
+            size = len(value.encode("utf-8"))
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._disk_bytes += size - (old[0] if old else 0)
+            self._evict_disk()
+
+    def _remember(self, key: str, value: str):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        if self.max_disk_bytes is None or self._disk_bytes <= self.max_disk_bytes:
+            return
+        # 按最近访问时间从旧到新淘汰，直到回到预算以内
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        )
+        evicted = []
+        for key, size in rows:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            evicted.append((key,))
+            self._disk_bytes -= size
+            self._memory.pop(key, None)
+        rows.close()
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._disk_bytes = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self) -> int:
+        if self._conn is not None:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return len(self._memory)
@@ -0,0 +1,180 @@
+"""
+Embedding 向量缓存（内存映射存储）
+
+目录结构：
+- index.sqlite：key -> 行号，key = sha256(模型名 + 文本)
+- vectors.f32：按行追加的 float32 原始向量，每行 dim 个数
+
+读取通过 np.memmap 完成，多个 worker 进程共享同一份页缓存，
+不需要各自把全部向量读进内存。写入时持有文件锁，
+先追加向量再登记索引，因此读者只会看到已经完整写入的行。
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows 下退化为仅进程内加锁
+    fcntl = None
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    # 单条 SQL 中 IN (...) 的参数上限，避免超过 SQLite 的变量个数限制
+    _QUERY_CHUNK = 500
+
+    def __init__(self, directory: str, dim: Optional[int] = None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.sqlite")
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.lock_path = os.path.join(directory, ".lock")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        if not os.path.exists(self.vectors_path):
+            open(self.vectors_path, "ab").close()
+
+        self.dim: Optional[int] = self._load_dim()
+        if dim is not None:
+            if self.dim is not None and self.dim != dim:
+                raise ValueError(f"EmbeddingStore 维度不一致：已有 {self.dim}，传入 {dim}")
+            self._save_dim(dim)
+        self._mmap: Optional[np.memmap] = None
+
+    # ------------------------------------------------------------------
+    # 元数据 / 文件锁
+    # ------------------------------------------------------------------
+
+    def _load_dim(self) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        return row[0] if row else None
+
+    def _save_dim(self, dim: int):
+        self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (dim,))
+        self.dim = self._load_dim()
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _row_count(self) -> int:
+        if not self.dim:
+            return 0
+        return os.path.getsize(self.vectors_path) // (self.dim * 4)
+
+    def _vectors(self, max_row: int) -> np.memmap:
+        """返回至少覆盖到 max_row 的只读内存映射；文件增长后重新映射"""
+        if self._mmap is None or self._mmap.shape[0] <= max_row:
+            rows = self._row_count()
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._mmap
+
+    # ------------------------------------------------------------------
+    # 读写
+    # ------------------------------------------------------------------
+
+    def _lookup_rows(self, keys: Sequence[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), self._QUERY_CHUNK):
+            chunk = unique[start:start + self._QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for key, row in self._conn.execute(
+                f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", chunk
+            ):
+                found[key] = row
+        return found
+
+    def get_many(self, model: str, texts: Sequence[str]) -> Tuple[Optional[np.ndarray], List[int]]:
+        """
+        查询一批文本的向量。
+        返回 (matrix, missing)：matrix 形状为 (len(texts), dim)，未命中的行为 0；
+        missing 为未命中的下标。库中还没有任何向量时 matrix 为 None。
+        """
+        if self.dim is None:
+            # 其它进程可能已经写入了第一批向量
+            self.dim = self._load_dim()
+        if self.dim is None:
+            return None, list(range(len(texts)))
+        keys = [embedding_key(model, t) for t in texts]
+        rows = self._lookup_rows(keys)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        hit_idx = [i for i, k in enumerate(keys) if k in rows]
+        missing = [i for i, k in enumerate(keys) if k not in rows]
+        if hit_idx:
+            hit_rows = np.fromiter((rows[keys[i]] for i in hit_idx), dtype=np.int64, count=len(hit_idx))
+            matrix[hit_idx] = self._vectors(int(hit_rows.max()))[hit_rows]
+        return matrix, missing
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        matrix, missing = self.get_many(model, [text])
+        if matrix is None or missing:
+            return None
+        return matrix[0]
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: np.ndarray):
+        """追加一批向量；已存在的 key 跳过"""
+        if len(texts) == 0:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+        keys = [embedding_key(model, t) for t in texts]
+        with self._file_lock():
+            if self.dim is None:
+                self._save_dim(vectors.shape[1])
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"EmbeddingStore 维度不一致：已有 {self.dim}，传入 {vectors.shape[1]}")
+            existing = self._lookup_rows(keys)
+            fresh: Dict[str, int] = {}
+            for i, key in enumerate(keys):
+                if key not in existing and key not in fresh:
+                    fresh[key] = i
+            if not fresh:
+                return
+            row_bytes = self.dim * 4
+            size = os.path.getsize(self.vectors_path)
+            if size % row_bytes:
+                # 上次写入中途崩溃留下的半行（尚未登记索引），截掉
+                os.truncate(self.vectors_path, size - size % row_bytes)
+            start = self._row_count()
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors[list(fresh.values())].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO vectors (key, row) VALUES (?, ?)",
+                [(key, start + offset) for offset, key in enumerate(fresh)],
+            )
+
+    def put(self, model: str, text: str, vector: np.ndarray):
+        self.put_many(model, [text], np.asarray(vector, dtype=np.float32).reshape(1, -1))
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def close(self):
+        self._mmap = None
+        self._conn.close()
@@ -5,15 +5,27 @@ from __future__ import annotations
 
 import os
 import time
+import base64
 import asyncio
-from typing import Dict, List, Optional, Sequence, Union
+import threading
+import weakref
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
-from openai import OpenAI, AsyncOpenAI
+import numpy as np
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 from openai import APIError, APIConnectionError, RateLimitError
+from openai.types.chat import ChatCompletion
 from pydantic import BaseModel, Field, ConfigDict
 
 from agentverse.llms.base import LLMResult, BaseChatModel, BaseCompletionModel, BaseModelArgs
 from agentverse.llms import llm_registry
+from agentverse.llms.rate_limit import KeyRateLimiter, estimate_tokens
+from agentverse.llms.cache import ResponseCache, cache_key
+from agentverse.llms.embedding_store import EmbeddingStore
+from agentverse.llms.telemetry import MetricsCollector, llm_metrics
+from agentverse.profiling import profiler, profiled
 
 import logging
 
@@ -41,16 +53,126 @@ class OpenAIChatArgs(BaseModelArgs):
 class OpenAIClientConfig(BaseModel):
     api_base: Optional[str] = Field(default_factory=lambda: os.environ.get("api_base"))
     http_proxy: Optional[str] = Field(default_factory=lambda: os.environ.get("http_proxy"))
+    # 连接池参数；相同配置的客户端池共享同一组 httpx 连接
+    max_connections: int = Field(default=1000)
+    max_keepalive_connections: int = Field(default=100)
+    keepalive_expiry: float = Field(default=30.0)
+    http2: bool = Field(default=False)
+
+    def transport_key(self) -> Tuple:
+        return (
+            self.http_proxy,
+            self.max_connections,
+            self.max_keepalive_connections,
+            self.keepalive_expiry,
+            self.http2,
+        )
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            "http2": self.http2,
+        }
+        if self.http_proxy:
+            kwargs["proxy"] = self.http_proxy
+        return kwargs
 
     def build_http_client(self) -> Optional[httpx.Client]:
-        if not self.http_proxy or not httpx:
+        if not httpx:
             return None
-        return httpx.Client(proxy=self.http_proxy)
+        return DefaultHttpxClient(**self._client_kwargs())
     
     def build_async_http_client(self) -> Optional[httpx.AsyncClient]:
-        if not self.http_proxy or not httpx:
+        if not httpx:
             return None
-        return httpx.AsyncClient(proxy=self.http_proxy)
+        return LoopLocalAsyncHttpxClient(**self._client_kwargs())
+
+
+class LoopLocalAsyncHttpxClient(DefaultAsyncHttpxClient):
+    """
+    共享的异步 httpx 客户端。httpx 的连接绑定在创建它的事件循环上，
+    同一个客户端池跨多次 asyncio.run()（例如每个 epoch 一次）使用时，
+    旧循环留下的 keep-alive 连接会报 "Event loop is closed"。
+    这里按事件循环各建一个真正发请求的连接池，自身只负责构造请求。
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._kwargs = kwargs
+        self._per_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._loop_lock = threading.Lock()
+
+    def _loop_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._loop_lock:
+            client = self._per_loop.get(loop)
+            if client is None:
+                client = self._per_loop[loop] = DefaultAsyncHttpxClient(**self._kwargs)
+            return client
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        return await self._loop_client().send(request, **kwargs)
+
+    async def aclose(self):
+        """关闭当前事件循环的连接池；其它循环的连接无法在这里 await，直接丢弃"""
+        loop = asyncio.get_running_loop()
+        with self._loop_lock:
+            clients = list(self._per_loop.items())
+            self._per_loop.clear()
+        for owner, client in clients:
+            if owner is loop:
+                await client.aclose()
+        await super().aclose()
+
+
+class HttpTransportRegistry:
+    """
+    进程级的 httpx 客户端注册表：相同 transport_key 的配置共享一对
+    httpx.Client / httpx.AsyncClient，复用 keep-alive 连接与 TLS 会话。
+    按引用计数管理生命周期，最后一个使用者释放时才真正关闭。
+    """
+    def __init__(self):
+        self._entries: Dict[Tuple, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, config: OpenAIClientConfig) -> Tuple[Optional[httpx.Client], Optional[httpx.AsyncClient]]:
+        key = config.transport_key()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = [config.build_http_client(), config.build_async_http_client(), 0]
+                self._entries[key] = entry
+            entry[2] += 1
+            return entry[0], entry[1]
+
+    def release(self, config: OpenAIClientConfig) -> Optional[httpx.AsyncClient]:
+        """
+        归还一次引用。最后一个引用归还时关闭同步客户端并从注册表移除，
+        返回需要由调用方关闭的异步客户端（关闭异步客户端需要 await）。
+        """
+        key = config.transport_key()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry[2] -= 1
+            if entry[2] > 0:
+                return None
+            del self._entries[key]
+        if entry[0] is not None:
+            entry[0].close()
+        return entry[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+transport_registry = HttpTransportRegistry()
 
 
 class OpenAIClientPool:
@@ -58,56 +180,274 @@ class OpenAIClientPool:
     管理多个 API key 的客户端池，负责：
     - 初始化同步/异步客户端
     - 轮换 key(rate limit / quota 时）
+    - 按 key 的 RPM / TPM 主动限流（发送前等待，而不是等 429 之后再重试）
+    - multi_key 模式下为每个 key 保持一对客户端，把并发请求分散到所有健康的 key 上
+
+    multi_key=False（默认）时行为与单 key 轮换一致：只有当前 key 在工作，
+    出错后才切到下一个。multi_key=True 时每次 lease() 按 key_strategy 选择 key：
+    - "least_in_flight"：在途请求数 / 权重 最小的 key
+    - "weighted_round_robin"：平滑加权轮询
+    额度耗尽（quota）的 key 进入冷却期 quarantine_seconds，之后自动恢复；
+    被封禁（deactivated）的 key 才会被永久移除。
+
+    所有客户端共用 transport_registry 中与 config 对应的 httpx 连接池，
+    换 key 只是用新凭证包一层 OpenAI 客户端，不会新建连接。
+    用完后调用 close() / aclose()，或以 (async) with 方式使用。
     """
-    def __init__(self, api_key_list: Sequence[str]):
+    def __init__(
+        self,
+        api_key_list: Sequence[str],
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        multi_key: bool = False,
+        key_strategy: str = "least_in_flight",
+        key_weights: Optional[Dict[str, float]] = None,
+        quarantine_seconds: float = 300.0,
+        config: Optional[OpenAIClientConfig] = None,
+    ):
         if not api_key_list:
             raise ValueError("api_key_list 不能为空，请在配置中提供至少一个 OpenAI API key")
+        if key_strategy not in ("least_in_flight", "weighted_round_robin"):
+            raise ValueError(f"未知的 key_strategy: {key_strategy}")
         self.api_key_list = list(api_key_list)
         self.idx = 0
-        self.config = OpenAIClientConfig()
+        self.config = config or OpenAIClientConfig()
+        self._transports: Optional[Tuple[Optional[httpx.Client], Optional[httpx.AsyncClient]]] = None
+        self._transport_lock = threading.Lock()
+
+        # 每个 key 一个限流器；rpm / tpm 都未配置时不限流
+        self.rpm = rpm
+        self.tpm = tpm
+        self.limiters: Dict[str, KeyRateLimiter] = {}
+        if rpm or tpm:
+            self.limiters = {key: KeyRateLimiter(rpm, tpm) for key in self.api_key_list}
 
-        # 当前持有客户端
-        self.client: Optional[OpenAI] = None
-        self.async_client: Optional[AsyncOpenAI] = None
+        # 多 key 调度状态
+        self.multi_key = multi_key
+        self.key_strategy = key_strategy
+        self.key_weights: Dict[str, float] = dict(key_weights or {})
+        self.quarantine_seconds = quarantine_seconds
+        self.in_flight: Dict[str, int] = {}
+        self.quarantined_until: Dict[str, float] = {}
+        self._rr_credit: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        # 每个 key 的客户端；lease() 期间 client / async_client 解析到被占用的 key
+        self._clients: Dict[str, OpenAI] = {}
+        self._async_clients: Dict[str, AsyncOpenAI] = {}
+        self._leased_key: ContextVar[Optional[str]] = ContextVar(
+            f"openai_pool_leased_key_{id(self)}", default=None
+        )
 
     def _current_key(self) -> str:
         return self.api_key_list[self.idx % len(self.api_key_list)]
 
+    def _active_key(self) -> str:
+        key = self._leased_key.get()
+        if key is not None and key in self._clients:
+            return key
+        return self._current_key()
+
+    @property
+    def client(self) -> Optional[OpenAI]:
+        return self._clients.get(self._active_key())
+
+    @property
+    def async_client(self) -> Optional[AsyncOpenAI]:
+        return self._async_clients.get(self._active_key())
+
     def _build_clients(self, api_key: str):
-        http_client = self.config.build_http_client()
-        async_http_client = self.config.build_async_http_client()
+        # 多个线程可能同时首次调用，只能登记一次引用，否则 close() 后连接池无法释放
+        with self._transport_lock:
+            if self._transports is None:
+                self._transports = transport_registry.acquire(self.config)
+            http_client, async_http_client = self._transports
 
-        self.client = OpenAI(
+        self._clients[api_key] = OpenAI(
             api_key=api_key,
             base_url=self.config.api_base,
             http_client=http_client,
         )
-        self.async_client = AsyncOpenAI(
+        self._async_clients[api_key] = AsyncOpenAI(
             api_key=api_key,
             base_url=self.config.api_base,
             http_client=async_http_client,
         )
 
     def ensure_clients(self):
-        if self.client is None or self.async_client is None:
-            self._build_clients(self._current_key())
+        keys = self.api_key_list if self.multi_key else [self._current_key()]
+        for key in keys:
+            if key not in self._clients or key not in self._async_clients:
+                self._build_clients(key)
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+
+    def _release_transports(self) -> Optional[httpx.AsyncClient]:
+        self._clients.clear()
+        self._async_clients.clear()
+        with self._transport_lock:
+            if self._transports is None:
+                return None
+            self._transports = None
+        return transport_registry.release(self.config)
+
+    def close(self):
+        """
+        释放共享连接池的引用；最后一个使用者负责真正关闭连接，返回时连接已关闭。
+        事件循环内无法同步等待异步连接关闭，请改用 aclose()。
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("OpenAIClientPool.close() 不能在运行中的事件循环里调用，请使用 await aclose()")
+        async_http_client = self._release_transports()
+        if async_http_client is not None:
+            asyncio.run(async_http_client.aclose())
+
+    async def aclose(self):
+        async_http_client = self._release_transports()
+        if async_http_client is not None:
+            await async_http_client.aclose()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    # ------------------------------------------------------------------
+    # key 选择
+    # ------------------------------------------------------------------
+
+    def is_healthy(self, key: str) -> bool:
+        return self.quarantined_until.get(key, 0.0) <= time.monotonic()
+
+    def healthy_keys(self) -> List[str]:
+        return [key for key in self.api_key_list if self.is_healthy(key)]
+
+    def _select_key(self) -> str:
+        """multi_key 模式下挑选一个 key（调用方需持有 self._lock）"""
+        candidates = self.healthy_keys()
+        if not candidates:
+            raise ValueError("所有 API key 都不可用，请更新配置")
+        if self.key_strategy == "least_in_flight":
+            # 同样负载时从轮询指针处开始，避免总是压在第一个 key 上
+            start = self.idx % len(self.api_key_list)
+            ordered = sorted(
+                candidates,
+                key=lambda k: (
+                    self.in_flight.get(k, 0) / self.key_weights.get(k, 1.0),
+                    (self.api_key_list.index(k) - start) % len(self.api_key_list),
+                ),
+            )
+            self.idx = (self.api_key_list.index(ordered[0]) + 1) % len(self.api_key_list)
+            return ordered[0]
+        # 平滑加权轮询（nginx 算法）
+        total = 0.0
+        best = None
+        for key in candidates:
+            weight = self.key_weights.get(key, 1.0)
+            self._rr_credit[key] = self._rr_credit.get(key, 0.0) + weight
+            total += weight
+            if best is None or self._rr_credit[key] > self._rr_credit[best]:
+                best = key
+        self._rr_credit[best] -= total
+        return best
+
+    def _checkout(self) -> str:
+        with self._lock:
+            key = self._select_key() if self.multi_key else self._current_key()
+            self.in_flight[key] = self.in_flight.get(key, 0) + 1
+            return key
+
+    def _checkin(self, key: str):
+        with self._lock:
+            self.in_flight[key] = max(0, self.in_flight.get(key, 0) - 1)
+
+    @contextmanager
+    def lease(self, tokens: int = 0):
+        """占用一个 key 的一次发送额度（同步），额度不足时阻塞等待"""
+        key = self._checkout()
+        token = self._leased_key.set(key)
+        try:
+            limiter = self.limiters.get(key)
+            if limiter is not None:
+                limiter.acquire(tokens)
+            yield key
+        except (APIError, APIConnectionError, RateLimitError) as e:
+            # 记录出错的 key，重试循环据此隔离正确的 key
+            e.pool_key = key
+            raise
+        finally:
+            self._leased_key.reset(token)
+            self._checkin(key)
+
+    @asynccontextmanager
+    async def alease(self, tokens: int = 0):
+        """占用一个 key 的一次发送额度（异步），额度不足时让出事件循环等待"""
+        key = self._checkout()
+        token = self._leased_key.set(key)
+        try:
+            limiter = self.limiters.get(key)
+            if limiter is not None:
+                await limiter.aacquire(tokens)
+            yield key
+        except (APIError, APIConnectionError, RateLimitError) as e:
+            # 记录出错的 key，重试循环据此隔离正确的 key
+            e.pool_key = key
+            raise
+        finally:
+            self._leased_key.reset(token)
+            self._checkin(key)
 
     def rotate_key(self):
-        """切换到下一个 key, 并重建客户端"""
-        self.idx = (self.idx + 1) % len(self.api_key_list)
+        """切换到下一个可用 key, 并重建客户端"""
+        for _ in range(len(self.api_key_list)):
+            self.idx = (self.idx + 1) % len(self.api_key_list)
+            if self.is_healthy(self._current_key()):
+                break
         self._build_clients(self._current_key())
 
-    def handle_api_error(self, error: Exception) -> bool:
+    def quarantine(self, key: str, seconds: Optional[float] = None):
+        """让 key 进入冷却期，期间不会被选中"""
+        seconds = self.quarantine_seconds if seconds is None else seconds
+        self.quarantined_until[key] = time.monotonic() + seconds
+
+    def _remove_key(self, key: str):
+        if key in self.api_key_list:
+            self.api_key_list.remove(key)
+        self._clients.pop(key, None)
+        self._async_clients.pop(key, None)
+
+    def handle_api_error(self, error: Exception, key: Optional[str] = None) -> bool:
         """处理常见 API 错误。返回值：是否已经处理（并可重试）"""
         error_str = str(error)
-        if "quota" in error_str or "deactivated" in error_str:
-            bad_key = self._current_key()
-            print(f"[OpenAI] key 被封禁或额度耗尽: {bad_key}")
-            if bad_key in self.api_key_list:
-                self.api_key_list.remove(bad_key)
+        bad_key = key or self._current_key()
+        if "deactivated" in error_str:
+            print(f"[OpenAI] key 被封禁: {bad_key}")
+            self._remove_key(bad_key)
             if not self.api_key_list:
                 raise ValueError("所有 API key 都不可用，请更新配置")
-            self.rotate_key()
+            if not self.multi_key:
+                self.rotate_key()
+            return True
+        if "quota" in error_str:
+            print(f"[OpenAI] key 额度耗尽，冷却 {self.quarantine_seconds:.0f}s: {bad_key}")
+            self.quarantine(bad_key)
+            if not self.healthy_keys():
+                raise ValueError("所有 API key 都不可用，请更新配置")
+            if not self.multi_key and bad_key == self._current_key():
+                self.rotate_key()
             return True
         if "context length" in error_str:
             logger.warning("上下文超出限制，可以考虑缩短 prompt")
@@ -124,16 +464,76 @@ class OpenAIBaseModel(BaseModel):
 
     args: BaseModelArgs
     max_retry: int = 3
+    max_concurrency: int = 32
     pool: OpenAIClientPool
+    cache: Optional[ResponseCache] = None
+    metrics: Optional[MetricsCollector] = Field(default_factory=lambda: llm_metrics)
+
+    @staticmethod
+    def _usage(response: Any) -> Tuple[int, int]:
+        """从响应中取 (prompt_tokens, completion_tokens)；embedding 响应没有 completion_tokens"""
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", 0)
+        completion_tokens = getattr(usage, "completion_tokens", 0)
+        return (
+            prompt_tokens if isinstance(prompt_tokens, int) else 0,
+            completion_tokens if isinstance(completion_tokens, int) else 0,
+        )
+
+    def _record_call(self, key: Any, start: float, response: Any = None, error: Optional[BaseException] = None):
+        if self.metrics is None:
+            return
+        prompt_tokens, completion_tokens = self._usage(response) if error is None else (0, 0)
+        self.metrics.record_llm_call(
+            model=getattr(self.args, "model", "unknown"),
+            api_key=key,
+            latency=time.perf_counter() - start,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            error=error,
+        )
+
+    def close(self):
+        self.pool.close()
+
+    async def aclose(self):
+        await self.pool.aclose()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
-    def _run_with_retry(self, func, *args, **kwargs):
-        """同步调用，带重试"""
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    @profiled("llm.call")
+    def _run_with_retry(self, func, *args, tokens: int = 0, **kwargs):
+        """同步调用，带重试；tokens 为本次请求的预估 token 数，用于 TPM 限流"""
         for attempt in range(self.max_retry):
+            if attempt:
+                profiler.count("llm.retry")
             try:
                 self.pool.ensure_clients()
-                return func(*args, **kwargs)
+                wait_start = time.perf_counter()
+                with self.pool.lease(tokens) as key:
+                    start = time.perf_counter()
+                    # 限流排队与网络耗时分开统计
+                    profiler.record("llm.queue_wait", start - wait_start)
+                    try:
+                        with profiler.span("llm.network"):
+                            response = func(*args, **kwargs)
+                    except Exception as e:
+                        self._record_call(key, start, error=e)
+                        raise
+                    self._record_call(key, start, response=response)
+                    return response
             except (APIError, APIConnectionError, RateLimitError) as e:
-                should_retry = self.pool.handle_api_error(e)
+                should_retry = self.pool.handle_api_error(e, getattr(e, "pool_key", None))
                 if should_retry:
                     continue
                 raise
@@ -143,15 +543,29 @@ class OpenAIBaseModel(BaseModel):
         raise RuntimeError("多次重试后仍失败")
 
 
-    async def _arun_with_retry(self, coro_builder):
-        """异步调用，带重试"""
+    @profiled("llm.call")
+    async def _arun_with_retry(self, coro_builder, tokens: int = 0):
+        """异步调用，带重试；tokens 为本次请求的预估 token 数，用于 TPM 限流"""
         for attempt in range(self.max_retry):
+            if attempt:
+                profiler.count("llm.retry")
             try:
                 self.pool.ensure_clients()
-                coro = coro_builder()
-                return await coro
+                wait_start = time.perf_counter()
+                async with self.pool.alease(tokens) as key:
+                    start = time.perf_counter()
+                    # 限流排队与网络耗时分开统计
+                    profiler.record("llm.queue_wait", start - wait_start)
+                    try:
+                        with profiler.span("llm.network"):
+                            response = await coro_builder()
+                    except Exception as e:
+                        self._record_call(key, start, error=e)
+                        raise
+                    self._record_call(key, start, response=response)
+                    return response
             except (APIError, APIConnectionError, RateLimitError) as e:
-                should_retry = self.pool.handle_api_error(e)
+                should_retry = self.pool.handle_api_error(e, getattr(e, "pool_key", None))
                 if should_retry:
                     continue
                 raise
@@ -160,6 +574,182 @@ class OpenAIBaseModel(BaseModel):
                 await asyncio.sleep(2 ** attempt)
         raise RuntimeError("多次重试后仍失败")
 
+    async def _aiter_bounded(
+        self,
+        jobs: Sequence[Callable[[], Awaitable[Any]]],
+        max_concurrency: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        有界并发地执行 jobs（每项为一个无参协程工厂，内部自行完成重试），
+        按输入顺序逐个产出 (index, 结果)。某一项最终失败时产出的结果是异常对象，
+        不会影响其它项。最多 max_concurrency 个请求同时在途。
+        """
+        if not jobs:
+            return
+        limit = max(1, min(max_concurrency or self.max_concurrency, len(jobs)))
+        pending = iter(enumerate(jobs))
+        completed: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            for idx, job in pending:
+                try:
+                    result = await job()
+                except Exception as e:
+                    result = e
+                completed.put_nowait((idx, result))
+
+        workers = [asyncio.create_task(worker()) for _ in range(limit)]
+        buffer: Dict[int, Any] = {}
+        try:
+            for next_idx in range(len(jobs)):
+                # 先完成的结果暂存，保证按输入顺序产出
+                while next_idx not in buffer:
+                    idx, result = await completed.get()
+                    buffer[idx] = result
+                yield next_idx, buffer.pop(next_idx)
+        finally:
+            # 调用方提前退出迭代时取消剩余请求
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _agather(
+        self,
+        jobs: Sequence[Callable[[], Awaitable[Any]]],
+        max_concurrency: Optional[int] = None,
+    ) -> List[Any]:
+        """收集 _aiter_bounded 的全部结果，顺序与 jobs 一致，失败项为异常对象"""
+        return [result async for _, result in self._aiter_bounded(jobs, max_concurrency)]
+
+    def _estimate_chat_tokens(self, prompts: Sequence[str]) -> int:
+        """Chat 请求的 TPM 预算：prompt 估计值 + max_tokens（与服务端计费口径一致）"""
+        max_tokens = getattr(self.args, "max_tokens", 0) or 0
+        return sum(estimate_tokens(p) for p in prompts) + max_tokens
+
+    # ------------------------------------------------------------------
+    # Chat 接口调用（OpenAIChat / OpenAICompletion 共用），带响应缓存
+    # ------------------------------------------------------------------
+
+    def _request_kwargs(self) -> Dict[str, Any]:
+        """除 model 外发送给 chat.completions.create 的采样参数"""
+        return {k: v for k, v in self.args.model_dump().items() if k != "model"}
+
+    def _cache_key(self, messages: List[Dict[str, str]]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        request_kwargs = self._request_kwargs()
+        if not self.cache.enabled_for(request_kwargs):
+            return None
+        return cache_key(self.args.model, messages, request_kwargs)
+
+    def _cache_load(self, key: Optional[str]) -> Optional[ChatCompletion]:
+        if key is None:
+            return None
+        value = self.cache.get(key)
+        if value is None:
+            return None
+        if self.metrics is not None:
+            self.metrics.record_cache_hit(self.args.model)
+        return ChatCompletion.model_validate_json(value)
+
+    def _cache_store(self, key: Optional[str], response: ChatCompletion):
+        if key is not None:
+            self.cache.put(key, response.model_dump_json())
+
+    def _chat_create(self, messages: List[Dict[str, str]]) -> ChatCompletion:
+        """同步调用 chat 接口；缓存命中时不发请求、也不占用限流额度"""
+        key = self._cache_key(messages)
+        cached = self._cache_load(key)
+        if cached is not None:
+            return cached
+
+        def _call():
+            return self.pool.client.chat.completions.create(
+                model=self.args.model,
+                messages=messages,
+                **self._request_kwargs(),
+            )
+
+        response = self._run_with_retry(
+            _call, tokens=self._estimate_chat_tokens([m["content"] for m in messages])
+        )
+        self._cache_store(key, response)
+        return response
+
+    async def _achat_create(self, messages: List[Dict[str, str]]) -> ChatCompletion:
+        """异步调用 chat 接口；缓存命中时不发请求、也不占用限流额度"""
+        key = self._cache_key(messages)
+        cached = self._cache_load(key)
+        if cached is not None:
+            return cached
+
+        def _call():
+            return self.pool.async_client.chat.completions.create(
+                model=self.args.model,
+                messages=messages,
+                **self._request_kwargs(),
+            )
+
+        response = await self._arun_with_retry(
+            _call, tokens=self._estimate_chat_tokens([m["content"] for m in messages])
+        )
+        self._cache_store(key, response)
+        return response
+
+    # ------------------------------------------------------------------
+    # 有界并发批量调用（OpenAIChat / OpenAICompletion 共用）
+    # ------------------------------------------------------------------
+
+    def _build_messages(self, prompts: Sequence[str]):
+        return [[{"role": "user", "content": p}] for p in prompts]
+
+    async def agenerate_response_without_construction(self, messages: List[List[Dict[str, str]]]):
+        """
+        每条消息独立重试，返回与输入等长的列表；
+        最终失败的位置是异常对象，其余位置是 ChatCompletion。
+        """
+        jobs = [lambda msg=msg: self._achat_create(msg) for msg in messages]
+        return await self._agather(jobs)
+
+    async def astream_batch_without_construction(
+        self,
+        messages: List[List[Dict[str, str]]],
+        max_concurrency: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        有界并发批量调用，按输入顺序流式产出 (index, ChatCompletion 或异常)。
+        每条消息独立重试，某一条失败不会让整批重发。
+        """
+        jobs = [lambda msg=msg: self._achat_create(msg) for msg in messages]
+        async for idx, result in self._aiter_bounded(jobs, max_concurrency):
+            yield idx, result
+
+    async def astream_batch(
+        self,
+        prompts: Sequence[str],
+        max_concurrency: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[int, Union[LLMResult, Exception]]]:
+        """同 astream_batch_without_construction，但输入为 prompt 字符串，产出 LLMResult"""
+        messages = self._build_messages(prompts)
+        async for idx, result in self.astream_batch_without_construction(messages, max_concurrency):
+            if isinstance(result, Exception):
+                yield idx, result
+                continue
+            yield idx, LLMResult(
+                content=result.choices[0].message.content,
+                send_tokens=result.usage.prompt_tokens,
+                recv_tokens=result.usage.completion_tokens,
+                total_tokens=result.usage.total_tokens,
+            )
+
+    async def abatch_generate_response(
+        self,
+        prompts: Sequence[str],
+        max_concurrency: Optional[int] = None,
+    ) -> List[Union[LLMResult, Exception]]:
+        """收集 astream_batch 的全部结果，顺序与 prompts 一致"""
+        return [result async for _, result in self.astream_batch(prompts, max_concurrency)]
+
 
 # ---------------------------------------------------------------------------
 # Completion
@@ -174,7 +764,18 @@ class OpenAICompletionArgs(OpenAIChatArgs):
 class OpenAICompletion(OpenAIBaseModel, BaseCompletionModel):
     args: OpenAICompletionArgs = Field(default_factory=OpenAICompletionArgs)
 
-    def __init__(self, api_key_list: Sequence[str], max_retry: int = 3, **kwargs):
+    def __init__(
+        self,
+        api_key_list: Sequence[str],
+        max_retry: int = 3,
+        max_concurrency: int = 32,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        multi_key: bool = False,
+        cache: Optional[ResponseCache] = None,
+        client_config: Optional[OpenAIClientConfig] = None,
+        **kwargs,
+    ):
 
         # 1. 处理旧模型（合理）
         if kwargs.get("model") == "text-davinci-003":
@@ -193,26 +794,24 @@ class OpenAICompletion(OpenAIBaseModel, BaseCompletionModel):
         super().__init__(
             args=args,
             max_retry=max_retry,
-            pool=OpenAIClientPool(api_key_list),
+            max_concurrency=max_concurrency,
+            pool=OpenAIClientPool(
+                api_key_list, rpm=rpm, tpm=tpm, multi_key=multi_key, config=client_config
+            ),
+            cache=cache,
         )
 
         self.args = args
 
 
-    def generate_response(self, prompt: str) -> LLMResult:
-        def _call():
-            # 将 Completion prompt 转换为 Chat message
-            messages = [{"role": "user", "content": prompt}]
-            
-            # 使用 Chat 接口
-            response = self.pool.client.chat.completions.create(
-                model=self.args.model,
-                messages=messages,
-                **{k: v for k, v in self.args.model_dump().items() if k != "model" and k != "best_of"},
-            )
-            return response
+    def _request_kwargs(self) -> Dict[str, Any]:
+        # best_of 只属于旧 Completion 接口，Chat 接口不接受
+        return {k: v for k, v in self.args.model_dump().items() if k != "model" and k != "best_of"}
 
-        response = self._run_with_retry(_call)
+    def generate_response(self, prompt: str) -> LLMResult:
+        # 将 Completion prompt 转换为 Chat message，使用 Chat 接口
+        messages = [{"role": "user", "content": prompt}]
+        response = self._chat_create(messages)
         return LLMResult(
             content=response.choices[0].message.content,
             send_tokens=response.usage.prompt_tokens,
@@ -221,15 +820,8 @@ class OpenAICompletion(OpenAIBaseModel, BaseCompletionModel):
         )
 
     async def agenerate_response(self, prompt: str):
-        async def _call():
-            messages = [{"role": "user", "content": prompt}]
-            return await self.pool.async_client.chat.completions.create(
-                model=self.args.model,
-                messages=messages,
-                **{k: v for k, v in self.args.model_dump().items() if k != "model" and k != "best_of"},
-            )
-
-        response = await self._arun_with_retry(_call)
+        messages = [{"role": "user", "content": prompt}]
+        response = await self._achat_create(messages)
         return [choice.message.content for choice in response.choices]
 
 
@@ -237,44 +829,301 @@ class OpenAICompletion(OpenAIBaseModel, BaseCompletionModel):
 # Embedding
 # ---------------------------------------------------------------------------
 
+class OpenAIEmbeddingArgs(BaseModelArgs):
+    model: str = Field(default="text-embedding-ada-002")
+
+
+def pack_batches(texts: Sequence[str], max_items: int, max_tokens: int) -> List[List[int]]:
+    """
+    按顺序把 texts 切分成若干批，每批不超过 max_items 条、预估不超过 max_tokens 个 token。
+    返回每批对应的下标列表；单条超过 max_tokens 的文本独占一批。
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for idx, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
 @llm_registry.register("embedding")
 class OpenAIEmbedding(OpenAIBaseModel, BaseCompletionModel):
-    def __init__(self, api_key_list: Sequence[str], max_retry: int = 3, **kwargs):
+    """
+    embeddings 接口支持一次传入多条 input，这里把多条文本按条数 / token 预算
+    打包成少量请求，再把向量按输入顺序还原。
+    """
+    args: OpenAIEmbeddingArgs = Field(default_factory=OpenAIEmbeddingArgs)
+    max_batch_items: int = 512
+    max_batch_tokens: int = 64000
+    store: Optional[EmbeddingStore] = None
+
+    def __init__(
+        self,
+        api_key_list: Sequence[str],
+        max_retry: int = 3,
+        max_concurrency: int = 32,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        multi_key: bool = False,
+        max_batch_items: int = 512,
+        max_batch_tokens: int = 64000,
+        store: Optional[EmbeddingStore] = None,
+        client_config: Optional[OpenAIClientConfig] = None,
+        **kwargs,
+    ):
+        default = OpenAIEmbeddingArgs().model_dump()
+        args = OpenAIEmbeddingArgs(**{**default, **kwargs})
+
         super().__init__(
-            args=BaseModelArgs(),
+            args=args,
             max_retry=max_retry,
-            pool=OpenAIClientPool(api_key_list),
+            max_concurrency=max_concurrency,
+            max_batch_items=max_batch_items,
+            max_batch_tokens=max_batch_tokens,
+            store=store,
+            pool=OpenAIClientPool(
+                api_key_list, rpm=rpm, tpm=tpm, multi_key=multi_key, config=client_config
+            ),
         )
+        self.args = args
 
-    def generate_response(self, prompt: str) -> LLMResult:
+    def _create_kwargs(self, inputs: Union[str, List[str]], as_array: bool) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {"model": self.args.model, "input": inputs}
+        if as_array:
+            # 显式指定 base64 时 SDK 不再解码成 float 列表，直接交给 numpy
+            kwargs["encoding_format"] = "base64"
+        return kwargs
+
+    @staticmethod
+    def _decode(embedding: Union[str, Sequence[float]]) -> np.ndarray:
+        if isinstance(embedding, str):
+            return np.frombuffer(base64.b64decode(embedding), dtype=np.float32)
+        return np.asarray(embedding, dtype=np.float32)
+
+    def generate_response(self, prompt: str, as_array: bool = False) -> LLMResult:
+        """as_array=True 时 content 为 float32 的一维 numpy 向量"""
         def _call():
-            return self.pool.client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=prompt,
-            )
+            return self.pool.client.embeddings.create(**self._create_kwargs(prompt, as_array))
+
+        if self.store is not None:
+            vector = self.store.get(self.args.model, prompt)
+            if vector is not None:
+                return LLMResult(
+                    content=vector if as_array else vector.tolist(),
+                    send_tokens=0,
+                    recv_tokens=0,
+                    total_tokens=0,
+                )
 
-        response = self._run_with_retry(_call)
+        response = self._run_with_retry(_call, tokens=estimate_tokens(prompt))
+        if self.store is not None:
+            self.store.put(self.args.model, prompt, self._decode(response.data[0].embedding))
+        send_tokens, _ = self._usage(response)
         return LLMResult(
-            content=response.data[0].embedding,
-            send_tokens=0,
+            content=self._decode(response.data[0].embedding) if as_array else response.data[0].embedding,
+            send_tokens=send_tokens,
             recv_tokens=0,
-            total_tokens=0,
+            total_tokens=send_tokens,
         )
 
-    async def agenerate_response(self, sentences: List[str]):
-        async def _call():
-            tasks = [
-                self.pool.async_client.embeddings.create(
-                    model="text-embedding-ada-002",
-                    input=sentence,
-                )
-                for sentence in sentences
-            ]
-            return await asyncio.gather(*tasks)
+    def _batches(self, sentences: Sequence[str]) -> List[List[int]]:
+        return pack_batches(sentences, self.max_batch_items, self.max_batch_tokens)
 
-        responses = await self._arun_with_retry(_call)
-        # 返回 dict 列表，与旧代码兼容
-        return [resp.model_dump() for resp in responses]
+    @staticmethod
+    def _scatter(
+        batches: List[List[int]],
+        responses: Sequence[Any],
+        n: int,
+    ) -> List[Any]:
+        """把每批响应中的向量按原始下标放回；失败批次的每个位置都放该批的异常"""
+        vectors: List[Any] = [None] * n
+        for indices, response in zip(batches, responses):
+            if isinstance(response, Exception):
+                for idx in indices:
+                    vectors[idx] = response
+                continue
+            for item in sorted(response.data, key=lambda d: d.index):
+                vectors[indices[item.index]] = item.embedding
+        return vectors
+
+    def _scatter_array(
+        self,
+        batches: List[List[int]],
+        responses: Sequence[Any],
+        n: int,
+    ) -> LLMResult:
+        """把各批向量写入一个连续的 (n, dim) float32 矩阵；任一批失败则抛出该异常"""
+        matrix: Optional[np.ndarray] = None
+        send_tokens = 0
+        for indices, response in zip(batches, responses):
+            if isinstance(response, Exception):
+                raise response
+            send_tokens += self._usage(response)[0]
+            for item in response.data:
+                vector = self._decode(item.embedding)
+                if matrix is None:
+                    matrix = np.empty((n, vector.shape[0]), dtype=np.float32)
+                matrix[indices[item.index]] = vector
+        if matrix is None:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        return LLMResult(
+            content=matrix,
+            send_tokens=send_tokens,
+            recv_tokens=0,
+            total_tokens=send_tokens,
+        )
+
+    def _merge_stored(
+        self,
+        sentences: Sequence[str],
+        cached: Optional[np.ndarray],
+        missing: List[int],
+        fetched: Optional[LLMResult],
+    ) -> LLMResult:
+        """把向量库命中的行与新请求到的行（float32 矩阵）合并，并把新向量写回向量库"""
+        if fetched is None:
+            return LLMResult(content=cached, send_tokens=0, recv_tokens=0, total_tokens=0)
+        self.store.put_many(self.args.model, [sentences[i] for i in missing], fetched.content)
+        if cached is None:
+            matrix = fetched.content
+        else:
+            cached[missing] = fetched.content
+            matrix = cached
+        return LLMResult(
+            content=matrix,
+            send_tokens=fetched.send_tokens,
+            recv_tokens=0,
+            total_tokens=fetched.total_tokens,
+        )
+
+    def generate_batch_response(self, sentences: Sequence[str], as_array: bool = False) -> LLMResult:
+        """
+        同步批量 embedding，content 为与 sentences 顺序一致的向量列表；
+        as_array=True 时 content 为 (n, dim) 的 float32 numpy 矩阵。
+        配置了向量库时先查库，只请求未命中的文本。
+        """
+        if self.store is None:
+            return self._embed_batch(sentences, as_array)
+        cached, missing = self.store.get_many(self.args.model, sentences)
+        fetched = self._embed_batch([sentences[i] for i in missing], as_array=True) if missing else None
+        result = self._merge_stored(sentences, cached, missing, fetched)
+        if not as_array:
+            result.content = result.content.tolist()
+        return result
+
+    def _embed_batch(self, sentences: Sequence[str], as_array: bool) -> LLMResult:
+        batches = self._batches(sentences)
+        responses = []
+        for indices in batches:
+            batch = [sentences[i] for i in indices]
+
+            def _call(batch=batch):
+                return self.pool.client.embeddings.create(**self._create_kwargs(batch, as_array))
+
+            responses.append(
+                self._run_with_retry(_call, tokens=sum(estimate_tokens(t) for t in batch))
+            )
+        if as_array:
+            return self._scatter_array(batches, responses, len(sentences))
+        send_tokens = sum(self._usage(r)[0] for r in responses)
+        return LLMResult(
+            content=self._scatter(batches, responses, len(sentences)),
+            send_tokens=send_tokens,
+            recv_tokens=0,
+            total_tokens=send_tokens,
+        )
+
+    async def agenerate_response(self, sentences: List[str]) -> List[Any]:
+        """
+        按条数 / token 预算打包成少量请求，每个请求独立重试；
+        返回与 sentences 等长的列表，每项为一条响应 dict（含 usage），
+        失败批次中的句子对应位置为异常对象。需要 numpy 矩阵时用 agenerate_array。
+        配置了向量库时先查库，只请求未命中的文本，命中的 usage 为 0。
+        """
+        if self.store is None:
+            return await self._aembed(sentences)
+        cached, missing = self.store.get_many(self.args.model, sentences)
+        fetched = await self._aembed([sentences[i] for i in missing]) if missing else []
+        ok = [(i, item) for i, item in zip(missing, fetched) if not isinstance(item, Exception)]
+        if ok:
+            self.store.put_many(
+                self.args.model,
+                [sentences[i] for i, _ in ok],
+                np.asarray([item["data"][0]["embedding"] for _, item in ok], dtype=np.float32),
+            )
+        results: List[Any] = [None] * len(sentences)
+        for i, item in zip(missing, fetched):
+            results[i] = item
+        for i in range(len(sentences)):
+            if results[i] is None:
+                results[i] = self._response_dict(cached[i].tolist(), 0)
+        return results
+
+    async def agenerate_array(self, sentences: Sequence[str]) -> LLMResult:
+        """
+        同 agenerate_response，但返回 LLMResult：content 为 (n, dim) 的 float32 numpy 矩阵，
+        send_tokens 为实际消耗的 token 数；任一批最终失败都会抛出异常。
+        """
+        if self.store is None:
+            return await self._aembed_array(sentences)
+        cached, missing = self.store.get_many(self.args.model, sentences)
+        fetched = await self._aembed_array([sentences[i] for i in missing]) if missing else None
+        return self._merge_stored(sentences, cached, missing, fetched)
+
+    def _response_dict(self, vector: List[float], tokens: int) -> Dict[str, Any]:
+        """与旧代码（每句一个响应的 model_dump）兼容的单条结果"""
+        return {
+            "object": "list",
+            "model": self.args.model,
+            "data": [{"object": "embedding", "index": 0, "embedding": vector}],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def _split_usage(self, batches: List[List[int]], responses: Sequence[Any], sentences: Sequence[str]) -> List[int]:
+        """把每批实际消耗的 token 按各句的预估值分摊，同一批分摊之和等于该批的实际用量"""
+        tokens = [0] * len(sentences)
+        for indices, response in zip(batches, responses):
+            if isinstance(response, Exception):
+                continue
+            total = self._usage(response)[0]
+            weights = [max(1, estimate_tokens(sentences[i])) for i in indices]
+            assigned = 0
+            for idx, weight in zip(indices[:-1], weights[:-1]):
+                tokens[idx] = total * weight // sum(weights)
+                assigned += tokens[idx]
+            tokens[indices[-1]] = total - assigned
+        return tokens
+
+    async def _arequest(self, sentences: Sequence[str], as_array: bool) -> Tuple[List[List[int]], List[Any]]:
+        batches = self._batches(sentences)
+        jobs = [
+            lambda batch=[sentences[i] for i in indices]: self._arun_with_retry(
+                lambda: self.pool.async_client.embeddings.create(**self._create_kwargs(batch, as_array)),
+                tokens=sum(estimate_tokens(t) for t in batch),
+            )
+            for indices in batches
+        ]
+        return batches, await self._agather(jobs)
+
+    async def _aembed(self, sentences: Sequence[str]) -> List[Any]:
+        batches, responses = await self._arequest(sentences, as_array=False)
+        vectors = self._scatter(batches, responses, len(sentences))
+        tokens = self._split_usage(batches, responses, sentences)
+        return [
+            vec if isinstance(vec, Exception) else self._response_dict(vec, tokens[i])
+            for i, vec in enumerate(vectors)
+        ]
+
+    async def _aembed_array(self, sentences: Sequence[str]) -> LLMResult:
+        batches, responses = await self._arequest(sentences, as_array=True)
+        return self._scatter_array(batches, responses, len(sentences))
 
 
 # ---------------------------------------------------------------------------
@@ -287,7 +1136,18 @@ class OpenAIEmbedding(OpenAIBaseModel, BaseCompletionModel):
 class OpenAIChat(OpenAIBaseModel, BaseChatModel):
     args: OpenAIChatArgs = Field(default_factory=OpenAIChatArgs)
 
-    def __init__(self, api_key_list: Sequence[str], max_retry: int = 3, **kwargs):
+    def __init__(
+        self,
+        api_key_list: Sequence[str],
+        max_retry: int = 3,
+        max_concurrency: int = 32,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        multi_key: bool = False,
+        cache: Optional[ResponseCache] = None,
+        client_config: Optional[OpenAIClientConfig] = None,
+        **kwargs,
+    ):
         # 1. 获取默认值
         default = OpenAIChatArgs().model_dump()
         
@@ -300,24 +1160,17 @@ class OpenAIChat(OpenAIBaseModel, BaseChatModel):
         super().__init__(
             args=args,
             max_retry=max_retry,
-            pool=OpenAIClientPool(api_key_list),
+            max_concurrency=max_concurrency,
+            pool=OpenAIClientPool(
+                api_key_list, rpm=rpm, tpm=tpm, multi_key=multi_key, config=client_config
+            ),
+            cache=cache,
         )
         self.args = args
 
-    def _build_messages(self, prompts: Sequence[str]):
-        return [[{"role": "user", "content": p}] for p in prompts]
-
     def generate_response(self, prompt: str) -> LLMResult:
-        def _call():
-            messages = self._build_messages([prompt])[0]
-            response = self.pool.client.chat.completions.create(
-                model=self.args.model,
-                messages=messages,
-                **{k: v for k, v in self.args.model_dump().items() if k != "model"},
-            )
-            return response
-
-        response = self._run_with_retry(_call)
+        messages = self._build_messages([prompt])[0]
+        response = self._chat_create(messages)
         return LLMResult(
             content=response.choices[0].message.content,
             send_tokens=response.usage.prompt_tokens,
@@ -326,27 +1179,103 @@ class OpenAIChat(OpenAIBaseModel, BaseChatModel):
         )
 
     async def agenerate_response(self, prompt: str):
-        async def _call():
-            messages = self._build_messages([prompt])[0]
-            return await self.pool.async_client.chat.completions.create(
-                model=self.args.model,
-                messages=messages,
-                **{k: v for k, v in self.args.model_dump().items() if k != "model"},
-            )
-
-        response = await self._arun_with_retry(_call)
+        messages = self._build_messages([prompt])[0]
+        response = await self._achat_create(messages)
         return [choice.message.content for choice in response.choices]
 
-    async def agenerate_response_without_construction(self, messages: List[List[Dict[str, str]]]):
-        async def _call():
-            tasks = [
-                self.pool.async_client.chat.completions.create(
-                    model=self.args.model,
-                    messages=msg,
-                    **{k: v for k, v in self.args.model_dump().items() if k != "model"},
-                )
-                for msg in messages
-            ]
-            return await asyncio.gather(*tasks)
+    # ------------------------------------------------------------------
+    # 流式输出
+    # ------------------------------------------------------------------
+
+    def _stream_kwargs(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {
+            "model": self.args.model,
+            "messages": messages,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+            **self._request_kwargs(),
+        }
+
+    @staticmethod
+    def _stream_delta(chunk: Any) -> Optional[str]:
+        """取第一个候选的文本增量；usage chunk 的 choices 为空"""
+        for choice in chunk.choices or []:
+            if choice.index == 0:
+                return choice.delta.content
+        return None
+
+    def _record_stream_usage(self, key: Any, prompt: str, received: List[str], usage_chunk: Any):
+        """
+        流式请求在建立连接时已计入请求数与延迟，这里补记 token。
+        提前取消时拿不到 usage，按已收到的文本估算。
+        """
+        if self.metrics is None:
+            return
+        if usage_chunk is not None:
+            prompt_tokens, completion_tokens = self._usage(usage_chunk)
+        else:
+            prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens("".join(received))
+        self.metrics.record_tokens(self.args.model, key, prompt_tokens, completion_tokens)
+
+    def stream_response(self, prompt: str) -> Iterator[str]:
+        """
+        流式生成，逐段产出文本增量。提前结束（对生成器调用 close()，
+        或用 RecommenderParser.parse_stream(cancel_after_choice=True)）会关闭连接，
+        服务端随即停止生成，剩下的 completion token 不再消耗。
+        缓存命中时一次性产出完整回复。
+        """
+        messages = self._build_messages([prompt])[0]
+        cached = self._cache_load(self._cache_key(messages))
+        if cached is not None:
+            yield cached.choices[0].message.content
+            return
+
+        leased: Dict[str, Any] = {}
+
+        def _call():
+            leased["key"] = self.pool._active_key()
+            return self.pool.client.chat.completions.create(**self._stream_kwargs(messages))
+
+        stream = self._run_with_retry(_call, tokens=self._estimate_chat_tokens([prompt]))
+        received: List[str] = []
+        usage_chunk = None
+        try:
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage_chunk = chunk
+                delta = self._stream_delta(chunk)
+                if delta:
+                    received.append(delta)
+                    yield delta
+        finally:
+            stream.close()
+            self._record_stream_usage(leased.get("key"), prompt, received, usage_chunk)
+
+    async def astream_response(self, prompt: str) -> AsyncIterator[str]:
+        """stream_response 的异步版本；提前结束时请 await 生成器的 aclose()"""
+        messages = self._build_messages([prompt])[0]
+        cached = self._cache_load(self._cache_key(messages))
+        if cached is not None:
+            yield cached.choices[0].message.content
+            return
+
+        leased: Dict[str, Any] = {}
+
+        def _call():
+            leased["key"] = self.pool._active_key()
+            return self.pool.async_client.chat.completions.create(**self._stream_kwargs(messages))
 
-        return await self._arun_with_retry(_call)
+        stream = await self._arun_with_retry(_call, tokens=self._estimate_chat_tokens([prompt]))
+        received: List[str] = []
+        usage_chunk = None
+        try:
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage_chunk = chunk
+                delta = self._stream_delta(chunk)
+                if delta:
+                    received.append(delta)
+                    yield delta
+        finally:
+            await stream.close()
+            self._record_stream_usage(leased.get("key"), prompt, received, usage_chunk)
@@ -0,0 +1,85 @@
+"""
+按 key 的令牌桶限流器
+
+每个 API key 各自维护两个桶：
+- 请求桶：容量 = rpm, 每秒补充 rpm / 60
+- token 桶：容量 = tpm, 每秒补充 tpm / 60
+
+采用"预约"语义：reserve() 立即扣减额度（允许透支为负数），
+返回需要等待的秒数。这样同步 / 异步路径共用同一份状态，
+并且并发请求按到达顺序排队，不会出现忙等或惊群。
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from typing import Optional
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数（约 4 个字符 1 个 token），仅用于限流预算"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / 4)
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_sec: float):
+        if capacity <= 0 or refill_per_sec <= 0:
+            raise ValueError("TokenBucket 的 capacity 和 refill_per_sec 必须为正数")
+        self.capacity = float(capacity)
+        self.refill_per_sec = float(refill_per_sec)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_sec)
+            self.updated_at = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """扣减 amount 个令牌，返回需要等待的秒数（0 表示可以立即发送）"""
+        # 单次请求超过桶容量时按容量计，避免永远等不到
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.refill_per_sec
+
+
+class KeyRateLimiter:
+    """单个 key 的 RPM / TPM 限流器，任一维度为 None 表示不限制"""
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.request_bucket = TokenBucket(rpm, rpm / 60.0) if rpm else None
+        self.token_bucket = TokenBucket(tpm, tpm / 60.0) if tpm else None
+
+    def reserve(self, tokens: int = 0) -> float:
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket is not None and tokens > 0:
+            wait = max(wait, self.token_bucket.reserve(tokens))
+        return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """同步等待直到预算允许发送，返回实际等待的秒数"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        """异步等待直到预算允许发送，返回实际等待的秒数"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
@@ -0,0 +1,227 @@
+"""
+LLM 调用的 token / 费用 / 延迟统计
+
+所有 OpenAI 模型默认向进程级的 llm_metrics 汇报，每次调用记录：
+- 请求数 / 错误数（按错误类型）/ 缓存命中数
+- prompt / completion token 数，配置了单价时累计费用（美元）
+- 延迟直方图（只统计网络耗时，不含限流排队）
+标签为 model、key（脱敏）、call_site。call_site 通过上下文设置：
+
+    with call_site("user_forward"):
+        await llm.agenerate_response(prompt)
+
+snapshot() / to_json() / to_prometheus() 导出当前快照。
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_call_site: ContextVar[str] = ContextVar("llm_call_site", default="default")
+
+
+@contextmanager
+def call_site(name: str):
+    """在此上下文中发起的 LLM 调用都记在 call_site=name 下"""
+    token = _call_site.set(name)
+    try:
+        yield
+    finally:
+        _call_site.reset(token)
+
+
+def current_call_site() -> str:
+    return _call_site.get()
+
+
+def mask_key(api_key: Any) -> str:
+    if not isinstance(api_key, str) or not api_key:
+        return "unknown"
+    return f"...{api_key[-4:]}"
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, running = [], 0
+        for count in self.counts:
+            running += count
+            cumulative.append(running)
+        return {
+            "buckets": {str(b): c for b, c in zip(list(self.buckets) + ["+Inf"], cumulative)},
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+class MetricsCollector:
+    def __init__(self, latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.latency_buckets = tuple(latency_buckets)
+        # 单价：model -> (每 1K prompt token 美元, 每 1K completion token 美元)
+        self.prices: Dict[str, Tuple[float, float]] = {}
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _labels(labels: Dict[str, Any]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def set_price(self, model: str, prompt_per_1k: float, completion_per_1k: float):
+        self.prices[model] = (prompt_per_1k, completion_per_1k)
+
+    # ------------------------------------------------------------------
+    # 通用接口
+    # ------------------------------------------------------------------
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, self._labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.latency_buckets)
+            histogram.observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        """按标签子集汇总某个计数器，例如 counter("llm_prompt_tokens_total", model="gpt-4")"""
+        wanted = set(self._labels(labels))
+        with self._lock:
+            return sum(
+                value for (n, key), value in self._counters.items()
+                if n == name and wanted <= set(key)
+            )
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # ------------------------------------------------------------------
+    # LLM 调用
+    # ------------------------------------------------------------------
+
+    def record_llm_call(
+        self,
+        model: str,
+        api_key: Any,
+        latency: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        error: Optional[BaseException] = None,
+    ):
+        labels = {"model": model, "key": mask_key(api_key), "call_site": current_call_site()}
+        self.inc("llm_requests_total", **labels)
+        self.observe("llm_latency_seconds", latency, model=model, call_site=labels["call_site"])
+        if error is not None:
+            self.inc("llm_errors_total", error=type(error).__name__, **labels)
+            return
+        self.record_tokens(model, api_key, prompt_tokens, completion_tokens)
+
+    def record_tokens(self, model: str, api_key: Any, prompt_tokens: int = 0, completion_tokens: int = 0):
+        """只记 token 与费用；流式响应在读完（或取消）之后才知道用量"""
+        labels = {"model": model, "key": mask_key(api_key), "call_site": current_call_site()}
+        if prompt_tokens:
+            self.inc("llm_prompt_tokens_total", prompt_tokens, **labels)
+        if completion_tokens:
+            self.inc("llm_completion_tokens_total", completion_tokens, **labels)
+        price = self.prices.get(model)
+        if price is not None:
+            cost = prompt_tokens / 1000 * price[0] + completion_tokens / 1000 * price[1]
+            self.inc("llm_cost_usd_total", cost, **labels)
+
+    def record_cache_hit(self, model: str):
+        self.inc("llm_cache_hits_total", model=model, call_site=current_call_site())
+
+    # ------------------------------------------------------------------
+    # 输出解析
+    # ------------------------------------------------------------------
+
+    def record_parse(self, parser: str, method: str, attempt: int, total: int, failures: int):
+        """attempt 为 0 表示首次发送，之后每次重问加 1"""
+        labels = {"parser": parser, "method": method, "attempt": attempt}
+        self.inc("llm_parse_total", total, **labels)
+        if failures:
+            self.inc("llm_parse_failures_total", failures, **labels)
+
+    def parse_failure_rate(self, **labels) -> float:
+        """按标签子集计算解析失败率，例如 parse_failure_rate(parser="RecommenderParser", attempt=0)"""
+        total = self.counter("llm_parse_total", **labels)
+        return self.counter("llm_parse_failures_total", **labels) / total if total else 0.0
+
+    # ------------------------------------------------------------------
+    # 导出
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {"name": name, "labels": dict(labels), **histogram.to_dict()}
+                for (name, labels), histogram in sorted(self._histograms.items(), key=lambda x: x[0])
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, **kwargs)
+
+    def to_prometheus(self, prefix: str = "agentverse_") -> str:
+        """Prometheus 文本格式（exposition format 0.0.4）"""
+
+        def fmt(labels: Dict[str, str]) -> str:
+            if not labels:
+                return ""
+            escaped = (
+                k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+                for k, v in labels.items()
+            )
+            return "{" + ",".join(escaped) + "}"
+
+        snapshot = self.snapshot()
+        lines: List[str] = []
+        seen = set()
+        for c in snapshot["counters"]:
+            name = prefix + c["name"]
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{fmt(c['labels'])} {c['value']}")
+        for h in snapshot["histograms"]:
+            name = prefix + h["name"]
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            for le, count in h["buckets"].items():
+                lines.append(f"{name}_bucket{fmt({**h['labels'], 'le': le})} {count}")
+            lines.append(f"{name}_sum{fmt(h['labels'])} {h['sum']}")
+            lines.append(f"{name}_count{fmt(h['labels'])} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+
+# 进程级默认收集器，所有 OpenAI 模型默认向它汇报
+llm_metrics = MetricsCollector()
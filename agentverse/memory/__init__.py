@@ -3,3 +3,5 @@ from agentverse.registry import Registry
 memory_registry = Registry(name="MemoryRegistry")
 
 from .base import BaseMemory
+from .sliding_window import SlidingWindowMemory
+from .retrieval import RetrievalMemory
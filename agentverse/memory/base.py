@@ -1,22 +1,118 @@
+import functools
+import inspect
+import threading
 from abc import ABC, abstractmethod
-from typing import List
+from collections import deque
+from typing import Any, ClassVar, Deque, Dict, List, Tuple
+
+from pydantic import BaseModel, PrivateAttr
+
+class _InstanceLock:
+    """可 pickle / 深拷贝的 RLock，复制出的记忆拿到一把新锁（ShardedRunner 会跨进程传递 agent 状态）"""
+    __slots__ = ("_lock",)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._lock.__exit__(*exc_info)
+
+    def __reduce__(self):
+        return (_InstanceLock, ())
+
+    def __deepcopy__(self, memo):
+        return _InstanceLock()
 
-from pydantic import BaseModel 
 
 class BaseMemory(BaseModel, ABC):
     """
     Base class for all memory classes.
+
+    并发约定：add_message / to_string 本身不保证线程安全。
+    并发写入请用 aadd_message：它只把消息追加到收件箱（deque.append 是原子操作），
+    不加锁，多个 agent 协程或线程可以同时写；读之前由 flush() 在实例锁内按追加顺序
+    并入记忆。子类的 to_string 与 add_message 会被自动包装为在实例锁内先 flush，
+    因此同步读能看到异步写入的内容，同步写也排在此前的异步写入之后。
+    子类的 reset 需要在实例锁内清空收件箱。
     """
 
+    # 指向共享 LLM / embedder 的字段：它们持有连接池与锁，pickle 时不写出，
+    # 由 BaseAgent.load_state 从 factory 新建的记忆上沿用（见 AgentStore / ShardedRunner）
+    handle_fields: ClassVar[Tuple[str, ...]] = ()
+
+    _inbox: Deque[List[str]] = PrivateAttr(default_factory=deque)
+    _lock: _InstanceLock = PrivateAttr(default_factory=_InstanceLock)
+    # flush 内部调用 add_message 时不再嵌套 flush，否则后追加的批次会先并入
+    _flushing: bool = PrivateAttr(default=False)
+
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs):
+        super().__pydantic_init_subclass__(**kwargs)
+        for name in ("to_string", "add_message"):
+            attr = vars(cls).get(name)
+            if inspect.isfunction(attr) and not getattr(attr, "__flushes__", False):
+                setattr(cls, name, _flush_first(attr))
+
     @abstractmethod
     def add_message(self, messages: List[str]) -> None:
         pass
-    
+
     @abstractmethod
     def to_string(self) -> str:
         pass
-    
+
     @abstractmethod
     def reset(self) -> None:
         pass
-    
\ No newline at end of file
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = super().__getstate__()
+        fields = state["__dict__"]
+        if any(fields.get(name) is not None for name in self.handle_fields):
+            state["__dict__"] = {**fields, **{name: None for name in self.handle_fields}}
+        return state
+
+    def adopt_handles(self, other: "BaseMemory") -> None:
+        """本记忆上为空的共享句柄字段沿用 other 的"""
+        for name in self.handle_fields:
+            if getattr(self, name, None) is None:
+                setattr(self, name, getattr(other, name, None))
+
+    async def aadd_message(self, messages: List[str]) -> None:
+        """只追加，不加锁，也不会挂起"""
+        self._inbox.append(list(messages))
+
+    def flush(self) -> None:
+        """把收件箱中的消息按追加顺序并入记忆"""
+        if not self._inbox:
+            return
+        with self._lock:
+            self._flushing = True
+            try:
+                while True:
+                    try:
+                        batch = self._inbox.popleft()
+                    except IndexError:
+                        return
+                    self.add_message(batch)
+            finally:
+                self._flushing = False
+
+    async def ato_string(self, *args, **kwargs) -> str:
+        """默认实现直接调用 to_string；需要调用 LLM 的子类应覆盖为异步实现"""
+        return self.to_string(*args, **kwargs)
+
+
+def _flush_first(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # 读写与并入互斥，写入方（aadd_message）不受影响
+        with self._lock:
+            if self._inbox and not self._flushing:
+                self.flush()
+            return method(self, *args, **kwargs)
+    wrapper.__flushes__ = True
+    return wrapper
@@ -0,0 +1,146 @@
+"""
+按相关性检索的记忆：每条消息通过 embedder（OpenAIEmbedding）编码成向量，
+归一化后存进一块连续的 float32 矩阵，查询时只取与 query 最相关的 top-k 条，
+并在 token 预算内拼成 prompt 片段。
+
+- add_message 不调用 embedder：新消息等到第一次带 query 的查询时才编码，
+  且与 query 本身合成一次批量请求
+- 矩阵按容量翻倍增长，追加是摊还 O(1)，检索直接对前 n 行做一次矩阵乘
+- 不带 query 的 to_string 在预算内返回最近的消息，不需要向量
+- 输出保持消息的写入顺序，方便 LLM 理解先后关系
+"""
+from typing import Any, ClassVar, List, Optional, Tuple
+
+import numpy as np
+from pydantic import Field, PrivateAttr
+
+from agentverse.embedding_utils import normalize, top_k_nearest_neighbors
+from agentverse.llms.base import BaseLLM
+from agentverse.llms.rate_limit import estimate_tokens
+from agentverse.memory import memory_registry
+from agentverse.memory.base import BaseMemory
+
+
+@memory_registry.register("retrieval")
+class RetrievalMemory(BaseMemory):
+    handle_fields: ClassVar[Tuple[str, ...]] = ("embedder",)
+
+    embedder: Optional[BaseLLM] = None
+    k: int = Field(default=5)
+    max_tokens: int = Field(default=512)
+    separator: str = Field(default="\n")
+    initial_capacity: int = Field(default=64)
+
+    messages: List[str] = Field(default_factory=list)
+
+    _tokens: List[int] = PrivateAttr(default_factory=list)
+    _matrix: Optional[np.ndarray] = PrivateAttr(default=None)
+    _embedded: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._tokens = [estimate_tokens(m) for m in self.messages]
+
+    def add_message(self, messages: List[str]) -> None:
+        self.messages.extend(messages)
+        self._tokens.extend(estimate_tokens(m) for m in messages)
+
+    @property
+    def embedded(self) -> int:
+        """已经编码进矩阵的消息条数，其后的消息还在等待编码"""
+        return self._embedded
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """已编码消息的归一化向量，形状为 (embedded, dim)"""
+        if self._matrix is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._matrix[:self._embedded]
+
+    def _pending_batch(self, query: str) -> Tuple[int, List[str]]:
+        start = self._embedded
+        return start, self.messages[start:] + [query]
+
+    def _append_vectors(self, vectors: np.ndarray) -> None:
+        vectors = normalize(vectors)
+        n, dim = vectors.shape
+        if self._matrix is None:
+            self._matrix = np.empty((max(self.initial_capacity, n), dim), dtype=np.float32)
+        elif self._embedded + n > len(self._matrix):
+            grown = np.empty((max(2 * len(self._matrix), self._embedded + n), dim), dtype=np.float32)
+            grown[:self._embedded] = self._matrix[:self._embedded]
+            self._matrix = grown
+        self._matrix[self._embedded:self._embedded + n] = vectors
+        self._embedded += n
+
+    def _absorb(self, start: int, embedded: np.ndarray) -> np.ndarray:
+        """
+        把批量编码结果中从 start 开始的消息向量写入矩阵，返回最后一行（query 向量）。
+        并发的查询可能已经写入了其中一部分，只追加还没写入的行。
+        """
+        embedded = np.asarray(embedded, dtype=np.float32)
+        skip = self._embedded - start
+        if 0 <= skip < len(embedded) - 1:
+            self._append_vectors(embedded[skip:-1])
+        return embedded[-1]
+
+    def _select(self, query_vector: np.ndarray, k: Optional[int], max_tokens: Optional[int]) -> List[int]:
+        k = self.k if k is None else k
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        if self._embedded == 0 or k <= 0:
+            return []
+        indices, _ = top_k_nearest_neighbors(
+            normalize(query_vector), self.vectors, k, normalized=True
+        )
+        # 按相关性从高到低装入预算，装不下的跳过，继续尝试更短的
+        chosen, used = [], 0
+        for idx in indices[0].tolist():
+            if used + self._tokens[idx] <= budget:
+                chosen.append(idx)
+                used += self._tokens[idx]
+        return sorted(chosen)
+
+    def retrieve(self, query: str, k: Optional[int] = None, max_tokens: Optional[int] = None) -> List[str]:
+        """与 query 最相关的至多 k 条消息，总 token 不超过 max_tokens，按写入顺序返回"""
+        self.flush()
+        if not self.messages:
+            return []
+        start, batch = self._pending_batch(query)
+        result = self.embedder.generate_batch_response(batch, as_array=True)
+        query_vector = self._absorb(start, result.content)
+        return [self.messages[i] for i in self._select(query_vector, k, max_tokens)]
+
+    async def aretrieve(self, query: str, k: Optional[int] = None, max_tokens: Optional[int] = None) -> List[str]:
+        self.flush()
+        if not self.messages:
+            return []
+        start, batch = self._pending_batch(query)
+        result = await self.embedder.agenerate_array(batch)
+        query_vector = self._absorb(start, result.content)
+        return [self.messages[i] for i in self._select(query_vector, k, max_tokens)]
+
+    def _recent(self, max_tokens: Optional[int]) -> List[str]:
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        start, used = len(self.messages), 0
+        while start > 0 and used + self._tokens[start - 1] <= budget:
+            start -= 1
+            used += self._tokens[start]
+        return self.messages[start:]
+
+    def to_string(self, query: Optional[str] = None, k: Optional[int] = None, max_tokens: Optional[int] = None) -> str:
+        """带 query 时返回检索结果，否则返回预算内最近的消息"""
+        if query is None:
+            return self.separator.join(self._recent(max_tokens))
+        return self.separator.join(self.retrieve(query, k, max_tokens))
+
+    async def ato_string(self, query: Optional[str] = None, k: Optional[int] = None, max_tokens: Optional[int] = None) -> str:
+        if query is None:
+            return self.to_string(max_tokens=max_tokens)
+        return self.separator.join(await self.aretrieve(query, k, max_tokens))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._inbox.clear()
+            self.messages.clear()
+            self._tokens.clear()
+            self._matrix = None
+            self._embedded = 0
@@ -0,0 +1,196 @@
+"""
+固定 token 预算的滑动窗口记忆：窗口内的消息超出 max_tokens 后，把最早的消息移出窗口，
+等待并入一段滚动摘要。摘要由 LLM 生成、用 UserAgentParser.parse_summary 解析：
+
+- add_message 只做移出，不调用 LLM，写入开销与历史长度无关
+- 一次移出到 low_watermark * max_tokens 以下，摘要按块生成而不是每条消息一次
+- asummarize(memories) 把多个记忆的待摘要内容合成一次批量调用；
+  单个记忆在 to_string / summarize 时同步补做
+- 没有配置 llm 时退化为纯滑动窗口，移出的消息直接丢弃
+- to_string 的结果会缓存，只有内容变化时才重新拼接
+- ato_string 只通过异步接口生成摘要；同一个记忆上并发的摘要请求只有第一个结果生效
+"""
+import asyncio
+from typing import Any, ClassVar, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import Field, PrivateAttr
+
+from agentverse.llms.base import BaseLLM, abatch_generate
+from agentverse.llms.rate_limit import estimate_tokens
+from agentverse.memory import memory_registry
+from agentverse.memory.base import BaseMemory
+from agentverse.tasks.recommendation.output_parser import UserAgentParser
+
+SUMMARY_PROMPT = (
+    "Below is a summary of your earlier interactions followed by newer interactions.\n"
+    "Previous summary:\n{summary}\n\n"
+    "Newer interactions:\n{messages}\n\n"
+    "Rewrite the summary so that it covers all of the above in at most {summary_words} words. "
+    "Only output the summary."
+)
+
+_parser = UserAgentParser()
+
+
+@memory_registry.register("sliding_window")
+class SlidingWindowMemory(BaseMemory):
+    handle_fields: ClassVar[Tuple[str, ...]] = ("llm",)
+
+    llm: Optional[BaseLLM] = None
+    max_tokens: int = Field(default=1024)
+    # 超出预算后移出到 low_watermark * max_tokens 以下
+    low_watermark: float = Field(default=0.5)
+    summary_words: int = Field(default=150)
+    summary_prompt: str = Field(default=SUMMARY_PROMPT)
+    separator: str = Field(default="\n")
+
+    messages: List[str] = Field(default_factory=list)
+    summary: str = Field(default="")
+    # 已移出窗口、还没并入摘要的消息
+    pending: List[str] = Field(default_factory=list)
+
+    _tokens: List[int] = PrivateAttr(default_factory=list)
+    _window_tokens: int = PrivateAttr(default=0)
+    _cache: Optional[str] = PrivateAttr(default=None)
+    # 每次替换摘要加 1；并发生成的摘要只有第一个生效
+    _summary_version: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._tokens = [estimate_tokens(m) for m in self.messages]
+        self._window_tokens = sum(self._tokens)
+
+    def add_message(self, messages: List[str]) -> None:
+        for message in messages:
+            tokens = estimate_tokens(message)
+            self.messages.append(message)
+            self._tokens.append(tokens)
+            self._window_tokens += tokens
+        if self._window_tokens > self.max_tokens:
+            self._evict()
+        self._cache = None
+
+    def _evict(self):
+        target = int(self.max_tokens * self.low_watermark)
+        # 至少保留最新的一条
+        cut = 0
+        while cut < len(self.messages) - 1 and self._window_tokens > target:
+            self._window_tokens -= self._tokens[cut]
+            cut += 1
+        if self.llm is not None:
+            self.pending.extend(self.messages[:cut])
+        del self.messages[:cut]
+        del self._tokens[:cut]
+
+    def summary_request(self) -> Optional[str]:
+        """并入待摘要消息所需的 prompt；没有待摘要内容时返回 None"""
+        if not self.pending:
+            return None
+        return self.summary_prompt.format(
+            summary=self.summary or "(none)",
+            messages=self.separator.join(self.pending),
+            summary_words=self.summary_words,
+        )
+
+    @property
+    def summary_version(self) -> int:
+        return self._summary_version
+
+    def apply_summary(self, summary: str, folded: int, version: Optional[int] = None) -> bool:
+        """
+        用新摘要替换旧摘要，并丢掉生成它时已并入的前 folded 条待摘要消息。
+        version 为发出请求时的 summary_version；期间摘要已被别的请求替换时放弃，返回 False。
+        """
+        with self._lock:
+            if version is not None and version != self._summary_version:
+                return False
+            self.summary = summary
+            del self.pending[:folded]
+            self._summary_version += 1
+            self._cache = None
+            return True
+
+    def summarize(self) -> None:
+        prompt = self.summary_request()
+        if prompt is None:
+            return
+        folded, version = len(self.pending), self._summary_version
+        self.apply_summary(_parser.parse_summary(self.llm.generate_response(prompt)), folded, version)
+
+    def to_string(self) -> str:
+        if self.pending and self.llm is not None:
+            self.summarize()
+        return self._render()
+
+    def _render(self) -> str:
+        if self._cache is None:
+            parts = [self.summary] if self.summary else []
+            parts.extend(self.messages)
+            self._cache = self.separator.join(parts)
+        return self._cache
+
+    async def ato_string(self) -> str:
+        """
+        待摘要的内容通过异步接口生成摘要，不阻塞事件循环，也不会退回同步的 summarize。
+        等待期间新写入的消息再被移出时继续摘要，直到没有待摘要内容；摘要失败时抛出异常。
+        """
+        while True:
+            self.flush()
+            if not self.pending or self.llm is None:
+                return self._render()
+            errors = await _asummarize([self])
+            if errors:
+                raise errors[0]
+
+    @property
+    def window_tokens(self) -> int:
+        return self._window_tokens
+
+    def reset(self) -> None:
+        with self._lock:
+            self._inbox.clear()
+            self.messages.clear()
+            self.pending.clear()
+            self._tokens.clear()
+            self._window_tokens = 0
+            self.summary = ""
+            self._summary_version += 1
+            self._cache = None
+
+
+async def asummarize(memories: Sequence[SlidingWindowMemory], max_concurrency: Optional[int] = None) -> List[int]:
+    """
+    为所有有待摘要内容的记忆生成摘要，同一个 LLM 的请求合成一批发送、一次批量解析。
+    返回摘要失败的记忆下标，它们的待摘要消息保留，下次再试。
+    """
+    return sorted(await _asummarize(memories, max_concurrency))
+
+
+async def _asummarize(
+    memories: Sequence[SlidingWindowMemory], max_concurrency: Optional[int] = None
+) -> Dict[int, BaseException]:
+    """同 asummarize，返回 {失败的记忆下标: 异常}"""
+    groups: Dict[int, List[int]] = {}
+    requests: Dict[int, tuple] = {}
+    for idx, memory in enumerate(memories):
+        prompt = memory.summary_request()
+        if prompt is not None and memory.llm is not None:
+            requests[idx] = (prompt, len(memory.pending), memory.summary_version)
+            groups.setdefault(id(memory.llm), []).append(idx)
+
+    async def run(indices: List[int]) -> Dict[int, BaseException]:
+        llm = memories[indices[0]].llm
+        prompts = [requests[idx][0] for idx in indices]
+        outputs = await abatch_generate(llm, prompts, max_concurrency)
+        parsed = _parser.parse_batch(outputs, method="parse_summary")
+        failed = {}
+        for idx, value, error in zip(indices, parsed.values, parsed.errors):
+            if error is None:
+                memories[idx].apply_summary(value, *requests[idx][1:])
+            else:
+                failed[idx] = error
+        return failed
+
+    errors: Dict[int, BaseException] = {}
+    for failed in await asyncio.gather(*(run(indices) for indices in groups.values())):
+        errors.update(failed)
+    return errors
@@ -1,11 +1,91 @@
 from agentverse.registry import Registry
-from typing import NamedTuple
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 from abc import abstractmethod, ABC
 from agentverse.llms.base import LLMResult
 from pydantic import BaseModel
+from agentverse.profiling import profiled, profiler
 
 output_parser_registry = Registry(name="OutputParserRegistry")
 
+def clean_output(text: str) -> str:
+    """
+    去掉首尾空白并把连续换行合并为一个，等价于 re.sub(r"\n+", "\n", text.strip())。
+    首尾已无换行，按换行切分后丢掉空段再拼回即可，比正则替换快数倍。
+    """
+    text = text.strip()
+    if "\n\n" in text:
+        text = "\n".join([line for line in text.split("\n") if line])
+    return text
+
+
+class Marker(NamedTuple):
+    text: str
+    # 段落内容相对标记起点的偏移；为空时紧跟在标记之后
+    skip: Optional[int] = None
+
+
+class Sections:
+    """SectionExtractor.scan() 的结果：清洗后的文本与每个标记第一次出现的位置"""
+    __slots__ = ("text", "_positions", "_offsets")
+
+    def __init__(self, text: str, positions: Dict[str, int], offsets: Dict[str, int]):
+        self.text = text
+        self._positions = positions
+        self._offsets = offsets
+
+    def found(self, name: str) -> bool:
+        return name in self._positions
+
+    def section(self, name: str, until: Optional[str] = None, default: int = 0) -> str:
+        """
+        name 标记之后到 until 标记之前的文本（until 为空时到结尾）。
+        name 未出现时从 default 开始；until 必须已出现，调用前请先检查 found()。
+        """
+        pos = self._positions.get(name)
+        begin = default if pos is None else pos + self._offsets[name]
+        if until is None:
+            return self.text[begin:]
+        return self.text[begin:self._positions[until]]
+
+
+class SectionExtractor:
+    """
+    声明式分段抽取：解析器声明自己的标记，构造时编译成 (名称, 标记, 内容偏移) 的查找表，
+    scan() 只做一次文本清洗，每个标记只查找一次第一次出现的位置。
+
+        decision = SectionExtractor(
+            choice=Marker("Choice", len("Choice:")),
+            explanation=Marker("Explanation", len("Explanation:")),
+        )
+        sections = decision.scan(output.content)
+        sections.section("choice", until="explanation")
+
+    查找用 str.find 而不是把标记拼成一个正则：CPython 的正则对多选分支
+    没有快速跳跃，实测比逐个 find 慢约 5 倍。
+    """
+
+    def __init__(self, **markers: Marker):
+        self.markers: Dict[str, Marker] = {
+            name: m if isinstance(m, Marker) else Marker(*m) for name, m in markers.items()
+        }
+        self._plan: Tuple[Tuple[str, str], ...] = tuple((name, m.text) for name, m in self.markers.items())
+        self._offsets: Dict[str, int] = {
+            name: len(m.text) if m.skip is None else m.skip for name, m in self.markers.items()
+        }
+
+    def scan(self, text: str) -> Sections:
+        cleaned = clean_output(text)
+        positions: Dict[str, int] = {}
+        for name, marker in self._plan:
+            pos = cleaned.find(marker)
+            if pos >= 0:
+                positions[name] = pos
+        return Sections(cleaned, positions, self._offsets)
+
+
 class OutputParserError(Exception):
     """Exception raised when parsing output from a command fails."""
 
@@ -18,6 +98,106 @@ class OutputParserError(Exception):
 class OutputParser(BaseModel, ABC):
     """Base class for output parsers."""
 
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs):
+        super().__pydantic_init_subclass__(**kwargs)
+        # 为子类定义的每个 parse* / aparse* 方法挂上埋点，profiler 关闭时只多一次布尔判断
+        for name, attr in list(vars(cls).items()):
+            if name.startswith(("parse", "aparse")) and inspect.isfunction(attr) and not getattr(attr, "__profiled__", False):
+                setattr(cls, name, profiled(
+                    f"parser.{cls.__name__}.{name}",
+                    on_error=(OutputParserError, "parser.failure"),
+                )(attr))
+
     @abstractmethod
     def parse(self, output: LLMResult) -> NamedTuple:
-        pass
\ No newline at end of file
+        pass
+
+    def parse_batch(
+        self,
+        outputs: Sequence[Union[LLMResult, str, BaseException]],
+        method: str = "parse",
+        processes: Optional[int] = None,
+        chunk_size: int = 2048,
+    ) -> "BatchParseResult":
+        """
+        用 method 指定的解析方法（parse / parse_update / parse_evaluation ...）批量解析，
+        返回与 outputs 按下标对齐的 values 与 errors，单条失败不影响其余结果。
+
+        outputs 可以直接是 abatch_generate_response 的返回值：其中的异常原样放进 errors，
+        字符串视为模型输出的 content。processes 大于 1 且条数超过 chunk_size 时，
+        按 chunk_size 切块分给进程池解析，只把 content 字符串发给子进程。
+        """
+        func = getattr(type(self), method, None)
+        if not method.startswith("parse") or method == "parse_batch" or not inspect.isfunction(func):
+            raise ValueError(f"{type(self).__name__} has no parse method named {method!r}")
+        with profiler.span(f"parser.{type(self).__name__}.parse_batch"):
+            if processes is not None and processes > 1 and len(outputs) > chunk_size:
+                result = self._parse_batch_in_pool(outputs, method, processes, chunk_size)
+            else:
+                result = BatchParseResult(*_parse_many(self, method, outputs))
+        failures = sum(1 for error in result.errors if isinstance(error, OutputParserError))
+        if failures:
+            profiler.count("parser.failure", failures)
+        return result
+
+    def _parse_batch_in_pool(self, outputs, method: str, processes: int, chunk_size: int) -> "BatchParseResult":
+        # 上游异常不一定能 pickle，用 None 占位，结果回来后再放回原对象
+        contents = [
+            None if isinstance(item, BaseException) else _content(item)
+            for item in outputs
+        ]
+        chunks = [contents[i:i + chunk_size] for i in range(0, len(contents), chunk_size)]
+        values: List[Any] = []
+        errors: List[Optional[BaseException]] = []
+        with ProcessPoolExecutor(max_workers=min(processes, len(chunks))) as pool:
+            for chunk_values, chunk_errors in pool.map(_parse_many, repeat(self), repeat(method), chunks):
+                values.extend(chunk_values)
+                errors.extend(chunk_errors)
+        for idx, item in enumerate(outputs):
+            if isinstance(item, BaseException):
+                errors[idx] = item
+        return BatchParseResult(values, errors)
+
+
+class BatchParseResult(NamedTuple):
+    """parse_batch 的结果：成功位置 errors 为 None，失败位置 values 为 None"""
+    values: List[Any]
+    errors: List[Optional[BaseException]]
+
+    @property
+    def failed(self) -> List[int]:
+        """解析失败或上游调用失败的下标"""
+        return [idx for idx, error in enumerate(self.errors) if error is not None]
+
+
+def _content(item: Union[LLMResult, str]) -> str:
+    return item if isinstance(item, str) else item.content
+
+
+def _unprofiled(func: Callable) -> Callable:
+    # 批量路径只记一个 parse_batch span，绕开逐条的埋点包装
+    while getattr(func, "__profiled__", False):
+        func = func.__wrapped__
+    return func
+
+
+def _parse_many(parser: OutputParser, method: str, outputs: Sequence[Any]) -> Tuple[List[Any], List[Optional[BaseException]]]:
+    """逐条解析；进程池 worker 也用这个函数，其中 None 表示该位置是上游异常，留给调用方回填"""
+    func = _unprofiled(getattr(type(parser), method))
+    values: List[Any] = []
+    errors: List[Optional[BaseException]] = []
+    for item in outputs:
+        if item is None or isinstance(item, BaseException):
+            values.append(None)
+            errors.append(item)
+            continue
+        if isinstance(item, str):
+            item = LLMResult.model_construct(content=item, send_tokens=0, recv_tokens=0, total_tokens=0)
+        try:
+            values.append(func(parser, item))
+            errors.append(None)
+        except OutputParserError as e:
+            values.append(None)
+            errors.append(e)
+    return values, errors
\ No newline at end of file
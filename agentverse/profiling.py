@@ -0,0 +1,225 @@
+"""
+热点路径的轻量级埋点
+
+默认关闭；关闭时 span() 返回一个共享的空上下文，被包装函数只多一次布尔判断。
+
+    from agentverse.profiling import profiler, span
+
+    profiler.enable()
+    with span("epoch.forward"):
+        ...
+    profiler.dump_epoch(epoch, "profiles/")
+
+span 按调用栈嵌套（每个 asyncio task / 线程各自一条栈），汇总为
+"父;子;孙" 形式的路径，记录次数、总耗时与自身耗时（扣除子 span）。
+dump_epoch() 输出：
+- profile_epoch{n}.folded：collapsed stack 格式（flamegraph.pl / speedscope 可直接读取），
+  权重为自身耗时（微秒）
+- profile_epoch{n}.txt：按总耗时排序的文本报表，附带计数器（重试次数、解析失败等）
+
+已接入的埋点：
+- llm.call / llm.queue_wait / llm.network：OpenAI 重试循环，区分限流排队与网络耗时
+- parser.<类名>.<方法名>：所有 OutputParser 子类的 parse* / aparse* 方法
+- agent.<类名>.step / astep：所有 BaseAgent 子类
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+_NULL_SPAN = nullcontext()
+_stack: ContextVar[Tuple["_Span", ...]] = ContextVar("profiling_stack", default=())
+
+
+class _Stat:
+    __slots__ = ("count", "total", "self_time")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.self_time = 0.0
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "path", "start", "child_time", "token")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        parents = _stack.get()
+        self.path = f"{parents[-1].path};{self.name}" if parents else self.name
+        self.child_time = 0.0
+        self.token = _stack.set(parents + (self,))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        _stack.reset(self.token)
+        parents = _stack.get()
+        if parents:
+            parents[-1].child_time += elapsed
+        self.profiler._add(self.path, elapsed, elapsed - self.child_time)
+        return False
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._stats: Dict[str, _Stat] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._counters.clear()
+
+    # ------------------------------------------------------------------
+    # 记录
+    # ------------------------------------------------------------------
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name: str, seconds: float):
+        """记录一段在外部测得的耗时，挂在当前 span 之下（例如限流排队时间）"""
+        if not self.enabled:
+            return
+        parents = _stack.get()
+        path = f"{parents[-1].path};{name}" if parents else name
+        if parents:
+            parents[-1].child_time += seconds
+        self._add(path, seconds, seconds)
+
+    def count(self, name: str, n: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def _add(self, path: str, total: float, self_time: float):
+        with self._lock:
+            stat = self._stats.get(path)
+            if stat is None:
+                stat = self._stats[path] = _Stat()
+            stat.count += 1
+            stat.total += total
+            stat.self_time += self_time
+
+    # ------------------------------------------------------------------
+    # 输出
+    # ------------------------------------------------------------------
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                path: {"count": s.count, "total": s.total, "self": s.self_time}
+                for path, s in self._stats.items()
+            }
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def folded(self) -> str:
+        """collapsed stack 格式，每行 "a;b;c 自身耗时微秒" """
+        lines = [
+            f"{path} {int(stat['self'] * 1e6)}"
+            for path, stat in sorted(self.summary().items())
+            if stat["self"] > 0
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def report(self) -> str:
+        rows = sorted(self.summary().items(), key=lambda x: -x[1]["total"])
+        lines = [f"{'total(s)':>10} {'self(s)':>10} {'count':>8} {'mean(ms)':>10}  path"]
+        for path, stat in rows:
+            mean_ms = 1000.0 * stat["total"] / max(1, stat["count"])
+            lines.append(
+                f"{stat['total']:>10.3f} {stat['self']:>10.3f} {stat['count']:>8d} {mean_ms:>10.2f}  {path}"
+            )
+        counters = self.counters()
+        if counters:
+            lines.append("")
+            lines.extend(f"{name}: {value}" for name, value in sorted(counters.items()))
+        return "\n".join(lines) + "\n"
+
+    def dump_epoch(self, epoch: int, directory: str, reset: bool = True) -> List[str]:
+        """写出本 epoch 的 flame 汇总与文本报表，默认随后清空统计"""
+        os.makedirs(directory, exist_ok=True)
+        folded_path = os.path.join(directory, f"profile_epoch{epoch}.folded")
+        report_path = os.path.join(directory, f"profile_epoch{epoch}.txt")
+        with open(folded_path, "w", encoding="utf-8") as f:
+            f.write(self.folded())
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(self.report())
+        if reset:
+            self.reset()
+        return [folded_path, report_path]
+
+
+# 进程级默认 profiler
+profiler = Profiler()
+
+
+def span(name: str):
+    return profiler.span(name)
+
+
+def profiled(name: Optional[str] = None, on_error: Optional[Tuple[type, str]] = None) -> Callable:
+    """
+    函数装饰器：profiler 开启时用 span 包住一次调用（同步 / 异步函数均可）。
+    on_error=(异常类型, 计数器名)：该类异常抛出时额外计数（例如解析失败）。
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not profiler.enabled:
+                    return await func(*args, **kwargs)
+                with _Span(profiler, span_name):
+                    try:
+                        return await func(*args, **kwargs)
+                    except BaseException as e:
+                        if on_error is not None and isinstance(e, on_error[0]):
+                            profiler.count(on_error[1])
+                        raise
+
+            async_wrapper.__profiled__ = True
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with _Span(profiler, span_name):
+                try:
+                    return func(*args, **kwargs)
+                except BaseException as e:
+                    if on_error is not None and isinstance(e, on_error[0]):
+                        profiler.count(on_error[1])
+                    raise
+
+        wrapper.__profiled__ = True
+        return wrapper
+
+    return decorator
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
-import re
-from typing import Union, Tuple, Any, List
-
-from agentverse.parser import OutputParser, OutputParserError, output_parser_registry
+from typing import Any, AsyncIterable, Callable, ClassVar, Iterable, List, Optional, Tuple, Union
+
+from agentverse.parser import (
+    Marker,
+    OutputParser,
+    OutputParserError,
+    SectionExtractor,
+    clean_output,
+    output_parser_registry,
+)
 from agentverse.llms.base import LLMResult
 from agentverse.utils import AgentAction, AgentFinish
 
@@ -13,147 +19,210 @@ from agentverse.utils import AgentAction, AgentFinish
 # 或者是代码逻辑里其实期望 parse 返回任意类型。
 # 为了严格类型检查，我们将返回类型注解设为 Any 或者 Union[AgentAction, AgentFinish, Tuple[str, str], str, List[str]]
 
+# 各解析器在类属性中声明自己的标记，SectionExtractor 构造时编译好查找表，
+# 解析时只清洗一次文本、每个标记只查找一次（原实现对同一标记会 index 两次）。
+# Marker 的第二个参数是段落内容相对标记起点的偏移，沿用原实现的取法
+# （例如 len('Choice:') 跳过冒号，ItemAgent 的 "+ 4" 跳过标记后 " is:" 之类的分隔）。
+
+
+class RecommenderStreamParser:
+    """
+    RecommenderParser 的增量版本：逐段 feed() 模型输出，Explanation 标记一出现
+    就能确定 Choice，不必等完整回复。finish() 与对完整文本调用 parse() 结果一致。
+    """
+    MARKER = "Explanation"
+
+    def __init__(self, parser: "RecommenderParser"):
+        self.parser = parser
+        self.choice: Optional[str] = None
+        self.marker_seen = False
+        self._head = ""
+        self._tail: List[str] = []
+
+    def feed(self, delta: str) -> Optional[str]:
+        """追加一段增量；Choice 首次可以确定时返回它，其余情况返回 None"""
+        if self.marker_seen:
+            self._tail.append(delta)
+            return None
+        # 标记可能被切在两段之间，从上次扫描结尾往前回退 len(MARKER) - 1 个字符
+        start = max(0, len(self._head) - len(self.MARKER) + 1)
+        self._head += delta
+        pos = self._head.find(self.MARKER, start)
+        if pos < 0:
+            return None
+        self.marker_seen = True
+        self.choice = self.parser._choice_before_marker(self._head[:pos])
+        return self.choice
+
+    @property
+    def text(self) -> str:
+        return self._head + "".join(self._tail)
+
+    def finish(self) -> Tuple[str, str]:
+        return self.parser.parse(LLMResult(content=self.text, send_tokens=0, recv_tokens=0, total_tokens=0))
+
 
 @output_parser_registry.register("recommender")
 class RecommenderParser(OutputParser):
+    decision_sections: ClassVar[SectionExtractor] = SectionExtractor(
+        choice=Marker("Choice", len("Choice:")),
+        explanation=Marker("Explanation", len("Explanation:")),
+    )
+    strategy_sections: ClassVar[SectionExtractor] = SectionExtractor(
+        strategy=Marker("Updated Strategy", len("Updated Strategy:")),
+    )
+    rank_sections: ClassVar[SectionExtractor] = SectionExtractor(
+        rank=Marker("Rank:"),
+    )
+
     def parse(self, output: LLMResult) -> Any:
         text = output.content
-        cleaned_output = text.strip()
-        cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
-        try:
-            ans_begin = cleaned_output.index('Choice') + len('Choice:')
-        except ValueError:
-            # 原代码这里 print(cleaned_output) 并 print("!!!!!")
-            # 这里为了健壮性，如果找不到 Choice，可能需要 fallback 或者报错
-            # 暂时保留原逻辑的宽容处理，但如果不 raise error，ans_begin 可能会未定义
-            # 假设找不到 'Choice' 就从头开始
-            ans_begin = 0
-            
-        try:
-            ans_end = cleaned_output.index('Explanation')
-            rat_begin = cleaned_output.index('Explanation') + len('Explanation:')
-        except ValueError:
-             # 如果找不到 Explanation，说明格式严重不符
-             raise OutputParserError(text)
-
-        ans = cleaned_output[ans_begin:ans_end].strip()
-        rat = cleaned_output[rat_begin:].strip()
-        
+        sections = self.decision_sections.scan(text)
+        # 找不到 Explanation 说明格式严重不符；找不到 Choice 时从头开始取
+        if not sections.found("explanation"):
+            raise OutputParserError(text)
+        ans = sections.section("choice", until="explanation").strip()
+        rat = sections.section("explanation").strip()
         if ans == '' or rat == '':
             raise OutputParserError(text)
-        
         return ans, rat
 
+    @classmethod
+    def _choice_before_marker(cls, head: str) -> Optional[str]:
+        """
+        用第一个 Explanation 之前的文本确定 Choice，与 parse() 的取法一致。
+        这段文本里没有 Choice 时结果要看完整回复（parse 会退化或报错），返回 None。
+        """
+        sections = cls.decision_sections.scan(head)
+        if not sections.found("choice"):
+            return None
+        return sections.section("choice").strip() or None
+
+    def stream_parser(self) -> RecommenderStreamParser:
+        return RecommenderStreamParser(self)
+
+    def parse_stream(
+        self,
+        deltas: Iterable[str],
+        on_choice: Optional[Callable[[str], None]] = None,
+        cancel_after_choice: bool = False,
+    ) -> Tuple[str, Optional[str]]:
+        """
+        边接收边解析（例如 OpenAIChat.stream_response 的输出）。
+        Choice 一确定就回调 on_choice；cancel_after_choice=True 时随即关闭 deltas
+        停止生成，返回 (choice, None)，否则读完后返回与 parse() 相同的 (ans, rat)。
+        """
+        stream = self.stream_parser()
+        for delta in deltas:
+            choice = stream.feed(delta)
+            if choice is None:
+                continue
+            if on_choice is not None:
+                on_choice(choice)
+            if cancel_after_choice:
+                if hasattr(deltas, "close"):
+                    deltas.close()
+                return choice, None
+        return stream.finish()
+
+    async def aparse_stream(
+        self,
+        deltas: AsyncIterable[str],
+        on_choice: Optional[Callable[[str], None]] = None,
+        cancel_after_choice: bool = False,
+    ) -> Tuple[str, Optional[str]]:
+        """parse_stream 的异步版本，配合 OpenAIChat.astream_response 使用"""
+        stream = self.stream_parser()
+        async for delta in deltas:
+            choice = stream.feed(delta)
+            if choice is None:
+                continue
+            if on_choice is not None:
+                on_choice(choice)
+            if cancel_after_choice:
+                if hasattr(deltas, "aclose"):
+                    await deltas.aclose()
+                return choice, None
+        return stream.finish()
+
     def parse_backward(self, output: LLMResult) -> str:
         text = output.content
-        cleaned_output = text.strip()
-        cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
-        try:
-            rat_begin = cleaned_output.index('Updated Strategy') + len('Updated Strategy:')
-            rat = cleaned_output[rat_begin:].strip()
-            return rat
-        except ValueError:
+        sections = self.strategy_sections.scan(text)
+        if not sections.found("strategy"):
             raise OutputParserError(text)
+        return sections.section("strategy").strip()
 
     def parse_summary(self, output: LLMResult) -> str:
-        text = output.content
-        cleaned_output = text.strip()
-        cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
-        return cleaned_output.strip()
+        return clean_output(output.content)
 
     def parse_evaluation(self, output: LLMResult) -> List[str]:
-        text = output.content
-        cleaned_output = text.strip()
-        cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
-        try:
-            ans_begin = cleaned_output.index('Rank:') + len('Rank:')
-            # ans = cleaned_output[ans_begin:].strip().split('\n')
-            raw = cleaned_output[ans_begin:]
-            lines = raw.split('\n')
-            # 去掉空行 + 行内前后空格
-            ans = [line.strip() for line in lines if line.strip()]
-            return ans
-        except ValueError:
-            # 原代码这里 print(cleaned_output) 并可能返回 None 或报错
-            # 这里返回空列表表示解析失败
+        sections = self.rank_sections.scan(output.content)
+        if not sections.found("rank"):
+            # 返回空列表表示解析失败
             return []
+        # 去掉空行 + 行内前后空格
+        return [line.strip() for line in sections.section("rank").split('\n') if line.strip()]
 
 
 @output_parser_registry.register("useragent")
 class UserAgentParser(OutputParser):
+    update_sections: ClassVar[SectionExtractor] = SectionExtractor(
+        update=Marker("My updated self-introduction", len("My updated self-introduction:")),
+    )
+
     def parse(self, output: LLMResult) -> str:
-        text = output.content
-        cleaned_output = text.strip()
-        cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
-        return cleaned_output.strip()
+        return clean_output(output.content)
 
     def parse_summary(self, output: LLMResult) -> str:
-        text = output.content
-        cleaned_output = text.strip()
-        cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
-        return cleaned_output.strip()
+        return clean_output(output.content)
 
     def parse_update(self, output: LLMResult) -> str:
         text = output.content
-        cleaned_output = text.strip()
-        cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
-        try:
-            rat_begin = cleaned_output.index('My updated self-introduction') + len('My updated self-introduction:')
-            rat = cleaned_output[rat_begin:].strip()
-            return rat
-        except ValueError:
-            # 原代码 print(cleaned_output)
-            return text # Fallback 返回全文
+        sections = self.update_sections.scan(text)
+        if not sections.found("update"):
+            return text  # Fallback 返回全文
+        return sections.section("update").strip()
+
+
+_FIRST_CD = 'The updated description of the first CD'
+_SECOND_CD = 'The updated description of the second CD'
 
 
 @output_parser_registry.register("itemagent")
 class ItemAgentParser(OutputParser):
+    update_sections: ClassVar[SectionExtractor] = SectionExtractor(
+        first=Marker(_FIRST_CD, len(_FIRST_CD) + 4),
+        second=Marker(_SECOND_CD, len(_SECOND_CD) + 4),
+    )
+    pretrain_sections: ClassVar[SectionExtractor] = SectionExtractor(
+        description=Marker('CD Description: '),
+    )
+    aug_sections: ClassVar[SectionExtractor] = SectionExtractor(
+        reviews=Marker('Speculated CD Reviews: '),
+    )
+
     def parse(self, output: LLMResult) -> Any:
         text = output.content
-        cleaned_output = text.strip()
-        cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
-        
-        ans_begin = 0
-        try:
-            ans_begin = cleaned_output.index('The updated description of the first CD') + len(
-                'The updated description of the first CD') + 4
-        except ValueError:
-            # 原代码 print(cleaned_output)
-            pass
-
-        try:
-            ans_end = cleaned_output.index('The updated description of the second CD')
-            rat_begin = cleaned_output.index('The updated description of the second CD') + len(
-            'The updated description of the second CD') + 4
-            
-            ans = cleaned_output[ans_begin:ans_end].strip()
-            rat = cleaned_output[rat_begin:].strip()
-            
-            if ans == '' or rat == '':
-                raise OutputParserError(text)
-            return ans, rat
-        except ValueError:
-            # 原代码 print(cleaned_output)
+        sections = self.update_sections.scan(text)
+        # 找不到第一段标记时从头开始取，第二段标记必须存在
+        if not sections.found("second"):
             raise OutputParserError(text)
+        ans = sections.section("first", until="second").strip()
+        rat = sections.section("second").strip()
+        if ans == '' or rat == '':
+            raise OutputParserError(text)
+        return ans, rat
 
     def parse_pretrain(self, output: LLMResult) -> str:
         text = output.content
-        cleaned_output = text.strip()
-        cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
-        try:
-            ans_begin = cleaned_output.index('CD Description: ') + len('CD Description: ')
-            ans = cleaned_output[ans_begin:].strip()
-            return ans
-        except ValueError:
+        sections = self.pretrain_sections.scan(text)
+        if not sections.found("description"):
             return text
+        return sections.section("description").strip()
 
     def parse_aug(self, output: LLMResult) -> str:
         text = output.content
-        cleaned_output = text.strip()
-        cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
-        try:
-            ans_begin = cleaned_output.index('Speculated CD Reviews: ') + len('Speculated CD Reviews: ')
-            ans = cleaned_output[ans_begin:].strip()
-            return ans
-        except ValueError:
-            return text
\ No newline at end of file
+        sections = self.aug_sections.scan(text)
+        if not sections.found("reviews"):
+            return text
+        return sections.section("reviews").strip()
@@ -0,0 +1,200 @@
+"""
+LLM 层吞吐压测：对 mock 服务器（或任意 OpenAI 兼容服务）跑不同路径、不同并发度
+
+    python -m benchmarks.bench_llm --requests 500 --concurrency 1 8 32 128 \\
+        --paths sync async batch embed --latency lognormal:0.2:0.5
+
+路径：
+- sync：线程池并发调用 OpenAIChat.generate_response
+- async：asyncio + 信号量并发调用 OpenAIChat.agenerate_response
+- batch：OpenAIChat.abatch_generate_response(max_concurrency=并发度)
+- embed：OpenAIEmbedding.agenerate_array，每批 --embed-batch 条
+
+报告 req/s、单次 HTTP 调用的 p50 / p99 延迟（客户端视角，不含限流排队）、token/s。
+不指定 --base-url 时在本进程内启动 MockOpenAIServer；服务端与客户端共用 GIL，
+高并发下建议用 `python -m benchmarks.mock_openai_server` 在另一个进程里启动。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from agentverse.llms.openai import OpenAIChat, OpenAIClientConfig, OpenAIEmbedding
+from agentverse.llms.telemetry import MetricsCollector
+from benchmarks.mock_openai_server import LatencyDistribution, MockOpenAIServer, MockServerConfig
+
+PATHS = ("sync", "async", "batch", "embed")
+
+
+class BenchResult(NamedTuple):
+    path: str
+    concurrency: int
+    requests: int
+    errors: int
+    seconds: float
+    requests_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    tokens_per_sec: float
+
+
+class _CallRecorder(MetricsCollector):
+    """在正常汇报之外，逐次记录每个 HTTP 调用的延迟与 token 数"""
+
+    def __init__(self):
+        super().__init__()
+        self.latencies: List[float] = []
+        self.tokens = 0
+        self.errors = 0
+        self._calls_lock = threading.Lock()
+
+    def record_llm_call(self, model, api_key, latency, prompt_tokens=0, completion_tokens=0, error=None):
+        with self._calls_lock:
+            self.latencies.append(latency)
+            if error is None:
+                self.tokens += prompt_tokens + completion_tokens
+            else:
+                self.errors += 1
+        super().record_llm_call(model, api_key, latency, prompt_tokens, completion_tokens, error)
+
+
+def make_prompts(n: int, words: int = 60) -> List[str]:
+    return [f"prompt {i}: " + " ".join(f"token{(i * 7 + j) % 97}" for j in range(words)) for i in range(n)]
+
+
+def _build_model(path: str, base_url: str, concurrency: int, embed_batch: int):
+    config = OpenAIClientConfig(api_base=base_url)
+    if path == "embed":
+        model = OpenAIEmbedding(
+            ["sk-bench"], max_concurrency=concurrency, max_batch_items=embed_batch, client_config=config
+        )
+    else:
+        model = OpenAIChat(["sk-bench"], model="gpt-4", max_concurrency=concurrency, client_config=config)
+    return model
+
+
+def run_benchmark(
+    path: str,
+    base_url: str,
+    prompts: Sequence[str],
+    concurrency: int,
+    embed_batch: int = 16,
+) -> BenchResult:
+    if path not in PATHS:
+        raise ValueError(f"未知的压测路径: {path}，可选 {PATHS}")
+    model = _build_model(path, base_url, concurrency, embed_batch)
+    recorder = _CallRecorder()
+    model.metrics = recorder
+    failed = 0
+
+    start = time.perf_counter()
+    if path == "sync":
+        def one(prompt):
+            try:
+                model.generate_response(prompt)
+                return 0
+            except Exception:
+                return 1
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            failed = sum(executor.map(one, prompts))
+    elif path == "async":
+        async def run_async():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(prompt):
+                async with semaphore:
+                    await model.agenerate_response(prompt)
+
+            results = await asyncio.gather(*(one(p) for p in prompts), return_exceptions=True)
+            await model.aclose()
+            return sum(isinstance(r, Exception) for r in results)
+
+        failed = asyncio.run(run_async())
+    elif path == "batch":
+        async def run_batch():
+            results = await model.abatch_generate_response(list(prompts), max_concurrency=concurrency)
+            await model.aclose()
+            return sum(isinstance(r, Exception) for r in results)
+
+        failed = asyncio.run(run_batch())
+    else:
+        async def run_embed():
+            try:
+                await model.agenerate_array(list(prompts))
+                return 0
+            except Exception:
+                return len(prompts)
+            finally:
+                await model.aclose()
+
+        failed = asyncio.run(run_embed())
+    seconds = time.perf_counter() - start
+    if path == "sync":
+        model.close()
+
+    latencies = np.asarray(recorder.latencies or [0.0]) * 1000.0
+    return BenchResult(
+        path=path,
+        concurrency=concurrency,
+        requests=len(recorder.latencies),
+        errors=failed,
+        seconds=seconds,
+        requests_per_sec=len(recorder.latencies) / seconds if seconds else 0.0,
+        p50_ms=float(np.percentile(latencies, 50)),
+        p99_ms=float(np.percentile(latencies, 99)),
+        tokens_per_sec=recorder.tokens / seconds if seconds else 0.0,
+    )
+
+
+def format_results(results: Sequence[BenchResult]) -> str:
+    lines = [f"{'path':<6} {'conc':>5} {'reqs':>6} {'errs':>5} {'req/s':>9} {'p50(ms)':>9} {'p99(ms)':>9} {'tok/s':>11}"]
+    for r in results:
+        lines.append(
+            f"{r.path:<6} {r.concurrency:>5d} {r.requests:>6d} {r.errors:>5d} {r.requests_per_sec:>9.1f} "
+            f"{r.p50_ms:>9.1f} {r.p99_ms:>9.1f} {r.tokens_per_sec:>11.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> List[BenchResult]:
+    parser = argparse.ArgumentParser(description="OpenAI LLM 层吞吐压测")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--paths", nargs="+", default=list(PATHS), choices=PATHS)
+    parser.add_argument("--base-url", default=None, help="已启动的 OpenAI 兼容服务；为空时在进程内启动 mock 服务器")
+    parser.add_argument("--latency", default="constant:0.05", help="进程内 mock 服务器的延迟分布 kind:mean[:spread]")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--embed-batch", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = MockOpenAIServer(MockServerConfig(
+            latency=LatencyDistribution.parse(args.latency),
+            rate_limit_rate=args.rate_limit_rate,
+        )).start()
+        base_url = server.base_url
+
+    prompts = make_prompts(args.requests)
+    results = []
+    try:
+        for path in args.paths:
+            for concurrency in args.concurrency:
+                results.append(run_benchmark(path, base_url, prompts, concurrency, args.embed_batch))
+    finally:
+        if server is not None:
+            server.stop()
+    print(format_results(results))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+推荐任务输出解析器的微基准：SectionExtractor 实现 vs 原先的 strip + re.sub + 多次 str.index
+
+    python -m benchmarks.bench_parsers --outputs 20000 --repeat 3
+
+LEGACY 中保留了重构前各 parse 方法的原始逻辑（以文本为输入），
+既作为基准的对照组，也作为测试中"结果不变"的参照实现。
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agentverse.llms.base import LLMResult
+from agentverse.parser import OutputParserError
+from agentverse.tasks.recommendation.output_parser import ItemAgentParser, RecommenderParser, UserAgentParser
+
+
+# ---------------------------------------------------------------------------
+# 重构前的实现
+# ---------------------------------------------------------------------------
+
+def legacy_recommender_parse(text: str) -> Any:
+    cleaned_output = text.strip()
+    cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
+    try:
+        ans_begin = cleaned_output.index('Choice') + len('Choice:')
+    except ValueError:
+        ans_begin = 0
+    try:
+        ans_end = cleaned_output.index('Explanation')
+        rat_begin = cleaned_output.index('Explanation') + len('Explanation:')
+    except ValueError:
+        raise OutputParserError(text)
+    ans = cleaned_output[ans_begin:ans_end].strip()
+    rat = cleaned_output[rat_begin:].strip()
+    if ans == '' or rat == '':
+        raise OutputParserError(text)
+    return ans, rat
+
+
+def legacy_recommender_backward(text: str) -> str:
+    cleaned_output = text.strip()
+    cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
+    try:
+        rat_begin = cleaned_output.index('Updated Strategy') + len('Updated Strategy:')
+        return cleaned_output[rat_begin:].strip()
+    except ValueError:
+        raise OutputParserError(text)
+
+
+def legacy_summary(text: str) -> str:
+    cleaned_output = text.strip()
+    cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
+    return cleaned_output.strip()
+
+
+def legacy_recommender_evaluation(text: str) -> List[str]:
+    cleaned_output = text.strip()
+    cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
+    try:
+        ans_begin = cleaned_output.index('Rank:') + len('Rank:')
+        lines = cleaned_output[ans_begin:].split('\n')
+        return [line.strip() for line in lines if line.strip()]
+    except ValueError:
+        return []
+
+
+def legacy_user_update(text: str) -> str:
+    cleaned_output = text.strip()
+    cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
+    try:
+        rat_begin = cleaned_output.index('My updated self-introduction') + len('My updated self-introduction:')
+        return cleaned_output[rat_begin:].strip()
+    except ValueError:
+        return text
+
+
+def legacy_item_parse(text: str) -> Any:
+    cleaned_output = text.strip()
+    cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
+    ans_begin = 0
+    try:
+        ans_begin = cleaned_output.index('The updated description of the first CD') + len(
+            'The updated description of the first CD') + 4
+    except ValueError:
+        pass
+    try:
+        ans_end = cleaned_output.index('The updated description of the second CD')
+        rat_begin = cleaned_output.index('The updated description of the second CD') + len(
+            'The updated description of the second CD') + 4
+        ans = cleaned_output[ans_begin:ans_end].strip()
+        rat = cleaned_output[rat_begin:].strip()
+        if ans == '' or rat == '':
+            raise OutputParserError(text)
+        return ans, rat
+    except ValueError:
+        raise OutputParserError(text)
+
+
+def legacy_item_pretrain(text: str) -> str:
+    cleaned_output = text.strip()
+    cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
+    try:
+        ans_begin = cleaned_output.index('CD Description: ') + len('CD Description: ')
+        return cleaned_output[ans_begin:].strip()
+    except ValueError:
+        return text
+
+
+def legacy_item_aug(text: str) -> str:
+    cleaned_output = text.strip()
+    cleaned_output = re.sub(r"\n+", "\n", cleaned_output)
+    try:
+        ans_begin = cleaned_output.index('Speculated CD Reviews: ') + len('Speculated CD Reviews: ')
+        return cleaned_output[ans_begin:].strip()
+    except ValueError:
+        return text
+
+
+# (名称, 重构前实现, 新解析器上的方法名, 解析器类)
+LEGACY: List[Tuple[str, Callable[[str], Any], str, type]] = [
+    ("recommender.parse", legacy_recommender_parse, "parse", RecommenderParser),
+    ("recommender.parse_backward", legacy_recommender_backward, "parse_backward", RecommenderParser),
+    ("recommender.parse_summary", legacy_summary, "parse_summary", RecommenderParser),
+    ("recommender.parse_evaluation", legacy_recommender_evaluation, "parse_evaluation", RecommenderParser),
+    ("useragent.parse", legacy_summary, "parse", UserAgentParser),
+    ("useragent.parse_update", legacy_user_update, "parse_update", UserAgentParser),
+    ("itemagent.parse", legacy_item_parse, "parse", ItemAgentParser),
+    ("itemagent.parse_pretrain", legacy_item_pretrain, "parse_pretrain", ItemAgentParser),
+    ("itemagent.parse_aug", legacy_item_aug, "parse_aug", ItemAgentParser),
+]
+
+
+def outcome(func: Callable[[str], Any], text: str) -> Tuple[str, Any]:
+    """把返回值与 OutputParserError 统一成可比较的结果"""
+    try:
+        return "ok", func(text)
+    except OutputParserError as e:
+        return "error", e.message
+
+
+# ---------------------------------------------------------------------------
+# 语料
+# ---------------------------------------------------------------------------
+
+_WORDS = "the a rock jazz album guitar melody vocals lyrics upbeat mellow classic energetic fans".split()
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _paragraphs(rng: random.Random, words: int) -> str:
+    parts = []
+    while words > 0:
+        n = min(words, rng.randint(8, 20))
+        parts.append(_sentence(rng, n))
+        words -= n
+    # 随机插入多余换行，走到 re.sub 的合并逻辑
+    return "".join(p + rng.choice([" ", "\n", "\n\n"]) for p in parts)
+
+
+def make_corpus(n: int, words: int = 120, seed: int = 0) -> List[str]:
+    """生成覆盖各个解析方法的模型输出，大部分格式正确，少量缺标记"""
+    rng = random.Random(seed)
+    templates = [
+        lambda: f"{_paragraphs(rng, words)}\nChoice: {_sentence(rng, 4)}\nExplanation: {_paragraphs(rng, words)}",
+        lambda: f"{_paragraphs(rng, words)}\nUpdated Strategy: {_paragraphs(rng, words)}",
+        lambda: f"Rank:\n" + "\n".join(f"{i}. {_sentence(rng, 3)}" for i in range(10)),
+        lambda: f"My updated self-introduction: {_paragraphs(rng, words)}",
+        lambda: (
+            f"The updated description of the first CD is: {_paragraphs(rng, words)}\n"
+            f"The updated description of the second CD is: {_paragraphs(rng, words)}"
+        ),
+        lambda: f"CD Description: {_paragraphs(rng, words)}",
+        lambda: f"Speculated CD Reviews: {_paragraphs(rng, words)}",
+        lambda: _paragraphs(rng, words),
+    ]
+    return [rng.choice(templates)() for _ in range(n)]
+
+
+# ---------------------------------------------------------------------------
+# 基准
+# ---------------------------------------------------------------------------
+
+def _time(func: Callable[[Any], Any], inputs: List[Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            try:
+                func(item)
+            except OutputParserError:
+                pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(outputs: int = 20000, words: int = 120, repeat: int = 3, seed: int = 0) -> List[Dict[str, Any]]:
+    corpus = make_corpus(outputs, words, seed)
+    results = [LLMResult(content=t, send_tokens=0, recv_tokens=0, total_tokens=0) for t in corpus]
+    report = []
+    for name, legacy, method, parser_cls in LEGACY:
+        parse = getattr(parser_cls(), method)
+        legacy_s = _time(legacy, corpus, repeat)
+        new_s = _time(parse, results, repeat)
+        report.append({
+            "name": name,
+            "legacy_us": 1e6 * legacy_s / outputs,
+            "engine_us": 1e6 * new_s / outputs,
+            "speedup": legacy_s / new_s if new_s else float("inf"),
+        })
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="输出解析器微基准")
+    parser.add_argument("--outputs", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=120, help="每段正文的大致词数")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    report = run(args.outputs, args.words, args.repeat)
+    print(f"{'method':<32} {'legacy(us)':>11} {'engine(us)':>11} {'speedup':>8}")
+    for row in report:
+        print(f"{row['name']:<32} {row['legacy_us']:>11.2f} {row['engine_us']:>11.2f} {row['speedup']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+离线的 OpenAI 兼容服务器，用于压测与集成测试（不产生任何费用）
+
+实现 /v1/chat/completions（含 stream=True 的 SSE）与 /v1/embeddings 两个接口，
+响应格式与官方一致，openai SDK 只需把 base_url 指向 server.base_url：
+
+    with MockOpenAIServer(MockServerConfig(latency=LatencyDistribution.parse("lognormal:0.2:0.5"))) as server:
+        chat = OpenAIChat(["sk-mock"], model="gpt-4", client_config=OpenAIClientConfig(api_base=server.base_url))
+
+- 输出是确定性的：chat 回复与 embedding 向量都只由请求内容决定
+- latency：每个请求的服务端延迟分布（constant / uniform / normal / lognormal）
+- rate_limit_rate：以该概率返回 429 rate_limit_exceeded（带 retry-after-ms）
+- quota_keys / deactivated_keys：这些 key 分别返回额度耗尽 / key 被封禁
+- quota_after_requests：每个 key 处理这么多请求之后开始返回额度耗尽
+
+也可以单独启动，供另一个进程里的压测使用：
+
+    python -m benchmarks.mock_openai_server --port 8089 --latency lognormal:0.2:0.5
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Literal, Optional
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+
+class LatencyDistribution(BaseModel):
+    """服务端延迟分布（秒）；lognormal 时 mean 为中位数，spread 为对数标准差"""
+    kind: Literal["constant", "uniform", "normal", "lognormal"] = Field(default="constant")
+    mean: float = Field(default=0.0)
+    spread: float = Field(default=0.0)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        """解析 "kind:mean[:spread]"，例如 "uniform:0.1:0.05"；纯数字等价于 constant"""
+        parts = spec.split(":")
+        if len(parts) == 1:
+            return cls(kind="constant", mean=float(parts[0]))
+        return cls(kind=parts[0], mean=float(parts[1]), spread=float(parts[2]) if len(parts) > 2 else 0.0)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "constant":
+            value = self.mean
+        elif self.kind == "uniform":
+            value = rng.uniform(self.mean - self.spread, self.mean + self.spread)
+        elif self.kind == "normal":
+            value = rng.gauss(self.mean, self.spread)
+        else:
+            value = self.mean * rng.lognormvariate(0.0, self.spread)
+        return max(0.0, value)
+
+
+class MockServerConfig(BaseModel):
+    latency: LatencyDistribution = Field(default_factory=LatencyDistribution)
+    rate_limit_rate: float = Field(default=0.0)
+    retry_after_ms: int = Field(default=20)
+    quota_keys: List[str] = Field(default_factory=list)
+    deactivated_keys: List[str] = Field(default_factory=list)
+    quota_after_requests: Optional[int] = Field(default=None)
+    embedding_dim: int = Field(default=256)
+    completion_words: int = Field(default=24)
+    # stream=True 时相邻两个 chunk 之间的间隔（秒）
+    stream_chunk_delay: float = Field(default=0.0)
+    seed: int = Field(default=0)
+
+
+def _digest(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _count_tokens(text: str) -> int:
+    # 与 rate_limit.estimate_tokens 一致的粗略估计
+    return max(1, (len(text) + 3) // 4)
+
+
+def default_reply(messages: List[Dict[str, Any]], n_words: int = 24) -> str:
+    """确定性的回复，格式可以被 RecommenderParser 解析"""
+    digest = _digest(messages)
+    words = " ".join(f"w{digest[i % 64]}{digest[(i + 1) % 64]}" for i in range(n_words))
+    return f"Choice: item-{digest[:6]}\nExplanation: {words}"
+
+
+def mock_embedding(text: str, dim: int) -> np.ndarray:
+    """由文本哈希作种子生成的单位向量，同一文本总是得到同一个向量"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # 默认 backlog 只有 5，高并发建连时会被丢 SYN，表现为约 1s 的长尾延迟
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class MockOpenAIServer:
+    def __init__(
+        self,
+        config: Optional[MockServerConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        reply: Optional[Callable[[List[Dict[str, Any]]], str]] = None,
+    ):
+        self.config = config or MockServerConfig()
+        self.reply = reply or (lambda messages: default_reply(messages, self.config.completion_words))
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._key_requests: Dict[str, int] = {}
+        self.stats: Dict[str, int] = {}
+        self._httpd = _HTTPServer((host, port), self._make_handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # 请求处理
+    # ------------------------------------------------------------------
+
+    def _count(self, name: str, value: int = 1):
+        self.stats[name] = self.stats.get(name, 0) + value
+
+    def _admit(self, api_key: str):
+        """返回 (延迟, 错误) ；错误为 (状态码, 消息, 类型, 额外响应头) 或 None"""
+        cfg = self.config
+        with self._lock:
+            self._count("requests")
+            served = self._key_requests.get(api_key, 0)
+            delay = cfg.latency.sample(self._rng)
+            limited = cfg.rate_limit_rate > 0 and self._rng.random() < cfg.rate_limit_rate
+            if api_key in cfg.deactivated_keys:
+                self._count("deactivated")
+                return delay, (401, "This key has been deactivated.", "invalid_request_error", {})
+            if api_key in cfg.quota_keys or (
+                cfg.quota_after_requests is not None and served >= cfg.quota_after_requests
+            ):
+                self._count("quota")
+                return delay, (
+                    429, "You exceeded your current quota, please check your plan and billing details.",
+                    "insufficient_quota", {"x-should-retry": "false"},
+                )
+            if limited:
+                self._count("rate_limited")
+                return delay, (
+                    429, "Rate limit reached for requests.", "rate_limit_exceeded",
+                    {"retry-after-ms": str(cfg.retry_after_ms)},
+                )
+            self._key_requests[api_key] = served + 1
+        return delay, None
+
+    def _chat(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        messages = body.get("messages", [])
+        content = self.reply(messages)
+        prompt_tokens = sum(_count_tokens(str(m.get("content", ""))) for m in messages)
+        completion_tokens = _count_tokens(content)
+        with self._lock:
+            self._count("chat")
+            self._count("tokens", prompt_tokens + completion_tokens)
+        return {
+            "id": f"chatcmpl-{_digest(messages)[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _embeddings(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for i, text in enumerate(inputs):
+            vector = mock_embedding(text, self.config.embedding_dim)
+            embedding = base64.b64encode(vector.tobytes()).decode("ascii") if as_base64 else vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        prompt_tokens = sum(_count_tokens(t) for t in inputs)
+        with self._lock:
+            self._count("embeddings")
+            self._count("tokens", prompt_tokens)
+        return {
+            "object": "list",
+            "model": body.get("model", "mock"),
+            "data": data,
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    def _stream_chunks(self, completion: Dict[str, Any], include_usage: bool = False) -> List[Dict[str, Any]]:
+        """
+        把完整回复拆成若干 chat.completion.chunk，最后一个带 finish_reason；
+        include_usage 时再追加一个 choices 为空、只带 usage 的 chunk
+        """
+        content = completion["choices"][0]["message"]["content"]
+        pieces = [p for p in content.replace("\n", "\n ").split(" ")]
+        base = {k: completion[k] for k in ("id", "created", "model")}
+        chunks = [{**base, "object": "chat.completion.chunk", "choices": [
+            {"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}
+        ]}]
+        for i, piece in enumerate(pieces):
+            text = piece if i == len(pieces) - 1 or piece.endswith("\n") else piece + " "
+            chunks.append({**base, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": {"content": text}, "finish_reason": None}
+            ]})
+        chunks.append({**base, "object": "chat.completion.chunk", "choices": [
+            {"index": 0, "delta": {}, "finish_reason": "stop"}
+        ]})
+        if include_usage:
+            chunks.append({**base, "object": "chat.completion.chunk", "choices": [], "usage": completion["usage"]})
+        return chunks
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # 头和 body 分两次写出，不关 Nagle 会与客户端的延迟 ACK 叠出约 40ms
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, chunks: List[Dict[str, Any]]):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                events = [f"data: {json.dumps(c)}\n\n" for c in chunks] + ["data: [DONE]\n\n"]
+                try:
+                    for i, event in enumerate(events):
+                        if i and server.config.stream_chunk_delay:
+                            time.sleep(server.config.stream_chunk_delay)
+                        data = event.encode("utf-8")
+                        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                        self.wfile.flush()
+                        with server._lock:
+                            server._count("stream_chunks")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端提前关闭了流（取消生成）
+                    self.close_connection = True
+                    with server._lock:
+                        server._count("stream_cancelled")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": {"message": "invalid json", "type": "invalid_request_error"}})
+                    return
+                api_key = self.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+
+                path = self.path.split("?")[0].rstrip("/")
+                if path not in ("/v1/chat/completions", "/v1/embeddings"):
+                    self._send_json(404, {"error": {"message": f"unknown path {self.path}", "type": "invalid_request_error"}})
+                    return
+
+                delay, error = server._admit(api_key)
+                if delay:
+                    time.sleep(delay)
+                if error is not None:
+                    status, message, code, headers = error
+                    self._send_json(status, {"error": {"message": message, "type": code, "code": code}}, headers)
+                    return
+
+                if path == "/v1/embeddings":
+                    self._send_json(200, server._embeddings(body))
+                elif body.get("stream"):
+                    include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+                    self._send_stream(server._stream_chunks(server._chat(body), include_usage))
+                else:
+                    self._send_json(200, server._chat(body))
+
+        return Handler
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="离线 OpenAI 兼容服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="0", help="kind:mean[:spread]，单位秒")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--quota-after-requests", type=int, default=None)
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = MockServerConfig(
+        latency=LatencyDistribution.parse(args.latency),
+        rate_limit_rate=args.rate_limit_rate,
+        quota_after_requests=args.quota_after_requests,
+        embedding_dim=args.embedding_dim,
+        seed=args.seed,
+    )
+    server = MockOpenAIServer(config, host=args.host, port=args.port)
+    print(f"mock OpenAI server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+import pytest
+from unittest.mock import MagicMock
+from agentverse.profiling import Profiler, profiler, profiled, _NULL_SPAN
+from agentverse.llms.base import LLMResult
+from agentverse.llms.openai import OpenAIChat
+from agentverse.parser import OutputParserError
+from agentverse.tasks.recommendation.output_parser import RecommenderParser
+
+@pytest.fixture
+def enabled_profiler():
+    profiler.reset()
+    profiler.enable()
+    yield profiler
+    profiler.disable()
+    profiler.reset()
+
+def make_response(content="Hi"):
+    mock_choice = MagicMock()
+    mock_choice.message.content = content
+    response = MagicMock()
+    response.choices = [mock_choice]
+    response.usage.prompt_tokens = 1
+    response.usage.completion_tokens = 1
+    response.usage.total_tokens = 2
+    return response
+
+def test_disabled_profiler_records_nothing():
+    p = Profiler()
+    # 关闭时返回共享的空上下文
+    assert p.span("a") is _NULL_SPAN
+    with p.span("a"):
+        pass
+    p.record("b", 1.0)
+    p.count("c")
+    assert p.summary() == {}
+    assert p.counters() == {}
+
+def test_nested_spans_track_self_time():
+    p = Profiler(enabled=True)
+    with p.span("outer"):
+        with p.span("inner"):
+            pass
+        p.record("wait", 0.5)
+
+    summary = p.summary()
+    assert set(summary) == {"outer", "outer;inner", "outer;wait"}
+    outer = summary["outer"]
+    # record() 记录的外部耗时同样从父 span 的自身耗时中扣除
+    assert outer["self"] == pytest.approx(outer["total"] - summary["outer;inner"]["total"] - 0.5)
+    assert "outer;wait 500000" in p.folded()
+
+def test_dump_epoch_writes_files_and_resets(tmp_path):
+    p = Profiler(enabled=True)
+    p.record("llm.network", 0.25)
+    p.count("llm.retry", 2)
+
+    folded_path, report_path = p.dump_epoch(3, str(tmp_path))
+    assert os.path.basename(folded_path) == "profile_epoch3.folded"
+    assert open(folded_path).read() == "llm.network 250000\n"
+    assert "llm.retry: 2" in open(report_path).read()
+    assert p.summary() == {}
+
+@pytest.mark.asyncio
+async def test_profiled_decorator_supports_coroutines(enabled_profiler):
+    @profiled("job")
+    async def job():
+        return 1
+
+    assert await job() == 1
+    assert enabled_profiler.summary()["job"]["count"] == 1
+
+def test_parser_methods_are_profiled(enabled_profiler):
+    parser = RecommenderParser()
+    ok = LLMResult(content="Choice: A\nExplanation: B", send_tokens=0, recv_tokens=0, total_tokens=0)
+    bad = LLMResult(content="no keywords", send_tokens=0, recv_tokens=0, total_tokens=0)
+
+    parser.parse(ok)
+    with pytest.raises(OutputParserError):
+        parser.parse(bad)
+
+    assert enabled_profiler.summary()["parser.RecommenderParser.parse"]["count"] == 2
+    assert enabled_profiler.counters()["parser.failure"] == 1
+
+def test_retry_loop_separates_queue_wait_and_network(enabled_profiler, monkeypatch):
+    monkeypatch.setattr("agentverse.llms.openai.time.sleep", lambda s: None)
+    chat = OpenAIChat(api_key_list=["sk-a"], model="gpt-4", max_retry=2)
+    chat.pool.ensure_clients()
+    chat.pool.client.chat.completions.create = MagicMock(
+        side_effect=[RuntimeError("boom"), make_response()]
+    )
+
+    assert chat.generate_response("hi").content == "Hi"
+
+    summary = enabled_profiler.summary()
+    assert summary["llm.call"]["count"] == 1
+    assert summary["llm.call;llm.network"]["count"] == 2
+    assert summary["llm.call;llm.queue_wait"]["count"] == 2
+    assert enabled_profiler.counters()["llm.retry"] == 1
@@ -0,0 +1,100 @@
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+from openai.types.chat import ChatCompletion
+from agentverse.llms.cache import ResponseCache, cache_key
+from agentverse.llms.openai import OpenAIChat, OpenAICompletion
+
+def make_completion(content):
+    return ChatCompletion.model_validate({
+        "id": "cmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content},
+        }],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 5, "total_tokens": 8},
+    })
+
+def test_cache_key_is_content_addressed():
+    messages = [{"role": "user", "content": "hi"}]
+    assert cache_key("m", messages, {"temperature": 0}) == cache_key("m", messages, {"temperature": 0})
+    assert cache_key("m", messages, {"temperature": 0}) != cache_key("m2", messages, {"temperature": 0})
+    assert cache_key("m", messages, {"temperature": 0}) != cache_key("m", messages, {"temperature": 0.5})
+
+def test_memory_lru_eviction():
+    cache = ResponseCache(max_memory_items=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    # b 最久未访问，被淘汰
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+def test_disk_cache_persists_and_evicts(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite")
+    cache = ResponseCache(path=path, max_disk_bytes=10)
+    cache.put("a", "xxxxx")
+    cache.put("b", "yyyyy")
+    cache.put("c", "zzzzz")
+    # 超出 10 字节预算后最早的 a 被淘汰
+    assert len(cache) == 2
+    cache.close()
+
+    reopened = ResponseCache(path=path)
+    assert reopened.get("a") is None
+    assert reopened.get("c") == "zzzzz"
+    reopened.close()
+
+def test_sampled_calls_bypass_cache_by_default():
+    assert ResponseCache().enabled_for({"temperature": 0})
+    assert not ResponseCache().enabled_for({"temperature": 1.0})
+    assert ResponseCache(cache_sampled=True).enabled_for({"temperature": 1.0})
+
+def test_completion_sync_hits_cache():
+    fake_pool = MagicMock()
+    fake_pool.client.chat.completions.create.return_value = make_completion("Hello")
+
+    llm = OpenAICompletion(api_key_list=["dummy"], temperature=0, cache=ResponseCache())
+    llm.pool = fake_pool
+
+    first = llm.generate_response("hi")
+    second = llm.generate_response("hi")
+
+    assert first.content == second.content == "Hello"
+    assert second.total_tokens == 8
+    fake_pool.client.chat.completions.create.assert_called_once()
+
+def test_temperature_above_zero_is_not_cached():
+    fake_pool = MagicMock()
+    fake_pool.client.chat.completions.create.return_value = make_completion("Hello")
+
+    chat = OpenAIChat(api_key_list=["dummy"], temperature=1.0, cache=ResponseCache())
+    chat.pool = fake_pool
+
+    chat.generate_response("hi")
+    chat.generate_response("hi")
+    assert fake_pool.client.chat.completions.create.call_count == 2
+
+@pytest.mark.asyncio
+async def test_chat_async_batch_hits_disk_cache_across_instances(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite")
+    create = AsyncMock(side_effect=lambda model, messages, **kw: make_completion(messages[0]["content"]))
+
+    chat = OpenAIChat(api_key_list=["dummy"], temperature=0, cache=ResponseCache(path=path))
+    chat.pool = MagicMock()
+    chat.pool.async_client.chat.completions.create = create
+    first = await chat.abatch_generate_response(["a", "b"])
+
+    # 模拟重新运行实验：新的实例、新的内存缓存，同一个磁盘文件
+    rerun = OpenAIChat(api_key_list=["dummy"], temperature=0, cache=ResponseCache(path=path))
+    rerun.pool = MagicMock()
+    rerun.pool.async_client.chat.completions.create = create
+    second = await rerun.abatch_generate_response(["a", "b"])
+
+    assert [r.content for r in first] == [r.content for r in second] == ["a", "b"]
+    assert create.await_count == 2
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+from agentverse.llms.base import LLMResult
+from agentverse.llms.openai import OpenAIChat
+
+def make_response(content):
+    mock_choice = MagicMock()
+    mock_choice.message.content = content
+    mock_response = MagicMock()
+    mock_response.choices = [mock_choice]
+    mock_response.usage.prompt_tokens = 1
+    mock_response.usage.completion_tokens = 2
+    mock_response.usage.total_tokens = 3
+    return mock_response
+
+@pytest.fixture
+def chat():
+    chat = OpenAIChat(api_key_list=["dummy"], max_retry=2)
+    chat.pool = MagicMock()
+    return chat
+
+@pytest.mark.asyncio
+async def test_batch_preserves_order_and_bounds_concurrency(chat):
+    in_flight = 0
+    peak = 0
+
+    async def fake_create(model, messages, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        # 越靠前的请求越慢，检验结果仍按输入顺序返回
+        await asyncio.sleep(0.001 * (20 - int(messages[0]["content"])))
+        in_flight -= 1
+        return make_response("answer-" + messages[0]["content"])
+
+    chat.pool.async_client.chat.completions.create = fake_create
+
+    prompts = [str(i) for i in range(20)]
+    results = await chat.abatch_generate_response(prompts, max_concurrency=4)
+
+    assert peak <= 4
+    assert all(isinstance(r, LLMResult) for r in results)
+    assert [r.content for r in results] == ["answer-" + p for p in prompts]
+
+@pytest.mark.asyncio
+async def test_batch_retries_each_item_independently(chat, monkeypatch):
+    calls = {}
+
+    async def fake_create(model, messages, **kwargs):
+        content = messages[0]["content"]
+        calls[content] = calls.get(content, 0) + 1
+        if content == "bad":
+            raise RuntimeError("boom")
+        return make_response(content)
+
+    async def no_sleep(_):
+        return None
+
+    monkeypatch.setattr("agentverse.llms.openai.asyncio.sleep", no_sleep)
+    chat.pool.async_client.chat.completions.create = fake_create
+
+    results = await chat.abatch_generate_response(["a", "bad", "c"])
+
+    assert results[0].content == "a"
+    assert isinstance(results[1], Exception)
+    assert results[2].content == "c"
+    # 只有失败的那一条被重试
+    assert calls == {"a": 1, "bad": 2, "c": 1}
+
+@pytest.mark.asyncio
+async def test_batch_streams_in_input_order(chat):
+    async def fake_create(model, messages, **kwargs):
+        return make_response(messages[0]["content"])
+
+    chat.pool.async_client.chat.completions.create = fake_create
+
+    seen = []
+    async for idx, result in chat.astream_batch(["x", "y", "z"], max_concurrency=2):
+        seen.append((idx, result.content))
+    assert seen == [(0, "x"), (1, "y"), (2, "z")]
@@ -0,0 +1,56 @@
+import time
+import pytest
+from agentverse.llms.openai import OpenAIChat, OpenAIClientConfig
+from agentverse.llms.telemetry import MetricsCollector
+from agentverse.tasks.recommendation.output_parser import RecommenderParser
+from benchmarks.mock_openai_server import MockOpenAIServer, MockServerConfig, default_reply
+
+def make_chat(server):
+    chat = OpenAIChat(["sk-mock"], model="gpt-4", client_config=OpenAIClientConfig(api_base=server.base_url))
+    chat.metrics = MetricsCollector()
+    return chat
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_stream_response_yields_full_reply():
+    with MockOpenAIServer(MockServerConfig(completion_words=5)) as server:
+        with make_chat(server) as chat:
+            deltas = list(chat.stream_response("hello"))
+            expected = default_reply([{"role": "user", "content": "hello"}], 5)
+            assert len(deltas) > 1
+            assert "".join(deltas) == expected
+            # 流结束时按服务端返回的 usage 记 token
+            assert chat.metrics.counter("llm_completion_tokens_total") > 0
+            assert chat.metrics.counter("llm_requests_total") == 1
+
+def test_cancel_after_choice_stops_generation():
+    config = MockServerConfig(completion_words=200, stream_chunk_delay=0.005)
+    with MockOpenAIServer(config) as server:
+        with make_chat(server) as chat:
+            parser = RecommenderParser()
+            choice, rat = parser.parse_stream(chat.stream_response("hello"), cancel_after_choice=True)
+            assert choice.startswith("item-") and rat is None
+            # 服务端在写后续 chunk 时发现连接已关闭
+            assert wait_for(lambda: server.stats.get("stream_cancelled") == 1)
+            assert server.stats["stream_chunks"] < 200
+
+@pytest.mark.asyncio
+async def test_astream_response_with_incremental_parser():
+    with MockOpenAIServer(MockServerConfig(completion_words=8)) as server:
+        async with make_chat(server) as chat:
+            seen = []
+            ans, rat = await RecommenderParser().aparse_stream(
+                chat.astream_response("hello"), on_choice=seen.append
+            )
+            expected = default_reply([{"role": "user", "content": "hello"}], 8)
+            assert seen == [ans]
+            assert (ans, rat) == RecommenderParser().parse(
+                chat.generate_response("hello")
+            )
+            assert expected.endswith(rat)
@@ -26,3 +26,113 @@ def test_embedding_sync():
 
     # 6. 断言 API 被正确调用
     fake_pool.client.embeddings.create.assert_called_once()
+
+def make_batch_response(inputs):
+    items = []
+    for i, text in enumerate(inputs):
+        item = MagicMock()
+        item.index = i
+        item.embedding = [float(len(text))]
+        items.append(item)
+    # 打乱返回顺序，检验按 index 还原
+    response = MagicMock()
+    response.data = list(reversed(items))
+    response.usage.prompt_tokens = len(inputs)
+    return response
+
+def test_pack_batches_respects_item_and_token_budget():
+    from agentverse.llms.openai import pack_batches
+    texts = ["a" * 40] * 5  # 每条约 10 个 token
+    assert pack_batches(texts, max_items=2, max_tokens=1000) == [[0, 1], [2, 3], [4]]
+    assert pack_batches(texts, max_items=10, max_tokens=25) == [[0, 1], [2, 3], [4]]
+    # 单条超出 token 预算时独占一批
+    assert pack_batches(["a" * 400, "b"], max_items=10, max_tokens=20) == [[0], [1]]
+
+def test_embedding_batch_sync():
+    fake_pool = MagicMock()
+    fake_pool.client.embeddings.create.side_effect = lambda model, input: make_batch_response(input)
+
+    embedder = OpenAIEmbedding(api_key_list=["dummy"], max_batch_items=2)
+    embedder.pool = fake_pool
+
+    result = embedder.generate_batch_response(["a", "bb", "ccc"])
+
+    assert result.content == [[1.0], [2.0], [3.0]]
+    assert result.send_tokens == 3
+    # 3 条输入、每批最多 2 条 → 2 次请求
+    assert fake_pool.client.embeddings.create.call_count == 2
+
+@pytest.mark.asyncio
+async def test_embedding_batch_async():
+    calls = []
+
+    async def fake_create(model, input):
+        calls.append(list(input))
+        return make_batch_response(input)
+
+    fake_pool = MagicMock()
+    fake_pool.async_client.embeddings.create = fake_create
+
+    embedder = OpenAIEmbedding(api_key_list=["dummy"])
+    embedder.pool = fake_pool
+
+    results = await embedder.agenerate_response(["a", "bb", "ccc"])
+
+    assert calls == [["a", "bb", "ccc"]]
+    assert [r["data"][0]["embedding"] for r in results] == [[1.0], [2.0], [3.0]]
+    # 每批的实际用量分摊到各句，总和与响应一致
+    assert [r["usage"]["prompt_tokens"] for r in results] == [1, 1, 1]
+
+def test_embedding_sync_as_array():
+    import base64
+    import numpy as np
+
+    vector = np.array([0.5, -1.0, 2.0], dtype=np.float32)
+    mock_item = MagicMock()
+    mock_item.embedding = base64.b64encode(vector.tobytes()).decode()
+    mock_response = MagicMock()
+    mock_response.data = [mock_item]
+    mock_response.usage.prompt_tokens = 4
+
+    fake_pool = MagicMock()
+    fake_pool.client.embeddings.create.return_value = mock_response
+
+    embedder = OpenAIEmbedding(api_key_list=["dummy"])
+    embedder.pool = fake_pool
+
+    result = embedder.generate_response("text", as_array=True)
+
+    assert result.content.dtype == np.float32
+    np.testing.assert_array_equal(result.content, vector)
+    assert result.send_tokens == 4
+    # 数组模式请求 base64 编码，跳过 SDK 的 float 列表解码
+    assert fake_pool.client.embeddings.create.call_args.kwargs["encoding_format"] == "base64"
+
+@pytest.mark.asyncio
+async def test_embedding_async_as_array():
+    import numpy as np
+
+    async def fake_create(model, input, encoding_format):
+        return make_batch_response(input)
+
+    fake_pool = MagicMock()
+    fake_pool.async_client.embeddings.create = fake_create
+
+    embedder = OpenAIEmbedding(api_key_list=["dummy"], max_batch_items=2)
+    embedder.pool = fake_pool
+
+    result = await embedder.agenerate_array(["a", "bb", "ccc"])
+
+    assert result.content.shape == (3, 1)
+    assert result.content.dtype == np.float32
+    assert result.content.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(result.content[:, 0], [1.0, 2.0, 3.0])
+    assert result.send_tokens == 3
+
+def test_usage_split_matches_batch_total():
+    embedder = OpenAIEmbedding(api_key_list=["dummy"])
+    response = MagicMock()
+    response.usage.prompt_tokens = 10
+    # 按预估 token（1 : 3）分摊，失败批次记 0
+    tokens = embedder._split_usage([[0, 1], [2]], [response, RuntimeError()], ["a" * 4, "b" * 12, "c"])
+    assert tokens == [2, 8, 0]
@@ -0,0 +1,90 @@
+import pytest
+import numpy as np
+from unittest.mock import MagicMock
+from agentverse.llms.embedding_store import EmbeddingStore
+from agentverse.llms.openai import OpenAIEmbedding
+
+def make_batch_response(inputs):
+    items = []
+    for i, text in enumerate(inputs):
+        item = MagicMock()
+        item.index = i
+        item.embedding = [float(len(text)), 1.0]
+        items.append(item)
+    response = MagicMock()
+    response.data = items
+    response.usage.prompt_tokens = len(inputs)
+    return response
+
+def test_store_roundtrip_and_reopen(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put_many("m", ["a", "b"], np.array([[1, 2], [3, 4]], dtype=np.float32))
+    # 重复写入同一个 key 会被跳过
+    store.put_many("m", ["a"], np.array([[9, 9]], dtype=np.float32))
+    assert len(store) == 2
+    store.close()
+
+    # 另一个实例（模拟另一个 worker 进程）通过内存映射读取
+    reader = EmbeddingStore(str(tmp_path))
+    matrix, missing = reader.get_many("m", ["b", "c", "a"])
+    assert missing == [1]
+    np.testing.assert_array_equal(matrix[[0, 2]], [[3, 4], [1, 2]])
+    # key 包含模型名
+    assert reader.get("other-model", "a") is None
+
+def test_store_sees_rows_appended_by_other_writer(tmp_path):
+    reader = EmbeddingStore(str(tmp_path))
+    writer = EmbeddingStore(str(tmp_path))
+    writer.put("m", "a", np.array([1, 2], dtype=np.float32))
+    np.testing.assert_array_equal(reader.get("m", "a"), [1, 2])
+    writer.put("m", "b", np.array([3, 4], dtype=np.float32))
+    # 文件增长后重新映射
+    np.testing.assert_array_equal(reader.get("m", "b"), [3, 4])
+
+def test_store_rejects_dimension_mismatch(tmp_path):
+    store = EmbeddingStore(str(tmp_path), dim=2)
+    with pytest.raises(ValueError):
+        store.put("m", "a", np.zeros(3, dtype=np.float32))
+
+def test_embedding_sync_only_sends_misses(tmp_path):
+    fake_pool = MagicMock()
+    fake_pool.client.embeddings.create.side_effect = lambda **kw: make_batch_response(kw["input"])
+
+    embedder = OpenAIEmbedding(api_key_list=["dummy"], store=EmbeddingStore(str(tmp_path)))
+    embedder.pool = fake_pool
+
+    embedder.generate_batch_response(["a", "bb"])
+    result = embedder.generate_batch_response(["a", "ccc", "bb"], as_array=True)
+
+    np.testing.assert_array_equal(result.content[:, 0], [1, 3, 2])
+    second_call = fake_pool.client.embeddings.create.call_args_list[1]
+    assert second_call.kwargs["input"] == ["ccc"]
+
+    # 单条查询命中向量库，不再发请求
+    assert embedder.generate_response("ccc").content == [3.0, 1.0]
+    assert fake_pool.client.embeddings.create.call_count == 2
+
+@pytest.mark.asyncio
+async def test_embedding_async_only_sends_misses(tmp_path):
+    calls = []
+
+    async def fake_create(**kwargs):
+        calls.append(list(kwargs["input"]))
+        return make_batch_response(kwargs["input"])
+
+    fake_pool = MagicMock()
+    fake_pool.async_client.embeddings.create = fake_create
+
+    embedder = OpenAIEmbedding(api_key_list=["dummy"], store=EmbeddingStore(str(tmp_path)))
+    embedder.pool = fake_pool
+
+    await embedder.agenerate_response(["a", "bb"])
+    results = await embedder.agenerate_response(["bb", "dddd", "a"])
+    matrix = await embedder.agenerate_array(["a", "dddd"])
+
+    assert calls == [["a", "bb"], ["dddd"]]
+    assert [r["data"][0]["embedding"][0] for r in results] == [2.0, 4.0, 1.0]
+    # 命中向量库的不消耗 token
+    assert [r["usage"]["total_tokens"] for r in results] == [0, 1, 0]
+    np.testing.assert_array_equal(matrix.content[:, 0], [1, 4])
+    assert matrix.send_tokens == 0
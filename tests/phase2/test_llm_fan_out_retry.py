@@ -0,0 +1,56 @@
+import pytest
+from unittest.mock import MagicMock
+from agentverse.llms.openai import OpenAIChat, OpenAIEmbedding
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    async def no_sleep(_):
+        return None
+
+    monkeypatch.setattr("agentverse.llms.openai.asyncio.sleep", no_sleep)
+
+@pytest.mark.asyncio
+async def test_embedding_fan_out_retries_only_failed_sentence():
+    calls = {}
+
+    async def fake_create(model, input):
+        text = input[0]
+        calls[text] = calls.get(text, 0) + 1
+        # "flaky" 第一次失败，第二次成功
+        if text == "flaky" and calls[text] == 1:
+            raise RuntimeError("transient")
+        item = MagicMock()
+        item.index = 0
+        item.embedding = [len(text)]
+        resp = MagicMock()
+        resp.data = [item]
+        return resp
+
+    # 每批一条，使每个句子成为独立的子请求
+    embedder = OpenAIEmbedding(api_key_list=["dummy"], max_batch_items=1)
+    embedder.pool = MagicMock()
+    embedder.pool.async_client.embeddings.create = fake_create
+
+    results = await embedder.agenerate_response(["a", "flaky", "ccc"])
+
+    assert [r["data"][0]["embedding"] for r in results] == [[1], [5], [3]]
+    # 成功的请求没有被重发
+    assert calls == {"a": 1, "flaky": 2, "ccc": 1}
+
+@pytest.mark.asyncio
+async def test_chat_fan_out_reports_failures_per_index():
+    async def fake_create(model, messages, **kwargs):
+        if messages[0]["content"] == "bad":
+            raise RuntimeError("permanent")
+        return messages[0]["content"]
+
+    chat = OpenAIChat(api_key_list=["dummy"], max_retry=3)
+    chat.pool = MagicMock()
+    chat.pool.async_client.chat.completions.create = fake_create
+
+    messages = [[{"role": "user", "content": c}] for c in ["ok1", "bad", "ok2"]]
+    results = await chat.agenerate_response_without_construction(messages)
+
+    assert results[0] == "ok1"
+    assert isinstance(results[1], RuntimeError)
+    assert results[2] == "ok2"
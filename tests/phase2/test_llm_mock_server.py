@@ -0,0 +1,75 @@
+import asyncio
+import numpy as np
+import pytest
+from agentverse.llms.openai import OpenAIChat, OpenAIClientConfig, OpenAIEmbedding
+from agentverse.llms.telemetry import MetricsCollector
+from benchmarks.bench_llm import run_benchmark, make_prompts
+from benchmarks.mock_openai_server import (
+    LatencyDistribution,
+    MockOpenAIServer,
+    MockServerConfig,
+    mock_embedding,
+)
+
+@pytest.fixture
+def server():
+    with MockOpenAIServer(MockServerConfig(embedding_dim=8)) as s:
+        yield s
+
+def make_chat(server, keys=("sk-mock",), **kwargs):
+    chat = OpenAIChat(
+        list(keys), model="gpt-4", client_config=OpenAIClientConfig(api_base=server.base_url), **kwargs
+    )
+    chat.metrics = MetricsCollector()
+    return chat
+
+def test_latency_distribution_parse():
+    dist = LatencyDistribution.parse("uniform:0.1:0.05")
+    assert (dist.kind, dist.mean, dist.spread) == ("uniform", 0.1, 0.05)
+    assert LatencyDistribution.parse("0.2").kind == "constant"
+
+def test_chat_is_deterministic(server):
+    with make_chat(server) as chat:
+        first = chat.generate_response("hello")
+        second = chat.generate_response("hello")
+        other = chat.generate_response("world")
+    assert first.content == second.content != other.content
+    assert first.content.startswith("Choice: item-")
+    assert first.total_tokens == first.send_tokens + first.recv_tokens > 0
+    assert server.stats["chat"] == 3
+
+@pytest.mark.asyncio
+async def test_async_embedding_matches_server_vectors(server):
+    embedding = OpenAIEmbedding(
+        ["sk-mock"], max_batch_items=2, client_config=OpenAIClientConfig(api_base=server.base_url)
+    )
+    embedding.metrics = MetricsCollector()
+    async with embedding:
+        result = await embedding.agenerate_array(["a", "b", "c"])
+    assert result.content.shape == (3, 8)
+    np.testing.assert_allclose(result.content[2], mock_embedding("c", 8))
+    assert server.stats["embeddings"] == 2
+
+def test_pool_survives_multiple_event_loops(server):
+    # 每个 epoch 一次 asyncio.run()：共享连接池不能复用上一个循环的连接
+    chat = make_chat(server)
+    for _ in range(3):
+        assert asyncio.run(chat.agenerate_response("hello"))[0].startswith("Choice:")
+    chat.close()
+
+def test_quota_key_is_quarantined():
+    config = MockServerConfig(quota_keys=["sk-dead"])
+    with MockOpenAIServer(config) as server:
+        with make_chat(server, keys=("sk-dead", "sk-live")) as chat:
+            assert chat.generate_response("hi").content
+            assert chat.pool._current_key() == "sk-live"
+            assert not chat.pool.is_healthy("sk-dead")
+        assert server.stats["quota"] == 1
+
+def test_benchmark_reports_throughput(server):
+    prompts = make_prompts(12)
+    for path in ("sync", "async", "batch"):
+        result = run_benchmark(path, server.base_url, prompts, concurrency=4)
+        assert result.requests == 12 and result.errors == 0
+        assert result.requests_per_sec > 0 and result.p99_ms >= result.p50_ms
+        assert result.tokens_per_sec > 0
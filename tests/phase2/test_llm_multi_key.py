@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+from agentverse.llms.openai import OpenAIClientPool, OpenAIChat
+
+@pytest.fixture
+def pool():
+    pool = OpenAIClientPool(["k1", "k2", "k3"], multi_key=True)
+    pool.ensure_clients()
+    return pool
+
+def test_multi_key_builds_client_per_key(pool):
+    assert set(pool._clients) == {"k1", "k2", "k3"}
+    assert set(pool._async_clients) == {"k1", "k2", "k3"}
+
+def test_lease_resolves_client_to_leased_key(pool):
+    with pool.lease() as key:
+        assert pool.client is pool._clients[key]
+        assert pool.async_client is pool._async_clients[key]
+
+def test_least_in_flight_spreads_concurrent_leases(pool):
+    # 三个同时在途的请求应落在三个不同的 key 上
+    leases = [pool.lease() for _ in range(3)]
+    keys = [lease.__enter__() for lease in leases]
+    assert sorted(keys) == ["k1", "k2", "k3"]
+    for lease in leases:
+        lease.__exit__(None, None, None)
+    assert all(v == 0 for v in pool.in_flight.values())
+
+def test_weighted_round_robin():
+    pool = OpenAIClientPool(
+        ["k1", "k2"], multi_key=True,
+        key_strategy="weighted_round_robin", key_weights={"k1": 3, "k2": 1},
+    )
+    picked = []
+    for _ in range(8):
+        with pool.lease() as key:
+            picked.append(key)
+    assert picked.count("k1") == 6
+    assert picked.count("k2") == 2
+
+def test_quota_error_quarantines_instead_of_removing(pool):
+    assert pool.handle_api_error(Exception("You exceeded your current quota"), "k2")
+    assert "k2" in pool.api_key_list
+    assert pool.healthy_keys() == ["k1", "k3"]
+    for _ in range(4):
+        with pool.lease() as key:
+            assert key != "k2"
+    # 冷却结束后自动恢复
+    pool.quarantined_until["k2"] = 0
+    assert "k2" in pool.healthy_keys()
+
+def test_deactivated_key_is_removed(pool):
+    assert pool.handle_api_error(Exception("account deactivated"), "k1")
+    assert pool.api_key_list == ["k2", "k3"]
+
+def test_all_keys_quarantined_raises():
+    pool = OpenAIClientPool(["k1"])
+    with pytest.raises(ValueError):
+        pool.handle_api_error(Exception("quota"), "k1")
+
+@pytest.mark.asyncio
+async def test_fan_out_uses_every_key():
+    chat = OpenAIChat(api_key_list=["k1", "k2"], multi_key=True)
+    chat.pool.ensure_clients()
+    used = []
+
+    def fake_create(key):
+        async def _create(**kwargs):
+            used.append(key)
+            await asyncio.sleep(0.01)
+            return MagicMock()
+        return _create
+
+    for key, client in chat.pool._async_clients.items():
+        client.chat.completions.create = fake_create(key)
+
+    messages = [[{"role": "user", "content": str(i)}] for i in range(4)]
+    responses = await chat.agenerate_response_without_construction(messages)
+    assert len(responses) == 4
+    assert sorted(used) == ["k1", "k1", "k2", "k2"]
@@ -0,0 +1,70 @@
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+from agentverse.llms import rate_limit
+from agentverse.llms.rate_limit import TokenBucket, KeyRateLimiter, estimate_tokens
+from agentverse.llms.openai import OpenAIClientPool, OpenAIChat
+
+def test_token_bucket_reserve_waits_when_empty():
+    # 容量 2，每秒补充 1 个
+    bucket = TokenBucket(capacity=2, refill_per_sec=1)
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == 0
+    # 第三个请求需要透支，等待约 1 秒
+    wait = bucket.reserve(1)
+    assert 0.9 < wait <= 1.0
+
+def test_token_bucket_clamps_oversized_request():
+    bucket = TokenBucket(capacity=10, refill_per_sec=10)
+    # 单次请求超过容量时按容量计，等待时间有上界
+    assert bucket.reserve(1000) == 0
+    assert bucket.reserve(1000) <= 1.0
+
+def test_key_rate_limiter_tpm_budget():
+    limiter = KeyRateLimiter(rpm=600, tpm=60)
+    assert limiter.reserve(tokens=60) == 0
+    # tpm 耗尽后需要等待补充
+    assert limiter.reserve(tokens=30) > 0
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+def test_pool_builds_limiter_per_key():
+    pool = OpenAIClientPool(["k1", "k2"], rpm=60)
+    assert set(pool.limiters) == {"k1", "k2"}
+    # 未配置时不限流
+    assert OpenAIClientPool(["k1"]).limiters == {}
+
+def test_pool_lease_waits_on_current_key(monkeypatch):
+    slept = []
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda s: slept.append(s))
+    pool = OpenAIClientPool(["k1"], rpm=1)
+    with pool.lease() as key:
+        assert key == "k1"
+    with pool.lease():
+        pass
+    # 第二次请求超出 rpm=1 的预算，需要等待
+    assert len(slept) == 1 and slept[0] > 0
+
+@pytest.mark.asyncio
+async def test_chat_async_passes_through_limiter(monkeypatch):
+    waits = []
+
+    async def fake_sleep(s):
+        waits.append(s)
+
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", fake_sleep)
+
+    mock_choice = MagicMock()
+    mock_choice.message.content = "Hi"
+    mock_response = MagicMock()
+    mock_response.choices = [mock_choice]
+
+    chat = OpenAIChat(api_key_list=["dummy"], rpm=1)
+    chat.pool.ensure_clients()
+    chat.pool.async_client.chat.completions.create = AsyncMock(return_value=mock_response)
+
+    assert await chat.agenerate_response("hi") == ["Hi"]
+    assert await chat.agenerate_response("hi") == ["Hi"]
+    assert len(waits) == 1
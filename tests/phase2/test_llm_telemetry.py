@@ -0,0 +1,88 @@
+import json
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+from agentverse.llms.telemetry import MetricsCollector, call_site, mask_key
+from agentverse.llms.openai import OpenAIChat, OpenAIEmbedding
+
+def make_response(content="Hi", prompt_tokens=3, completion_tokens=5):
+    mock_choice = MagicMock()
+    mock_choice.message.content = content
+    response = MagicMock()
+    response.choices = [mock_choice]
+    response.usage.prompt_tokens = prompt_tokens
+    response.usage.completion_tokens = completion_tokens
+    response.usage.total_tokens = prompt_tokens + completion_tokens
+    return response
+
+def make_chat(metrics):
+    chat = OpenAIChat(api_key_list=["sk-test-abcd"], model="gpt-4", max_retry=1)
+    chat.metrics = metrics
+    chat.pool.ensure_clients()
+    return chat
+
+def test_mask_key():
+    assert mask_key("sk-123456789") == "...6789"
+    assert mask_key(None) == "unknown"
+
+@pytest.mark.asyncio
+async def test_async_chat_usage_is_recorded_per_call_site():
+    metrics = MetricsCollector()
+    chat = make_chat(metrics)
+    chat.pool.async_client.chat.completions.create = AsyncMock(return_value=make_response())
+
+    with call_site("user_forward"):
+        assert await chat.agenerate_response("hi") == ["Hi"]
+    await chat.agenerate_response("hi")
+
+    assert metrics.counter("llm_requests_total", model="gpt-4") == 2
+    assert metrics.counter("llm_prompt_tokens_total", call_site="user_forward") == 3
+    assert metrics.counter("llm_completion_tokens_total", model="gpt-4", key="...abcd") == 10
+    assert metrics.counter("llm_requests_total", call_site="default") == 1
+
+def test_errors_and_cost_are_recorded(monkeypatch):
+    monkeypatch.setattr("agentverse.llms.openai.time.sleep", lambda s: None)
+    metrics = MetricsCollector()
+    metrics.set_price("gpt-4", prompt_per_1k=1.0, completion_per_1k=2.0)
+    chat = make_chat(metrics)
+    chat.pool.client.chat.completions.create = MagicMock(
+        side_effect=[make_response(prompt_tokens=1000, completion_tokens=500), RuntimeError("boom")]
+    )
+
+    chat.generate_response("hi")
+    with pytest.raises(RuntimeError):
+        chat.generate_response("hi")
+
+    assert metrics.counter("llm_cost_usd_total") == pytest.approx(2.0)
+    assert metrics.counter("llm_errors_total", error="RuntimeError") == 1
+
+def test_embedding_reports_prompt_tokens():
+    metrics = MetricsCollector()
+    item = MagicMock()
+    item.embedding = [0.1]
+    response = MagicMock()
+    response.data = [item]
+    response.usage.prompt_tokens = 7
+
+    embedder = OpenAIEmbedding(api_key_list=["dummy"])
+    embedder.metrics = metrics
+    embedder.pool = MagicMock()
+    embedder.pool.client.embeddings.create.return_value = response
+
+    result = embedder.generate_response("text")
+    assert result.send_tokens == 7
+    assert metrics.counter("llm_prompt_tokens_total", model="text-embedding-ada-002") == 7
+
+def test_export_json_and_prometheus():
+    metrics = MetricsCollector()
+    metrics.record_llm_call("gpt-4", "sk-xyz1", latency=0.2, prompt_tokens=4, completion_tokens=1)
+
+    snapshot = json.loads(metrics.to_json())
+    names = {c["name"] for c in snapshot["counters"]}
+    assert {"llm_requests_total", "llm_prompt_tokens_total", "llm_completion_tokens_total"} <= names
+    assert snapshot["histograms"][0]["count"] == 1
+
+    text = metrics.to_prometheus()
+    assert "# TYPE agentverse_llm_requests_total counter" in text
+    assert 'agentverse_llm_requests_total{call_site="default",key="...xyz1",model="gpt-4"} 1.0' in text
+    assert 'agentverse_llm_latency_seconds_bucket{call_site="default",model="gpt-4",le="0.25"} 1' in text
+    assert 'le="0.1"} 0' in text
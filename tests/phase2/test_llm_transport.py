@@ -0,0 +1,104 @@
+import threading
+import time
+import pytest
+from agentverse.llms.openai import (
+    OpenAIClientConfig,
+    OpenAIClientPool,
+    OpenAIChat,
+    OpenAIEmbedding,
+    transport_registry,
+)
+
+def test_pools_with_same_config_share_http_client():
+    a = OpenAIClientPool(["k1"])
+    b = OpenAIClientPool(["k2"])
+    a.ensure_clients()
+    b.ensure_clients()
+    assert a.client._client is b.client._client
+    assert a.async_client._client is b.async_client._client
+    a.close()
+    b.close()
+
+def test_rotate_key_only_swaps_credentials():
+    pool = OpenAIClientPool(["k1", "k2"])
+    pool.ensure_clients()
+    http_client = pool.client._client
+    pool.rotate_key()
+    assert pool.client.api_key == "k2"
+    assert pool.client._client is http_client
+    pool.close()
+
+def test_different_limits_use_different_transports():
+    a = OpenAIClientPool(["k1"], config=OpenAIClientConfig(max_connections=10))
+    b = OpenAIClientPool(["k1"], config=OpenAIClientConfig(max_connections=20))
+    a.ensure_clients()
+    b.ensure_clients()
+    assert a.client._client is not b.client._client
+    a.close()
+    b.close()
+
+def test_transport_closed_when_last_user_releases():
+    config = OpenAIClientConfig(max_connections=7)
+    a = OpenAIClientPool(["k1"], config=config)
+    b = OpenAIClientPool(["k1"], config=config)
+    a.ensure_clients()
+    b.ensure_clients()
+    http_client = a.client._client
+    before = len(transport_registry)
+
+    a.close()
+    assert not http_client.is_closed
+    b.close()
+    assert http_client.is_closed
+    assert len(transport_registry) == before - 1
+
+@pytest.mark.asyncio
+async def test_sync_close_inside_running_loop_is_rejected():
+    pool = OpenAIClientPool(["k1"], config=OpenAIClientConfig(max_connections=11))
+    pool.ensure_clients()
+    async_http_client = pool.async_client._client
+    # 事件循环里同步 close 无法等到连接关闭，直接报错，引用保持不变
+    with pytest.raises(RuntimeError, match="aclose"):
+        pool.close()
+    assert pool.async_client is not None
+    await pool.aclose()
+    assert async_http_client.is_closed
+
+def test_concurrent_first_use_acquires_transport_once(monkeypatch):
+    config = OpenAIClientConfig(max_connections=9)
+    pool = OpenAIClientPool(["k1"], config=config)
+    acquire = transport_registry.acquire
+
+    def slow_acquire(cfg):
+        # 放大并发首次调用的竞争窗口
+        time.sleep(0.01)
+        return acquire(cfg)
+
+    monkeypatch.setattr(transport_registry, "acquire", slow_acquire)
+    barrier = threading.Barrier(8)
+
+    def first_use():
+        barrier.wait()
+        pool.ensure_clients()
+
+    threads = [threading.Thread(target=first_use) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    http_client = pool.client._client
+    pool.close()
+    # 只登记了一次引用，close() 之后连接池真正关闭
+    assert http_client.is_closed
+
+@pytest.mark.asyncio
+async def test_models_support_async_context_manager():
+    config = OpenAIClientConfig(max_connections=9)
+    async with OpenAIChat(api_key_list=["k1"], client_config=config) as chat:
+        async with OpenAIEmbedding(api_key_list=["k1"], client_config=config) as embedder:
+            chat.pool.ensure_clients()
+            embedder.pool.ensure_clients()
+            http_client = chat.pool.async_client._client
+            assert embedder.pool.async_client._client is http_client
+        assert not http_client.is_closed
+    assert http_client.is_closed
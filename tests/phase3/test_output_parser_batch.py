@@ -0,0 +1,73 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from agentverse.llms.base import LLMResult
+from agentverse.parser import OutputParserError, output_parser_registry
+from agentverse.profiling import profiler
+from benchmarks.bench_parsers import LEGACY, make_corpus, outcome
+
+import agentverse.tasks.recommendation.output_parser  # noqa: F401  注册解析器
+
+def wrap(text):
+    return LLMResult(content=text, send_tokens=0, recv_tokens=0, total_tokens=0)
+
+def batch_outcome(result, idx):
+    error = result.errors[idx]
+    if error is None:
+        return "ok", result.values[idx]
+    return "error", error.message
+
+@pytest.mark.parametrize("name", ["recommender", "useragent", "itemagent"])
+def test_parse_batch_matches_single_parse(name):
+    parser = output_parser_registry.build(name)
+    corpus = make_corpus(200, words=20) + ["", "Explanation:"]
+    for _, _, method, parser_cls in LEGACY:
+        if not isinstance(parser, parser_cls):
+            continue
+        single = getattr(parser, method)
+        result = parser.parse_batch([wrap(t) for t in corpus], method=method)
+        assert len(result.values) == len(result.errors) == len(corpus)
+        for idx, text in enumerate(corpus):
+            assert batch_outcome(result, idx) == outcome(lambda _: single(wrap(text)), text)
+
+def test_upstream_exceptions_and_strings():
+    upstream = RuntimeError("rate limited")
+    outputs = [wrap("Choice: A\nExplanation: B"), upstream, "Choice: C\nExplanation: D", "nothing"]
+    result = output_parser_registry.build("recommender").parse_batch(outputs)
+    assert result.values == [("A", "B"), None, ("C", "D"), None]
+    # 上游异常原样保留，解析失败是 OutputParserError
+    assert result.errors[1] is upstream
+    assert isinstance(result.errors[3], OutputParserError)
+    assert result.failed == [1, 3]
+
+def test_process_pool_matches_in_process():
+    parser = output_parser_registry.build("recommender")
+    upstream = ValueError("boom")
+    outputs = [wrap(t) for t in make_corpus(300, words=10)] + [upstream]
+    local = parser.parse_batch(outputs)
+    pooled = parser.parse_batch(outputs, processes=2, chunk_size=64)
+    assert pooled.values == local.values
+    assert [batch_outcome(pooled, i) for i in range(len(outputs) - 1)] == \
+        [batch_outcome(local, i) for i in range(len(outputs) - 1)]
+    assert pooled.errors[-1] is upstream
+
+def test_parse_batch_profiled_once_and_counts_failures():
+    parser = output_parser_registry.build("recommender")
+    profiler.reset()
+    profiler.enable()
+    try:
+        parser.parse_batch(["Choice: A\nExplanation: B", "bad", "bad"])
+    finally:
+        profiler.disable()
+    summary = profiler.summary()
+    assert summary["parser.RecommenderParser.parse_batch"]["count"] == 1
+    assert "parser.RecommenderParser.parse_batch;parser.RecommenderParser.parse" not in summary
+    assert profiler.counters()["parser.failure"] == 2
+    profiler.reset()
+
+def test_unknown_method_rejected():
+    with pytest.raises(ValueError):
+        output_parser_registry.build("useragent").parse_batch([], method="parse_backward")
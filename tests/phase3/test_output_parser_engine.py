@@ -0,0 +1,86 @@
+import random
+import re
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from agentverse.llms.base import LLMResult
+from agentverse.parser import Marker, SectionExtractor, clean_output
+from benchmarks.bench_parsers import LEGACY, make_corpus, outcome
+
+FIRST = "The updated description of the first CD"
+SECOND = "The updated description of the second CD"
+
+# 各种边界情况：缺标记、标记顺序颠倒、段落为空、标记后紧跟连续换行、偏移越过文本结尾
+EDGE_CASES = [
+    "",
+    "   \n\n  ",
+    "Choice: A\nExplanation: B",
+    "Choice:\n\n\nA\n\n\nExplanation:\n\n\nB\n\n",
+    "Explanation: B",
+    "A\nExplanation: B",
+    "Explanation: B\nChoice: A",
+    "Choice: A Explanation:",
+    "ChoiceExplanation",
+    "Choice",
+    "Choice: A\nExplanation: B\nExplanation: C",
+    "Updated Strategy: s\n\n\nmore",
+    "Updated Strategy",
+    "Rank:\n\n1. a\n  \n2. b  \n\n",
+    "Rank:",
+    "no rank here",
+    "My updated self-introduction: hi\n\nthere",
+    "My updated self-introduction",
+    "  keep original  \n\n",
+    f"{FIRST} is: one\n{SECOND} is: two",
+    f"{FIRST}\n\n\n\nabcdef\n{SECOND}\n\n\n\nxyz",
+    f"{SECOND} is: two",
+    f"{FIRST} is: one",
+    f"{SECOND}{FIRST}",
+    f"{FIRST} is:\n{SECOND} is:",
+    f"{SECOND}",
+    "CD Description: d\n\n\ne",
+    "CD Description:",
+    "Speculated CD Reviews: r",
+    "Speculated CD Reviews:",
+]
+
+def random_texts(n, seed=0):
+    rng = random.Random(seed)
+    pieces = ["Choice", "Choice:", "Explanation", "Explanation:", "Rank:", "Updated Strategy",
+              "My updated self-introduction", FIRST, SECOND, "CD Description: ",
+              "Speculated CD Reviews: ", "\n", "\n\n\n", " ", "word", "x:", "\t"]
+    return ["".join(rng.choice(pieces) for _ in range(rng.randint(0, 12))) for _ in range(n)]
+
+def test_clean_output_matches_regex():
+    for text in EDGE_CASES + random_texts(300) + ["a" + "\n" * 50 + "b", "\n x \n\n y \n"]:
+        assert clean_output(text) == re.sub(r"\n+", "\n", text.strip()), repr(text)
+
+@pytest.mark.parametrize("name,legacy,method,parser_cls", LEGACY, ids=[row[0] for row in LEGACY])
+def test_parsers_match_legacy_implementation(name, legacy, method, parser_cls):
+    parse = getattr(parser_cls(), method)
+    for text in EDGE_CASES + random_texts(500) + make_corpus(200, words=30):
+        result = LLMResult(content=text, send_tokens=0, recv_tokens=0, total_tokens=0)
+        assert outcome(lambda _: parse(result), text) == outcome(legacy, text), repr(text)
+
+def test_section_extractor_positions_and_defaults():
+    extractor = SectionExtractor(
+        head=Marker("Head"),
+        body=Marker("Body", len("Body:")),
+        missing=Marker("Nope"),
+    )
+    sections = extractor.scan("  Head one\n\n\nBody: two  ")
+    assert sections.text == "Head one\nBody: two"
+    assert sections.found("head") and sections.found("body") and not sections.found("missing")
+    assert sections.section("head", until="body") == " one\n"
+    assert sections.section("body") == " two"
+    # 未出现的标记从 default 开始取
+    assert sections.section("missing", until="body") == "Head one\n"
+
+def test_markers_sharing_a_prefix():
+    extractor = SectionExtractor(short=Marker("Rank"), long=Marker("Rank:"))
+    sections = extractor.scan("Rank 1 Rank: 2")
+    assert sections.section("short", until="long") == " 1 "
+    assert sections.section("long") == " 2"
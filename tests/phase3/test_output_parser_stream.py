@@ -0,0 +1,71 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from agentverse.llms.base import LLMResult
+from agentverse.parser import OutputParserError
+from agentverse.tasks.recommendation.output_parser import RecommenderParser
+
+def split_every(text, n):
+    return [text[i:i + n] for i in range(0, len(text), n)]
+
+def full_parse(text):
+    return RecommenderParser().parse(LLMResult(content=text, send_tokens=0, recv_tokens=0, total_tokens=0))
+
+@pytest.mark.parametrize("text", [
+    "Thought...\nChoice: Item A\nExplanation: Because it is good.",
+    "\n\nChoice:\n\n  Item B  \n\nExplanation:\nline one\n\nline two",
+    "Choice: X Explanation: inline",
+])
+@pytest.mark.parametrize("chunk", [1, 3, 11, 1000])
+def test_stream_matches_full_parse(text, chunk):
+    parser = RecommenderParser()
+    stream = parser.stream_parser()
+    choices = [c for c in (stream.feed(d) for d in split_every(text, chunk)) if c is not None]
+    expected = full_parse(text)
+    # Choice 只在标记出现时返回一次，且与完整解析一致
+    assert choices == [expected[0]]
+    assert stream.finish() == expected
+
+def test_marker_split_across_chunks():
+    stream = RecommenderParser().stream_parser()
+    assert stream.feed("Choice: A\nExpla") is None
+    assert stream.feed("nation: because") == "A"
+
+def test_choice_undetermined_without_choice_keyword():
+    # 没有 Choice 时 parse 退化为从头取，必须等完整文本
+    text = "Item C\nExplanation: reason"
+    stream = RecommenderParser().stream_parser()
+    assert stream.feed(text) is None
+    assert stream.finish() == full_parse(text) == ("Item C", "reason")
+
+def test_parse_stream_cancels_generator():
+    closed = []
+
+    def deltas():
+        try:
+            yield "Choice: A\n"
+            yield "Explanation: "
+            yield "never read"
+        finally:
+            closed.append(True)
+
+    seen = []
+    gen = deltas()
+    result = RecommenderParser().parse_stream(gen, on_choice=seen.append, cancel_after_choice=True)
+    assert result == ("A", None)
+    assert seen == ["A"] and closed == [True]
+
+def test_parse_stream_raises_like_parse():
+    with pytest.raises(OutputParserError):
+        RecommenderParser().parse_stream(iter(["no markers here"]))
+
+@pytest.mark.asyncio
+async def test_aparse_stream_reads_to_end():
+    async def deltas():
+        for d in ["Choice: A\n", "Explanation: ", "why"]:
+            yield d
+
+    assert await RecommenderParser().aparse_stream(deltas()) == ("A", "why")
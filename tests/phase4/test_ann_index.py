@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from agentverse.ann_index import IVFIndex
+from agentverse.llms.embedding_store import EmbeddingStore
+
+@pytest.fixture
+def clustered():
+    # 20 个簇，每簇 50 个点，便于 IVF 获得高 recall
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(20, 32)).astype(np.float32)
+    vectors = np.repeat(centers, 50, axis=0) + 0.05 * rng.normal(size=(1000, 32)).astype(np.float32)
+    queries = centers + 0.05 * rng.normal(size=(20, 32)).astype(np.float32)
+    return vectors, queries
+
+def test_untrained_index_is_exact():
+    index = IVFIndex(dim=2)
+    index.add(["a", "b", "c"], np.array([[1, 0], [0, 1], [1, 1]], dtype=np.float32))
+    ids, scores = index.search(np.array([[1, 0.1]], dtype=np.float32), k=2)
+    assert ids == [["a", "c"]]
+    assert scores.shape == (1, 2)
+
+def test_full_probe_equals_exact_search(clustered):
+    vectors, queries = clustered
+    index = IVFIndex.build(list(range(len(vectors))), vectors, n_lists=16)
+    report = index.evaluate_recall(queries, k=10, nprobe_values=[16])
+    assert report[0]["recall"] == 1.0
+
+def test_recall_grows_with_nprobe(clustered):
+    vectors, queries = clustered
+    index = IVFIndex.build(list(range(len(vectors))), vectors, n_lists=32)
+    report = index.evaluate_recall(queries, k=10, nprobe_values=[1, 4, 32])
+    recalls = [r["recall"] for r in report]
+    assert recalls == sorted(recalls)
+    assert recalls[-1] == 1.0
+    assert all(r["latency_ms"] >= 0 for r in report)
+
+def test_incremental_insert_replaces_existing_id(clustered):
+    vectors, _ = clustered
+    index = IVFIndex.build(list(range(len(vectors))), vectors, n_lists=16)
+    target = np.zeros((1, 32), dtype=np.float32)
+    target[0, 0] = 1.0
+    # item 0 改写描述后向量变化，旧向量不应再被检索到
+    index.add([0], target)
+    index.add(["new"], -target)
+    assert len(index) == len(vectors) + 1
+    ids, _ = index.search(target, k=1, nprobe=16)
+    assert ids == [[0]]
+    ids, _ = index.search(-target, k=1, nprobe=16)
+    assert ids == [["new"]]
+
+def test_readding_ids_does_not_grow_storage(clustered):
+    vectors, queries = clustered
+    index = IVFIndex.build(list(range(len(vectors))), vectors, n_lists=16)
+    # 每轮改写全部 item 的描述：死行超过一半时自动 compact，行存储保持有界
+    for round_ in range(5):
+        index.add(list(range(len(vectors))), vectors + 0.01 * round_)
+        assert index.dead_rows + len(index) <= 2 * len(vectors)
+    assert len(index) == len(vectors)
+    report = index.evaluate_recall(queries, k=10, nprobe_values=[16])
+    assert report[0]["recall"] == 1.0
+
+def test_explicit_compact_keeps_results(clustered):
+    vectors, queries = clustered
+    index = IVFIndex.build(list(range(len(vectors))), vectors, n_lists=16, compact_threshold=None)
+    index.remove(list(range(0, len(vectors), 2)))
+    index.add([1], vectors[:1])
+    before = index.search(queries, k=5)
+    assert index.dead_rows == len(vectors) // 2 + 1
+    index.compact()
+    assert index.dead_rows == 0 and len(index) == len(vectors) // 2
+    after = index.search(queries, k=5)
+    assert after[0] == before[0]
+    np.testing.assert_allclose(after[1], before[1], atol=1e-6)
+
+def test_save_and_load(clustered, tmp_path):
+    vectors, queries = clustered
+    index = IVFIndex.build([f"item{i}" for i in range(len(vectors))], vectors, n_lists=16, nprobe=4)
+    index.remove(["item0"])
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+
+    loaded = IVFIndex.load(path)
+    assert len(loaded) == len(vectors) - 1
+    loaded_ids, loaded_scores = loaded.search(queries, k=5)
+    ids, scores = index.search(queries, k=5)
+    assert loaded_ids == ids
+    np.testing.assert_allclose(loaded_scores, scores, atol=1e-6)
+
+@pytest.mark.parametrize("threshold", [0.3, None])
+def test_save_and_load_same_path_without_suffix(clustered, tmp_path, threshold):
+    vectors, queries = clustered
+    index = IVFIndex.build(list(range(len(vectors))), vectors, n_lists=16, compact_threshold=threshold)
+    path = str(tmp_path / "index")
+    index.save(path)
+    loaded = IVFIndex.load(path)
+    assert loaded.compact_threshold == threshold
+    assert loaded.search(queries, k=5)[0] == index.search(queries, k=5)[0]
+
+def test_build_from_embedding_store(tmp_path, clustered):
+    vectors, queries = clustered
+    store = EmbeddingStore(str(tmp_path / "store"))
+    texts = [f"CD {i}" for i in range(100)]
+    store.put_many("m", texts, vectors[:100])
+
+    index = IVFIndex.from_store(store, "m", texts, n_lists=4)
+    assert len(index) == 100
+    with pytest.raises(KeyError):
+        IVFIndex.from_store(store, "m", ["unknown"])
@@ -0,0 +1,76 @@
+import pytest
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from agentverse.description_store import DescriptionStore
+from agentverse.llms.base import LLMResult
+from agentverse.tasks.recommendation.output_parser import ItemAgentParser
+
+def make_store(n=10):
+    store = DescriptionStore(["description", "reviews"])
+    store.add_many([f"cd{i}" for i in range(n)], description=[f"描述 {i}" for i in range(n)])
+    return store
+
+def test_set_versions_and_dirty_bitmap():
+    store = make_store(20)
+    assert store.get("cd3", "description") == "描述 3" and store.get("cd3", "reviews") == ""
+    assert store.set("cd3", "description", "新的描述") and store.set("cd17", "description", "x")
+    # 值不变不算修改
+    assert not store.set("cd5", "description", "描述 5")
+    assert store.dirty_rows("description").tolist() == [3, 17]
+    assert store.dirty_rows("reviews").tolist() == []
+    assert store.versions("description")[[3, 5, 17]].tolist() == [1, 0, 1]
+    store.clear_dirty("description", [3])
+    assert store.dirty_rows("description").tolist() == [17]
+    assert store.get_many("description", [3, 17]) == ["新的描述", "x"]
+
+def test_set_many_from_parse_batch():
+    store = make_store(3)
+    outputs = ["CD Description: rock album", RuntimeError("upstream"), "CD Description: jazz album"]
+    outputs = [o if isinstance(o, Exception) else LLMResult(content=o, send_tokens=0, recv_tokens=0, total_tokens=0)
+               for o in outputs]
+    result = ItemAgentParser().parse_batch(outputs, method="parse_pretrain")
+    # 失败位置为 None，保持原值
+    assert store.set_many("description", [0, 1, 2], result.values) == 2
+    assert store.get_many("description", range(3)) == ["rock album", "描述 1", "jazz album"]
+    assert store.render("{key}: {description}{suffix}", [2, 0], suffix="!") == ["cd2: jazz album!", "cd0: rock album!"]
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_snapshot_round_trip(tmp_path, mmap):
+    store = make_store(50)
+    for i in range(0, 50, 7):
+        store.set(f"cd{i}", "reviews", f"评论 {i}" * 3)
+    store.save(str(tmp_path))
+
+    loaded = DescriptionStore.load(str(tmp_path), mmap=mmap)
+    for field in store.fields:
+        assert loaded.get_many(field, range(50)) == store.get_many(field, range(50))
+        assert np.array_equal(loaded.versions(field), store.versions(field))
+        assert np.array_equal(loaded.dirty_rows(field), store.dirty_rows(field))
+    # 加载后的修改与追加不影响磁盘上的快照
+    loaded.set("cd1", "description", "changed")
+    loaded.add("cd50", description="new")
+    assert loaded.get("cd50", "description") == "new"
+    assert DescriptionStore.load(str(tmp_path)).get("cd1", "description") == "描述 1"
+
+def test_compact_reclaims_garbage():
+    store = make_store(5)
+    for i in range(5):
+        store.set(f"cd{i}", "description", "v" * 20)
+    assert store.garbage_ratio() > 0
+    before = store.get_many("description", range(5))
+    store.compact()
+    assert store.garbage_ratio() == 0
+    assert store.get_many("description", range(5)) == before
+    assert store.columns["description"].arena_bytes == 100
+
+def test_rejects_duplicates_and_unknown_fields():
+    store = make_store(2)
+    with pytest.raises(ValueError):
+        store.add("cd0")
+    with pytest.raises(KeyError):
+        store.add("cd9", title="x")
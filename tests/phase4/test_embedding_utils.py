@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from agentverse.embedding_utils import (
+    cosine_similarity_matrix,
+    distances_from_embeddings,
+    indices_of_nearest_neighbors_from_distances,
+    normalize,
+    top_k_nearest_neighbors,
+)
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    queries = rng.normal(size=(5, 16)).astype(np.float32)
+    items = rng.normal(size=(200, 16)).astype(np.float32)
+    return queries, items
+
+def brute_force_top_k(queries, items, k):
+    sims = np.array([
+        [q @ it / (np.linalg.norm(q) * np.linalg.norm(it)) for it in items]
+        for q in queries
+    ])
+    return np.argsort(-sims, axis=1)[:, :k], sims
+
+def test_normalize_keeps_zero_rows():
+    out = normalize([[3.0, 4.0], [0.0, 0.0]])
+    np.testing.assert_allclose(out, [[0.6, 0.8], [0.0, 0.0]])
+
+def test_cosine_similarity_matrix_matches_brute_force(data):
+    queries, items = data
+    _, expected = brute_force_top_k(queries, items, 1)
+    np.testing.assert_allclose(cosine_similarity_matrix(queries, items), expected, atol=1e-5)
+
+def test_distances_compatible_with_legacy_api():
+    query = [1.0, 0.0]
+    embeddings = [[1.0, 0.0], [0.0, 1.0], [-1.0, 0.0]]
+    np.testing.assert_allclose(distances_from_embeddings(query, embeddings), [0.0, 1.0, 2.0], atol=1e-6)
+    np.testing.assert_allclose(distances_from_embeddings(query, embeddings, "L1"), [0.0, 2.0, 2.0])
+    assert list(indices_of_nearest_neighbors_from_distances([0.3, 0.1, 0.2])) == [1, 2, 0]
+    with pytest.raises(ValueError):
+        distances_from_embeddings(query, embeddings, "bogus")
+
+def test_top_k_matches_full_sort(data):
+    queries, items = data
+    expected, _ = brute_force_top_k(queries, items, 10)
+    indices, scores = top_k_nearest_neighbors(queries, items, k=10)
+    np.testing.assert_array_equal(indices, expected)
+    # 分数降序
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+def test_top_k_chunked_matches_in_memory(data, tmp_path):
+    queries, items = data
+    path = tmp_path / "items.f32"
+    items.tofile(path)
+    mapped = np.memmap(path, dtype=np.float32, mode="r", shape=items.shape)
+
+    full_idx, full_scores = top_k_nearest_neighbors(queries, items, k=7)
+    chunk_idx, chunk_scores = top_k_nearest_neighbors(queries, mapped, k=7, chunk_size=33)
+    np.testing.assert_array_equal(chunk_idx, full_idx)
+    np.testing.assert_allclose(chunk_scores, full_scores, atol=1e-6)
+
+def test_top_k_larger_than_item_count():
+    indices, scores = top_k_nearest_neighbors([[1.0, 0.0]], [[0.0, 1.0], [1.0, 0.0]], k=5)
+    assert indices.tolist() == [[1, 0]]
+    assert scores.shape == (1, 2)
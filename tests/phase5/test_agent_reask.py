@@ -0,0 +1,130 @@
+import pytest
+import sys
+import os
+from typing import Dict, List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from agentverse.agents.base import BaseAgent
+from agentverse.agents.reask import RECOMMENDER_CORRECTION, aparse_with_reask, parse_with_reask
+from agentverse.llms.base import BaseLLM, LLMResult
+from agentverse.llms.openai import OpenAIClientConfig, OpenAICompletion
+from agentverse.llms.telemetry import MetricsCollector
+from agentverse.parser import OutputParserError
+from agentverse.tasks.recommendation.output_parser import RecommenderParser
+from benchmarks.mock_openai_server import MockOpenAIServer, MockServerConfig
+
+GOOD = "Choice: A\nExplanation: fits"
+
+class ScriptedLLM(BaseLLM):
+    """每个 prompt 按顺序返回预设输出，记录每批收到的 prompt"""
+    script: Dict[str, List[str]] = {}
+    batches: List[List[str]] = []
+
+    def _reply(self, prompt):
+        base = prompt.replace(RECOMMENDER_CORRECTION, "")
+        outputs = self.script[base]
+        content = outputs.pop(0) if len(outputs) > 1 else outputs[0]
+        if content == "raise":
+            raise RuntimeError("upstream")
+        return LLMResult(content=content, send_tokens=1, recv_tokens=1, total_tokens=2)
+
+    def generate_response(self, prompt):
+        self.batches.append([prompt])
+        return self._reply(prompt)
+
+    async def agenerate_response(self, prompt):
+        return self._reply(prompt)
+
+    async def abatch_generate_response(self, prompts, max_concurrency=None):
+        self.batches.append(list(prompts))
+        results = []
+        for prompt in prompts:
+            try:
+                results.append(self._reply(prompt))
+            except Exception as e:
+                results.append(e)
+        return results
+
+class TextListLLM(BaseLLM):
+    """与 OpenAIChat 一样 agenerate_response 返回文本列表，且没有批量接口"""
+
+    def generate_response(self, prompt):
+        pass
+
+    async def agenerate_response(self, prompt):
+        if prompt == "raise":
+            raise RuntimeError("upstream")
+        return [GOOD if prompt == "ok" else "garbage"]
+
+class DummyAgent(BaseAgent):
+    def step(self, env_description=""):
+        pass
+
+    async def astep(self, env_description=""):
+        pass
+
+    def reset(self):
+        pass
+
+    def add_message_to_memory(self, messages):
+        pass
+
+def make_llm():
+    return ScriptedLLM(script={
+        "p0": [GOOD],
+        "p1": ["garbage", GOOD],
+        "p2": ["garbage"],
+        "p3": ["raise"],
+    })
+
+@pytest.mark.asyncio
+async def test_only_failures_are_reasked_in_batches():
+    llm, metrics = make_llm(), MetricsCollector()
+    result = await aparse_with_reask(
+        llm, RecommenderParser(), ["p0", "p1", "p2", "p3"],
+        max_retry=2, correction=RECOMMENDER_CORRECTION, metrics=metrics,
+    )
+    assert result.values[:2] == [("A", "fits"), ("A", "fits")]
+    assert result.attempts == [1, 2, 3, 1]
+    assert isinstance(result.errors[2], OutputParserError)
+    # 上游异常不重问
+    assert isinstance(result.errors[3], RuntimeError) and result.failed == [2, 3]
+    # 第一轮整批，之后只有失败的那几条，并带上纠正提示
+    assert llm.batches == [
+        ["p0", "p1", "p2", "p3"],
+        ["p1" + RECOMMENDER_CORRECTION, "p2" + RECOMMENDER_CORRECTION],
+        ["p2" + RECOMMENDER_CORRECTION],
+    ]
+    assert metrics.parse_failure_rate(attempt=0) == 0.5
+    assert metrics.parse_failure_rate(parser="RecommenderParser") == 4 / 7
+
+def test_agent_uses_max_retry():
+    agent = DummyAgent(llm=make_llm(), output_parser=RecommenderParser(), prompt_template="", max_retry=1)
+    result = agent.generate_and_parse(["p1", "p2"])
+    assert result.values[0] == ("A", "fits")
+    assert result.attempts == [2, 2] and result.failed == [1]
+
+def test_zero_retry_sends_once():
+    result = parse_with_reask(make_llm(), RecommenderParser(), ["p2"], max_retry=0, metrics=MetricsCollector())
+    assert result.attempts == [1] and result.failed == [0]
+
+@pytest.mark.asyncio
+async def test_fallback_wraps_plain_outputs():
+    result = await aparse_with_reask(
+        TextListLLM(), RecommenderParser(), ["ok", "bad", "raise"], max_retry=0, metrics=MetricsCollector()
+    )
+    assert result.values[0] == ("A", "fits")
+    assert isinstance(result.errors[1], OutputParserError) and isinstance(result.errors[2], RuntimeError)
+
+@pytest.mark.asyncio
+async def test_openai_completion_batch():
+    # 默认配置的 gpt-4o 走 OpenAICompletion，也要有批量接口
+    with MockOpenAIServer(MockServerConfig()) as server:
+        llm = OpenAICompletion(["sk-mock"], client_config=OpenAIClientConfig(api_base=server.base_url))
+        llm.metrics = MetricsCollector()
+        async with llm:
+            result = await aparse_with_reask(llm, RecommenderParser(), ["p0", "p1", "p2"], metrics=MetricsCollector())
+        assert result.failed == [] and result.attempts == [1, 1, 1]
+        assert all(choice.startswith("item-") for choice, _ in result.values)
+        assert server.stats["chat"] == 3
@@ -0,0 +1,176 @@
+import asyncio
+import random
+import pytest
+import sys
+import os
+from typing import List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from agentverse.agents.base import BaseAgent, BatchStep
+from agentverse.agents.scheduler import StepScheduler, llm_concurrency
+from agentverse.llms.base import BaseLLM, LLMResult
+from agentverse.llms.openai import OpenAIChat, OpenAIClientConfig
+from agentverse.llms.telemetry import MetricsCollector
+from agentverse.message import Message
+from agentverse.tasks.recommendation.output_parser import RecommenderParser
+from benchmarks.mock_openai_server import MockOpenAIServer, MockServerConfig
+
+class SlowLLM(BaseLLM):
+    """随机延迟返回，记录同时在途的峰值"""
+    max_concurrency: int = 4
+    in_flight: int = 0
+    peak: int = 0
+    calls: int = 0
+
+    def generate_response(self, prompt):
+        return LLMResult(content=f"Choice: {prompt}\nExplanation: ok", send_tokens=0, recv_tokens=0, total_tokens=0)
+
+    async def agenerate_response(self, prompt):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(random.uniform(0, 0.01))
+            if prompt == "bad":
+                return LLMResult(content="no markers", send_tokens=0, recv_tokens=0, total_tokens=0)
+            return self.generate_response(prompt)
+        finally:
+            self.in_flight -= 1
+
+class PairAgent(BaseAgent, BatchStep):
+    """batched=True 时走 prepare_prompt / finish_step，否则走 astep"""
+    name: str
+    batched: bool = True
+
+    def prepare_prompt(self, env_description=""):
+        return f"{self.name}{env_description}" if self.batched else None
+
+    def finish_step(self, env_description, parsed):
+        return Message(content=parsed[0], sender=self.name)
+
+    def step(self, env_description=""):
+        result = self.llm.generate_response(self.name + env_description)
+        return Message(content=self.output_parser.parse(result)[0], sender=self.name)
+
+    async def astep(self, env_description=""):
+        result = await self.llm.agenerate_response(self.name + env_description)
+        return Message(content=self.output_parser.parse(result)[0], sender=self.name)
+
+    def reset(self):
+        pass
+
+    def add_message_to_memory(self, messages):
+        pass
+
+def make_agents(llm, n):
+    return [
+        PairAgent(llm=llm, output_parser=RecommenderParser(), prompt_template="",
+                  name=f"a{i}", batched=i % 3 != 0, async_mode=i % 5 != 0, max_retry=0)
+        for i in range(n)
+    ]
+
+@pytest.mark.asyncio
+async def test_messages_in_agent_order_under_limit():
+    llm = SlowLLM()
+    agents = make_agents(llm, 40)
+    messages = await StepScheduler().astep(agents, "-x")
+    assert [m.sender for m in messages] == [a.name for a in agents]
+    assert [m.content for m in messages] == [f"{a.name}-x" for a in agents]
+    # async_mode=False 的 agent 在线程里同步调用，不经过 agenerate_response
+    assert llm.calls == sum(1 for a in agents if a.batched or a.async_mode)
+    assert 1 < llm.peak <= llm.max_concurrency
+
+@pytest.mark.asyncio
+async def test_global_limit_and_per_agent_env():
+    llm = SlowLLM(max_concurrency=10)
+    agents = make_agents(llm, 20)
+    envs = [f"-{i}" for i in range(20)]
+    messages = await StepScheduler(max_concurrency=2).astep(agents, envs)
+    assert [m.content for m in messages] == [a.name + e for a, e in zip(agents, envs)]
+    assert llm.peak <= 2
+
+def test_failures_are_isolated():
+    llm = SlowLLM()
+    agents = make_agents(llm, 4)
+    agents[1].name = "bad"
+    results = StepScheduler().step(agents, return_exceptions=True)
+    assert isinstance(results[1], Exception)
+    assert [r.sender for i, r in enumerate(results) if i != 1] == ["a0", "a2", "a3"]
+    with pytest.raises(Exception):
+        StepScheduler().step(agents)
+
+class BrokenParser(RecommenderParser):
+    def parse_batch(self, outputs, method="parse", **kwargs):
+        raise RuntimeError("parser bug")
+
+def test_real_openai_chat_and_group_failures():
+    with MockOpenAIServer(MockServerConfig()) as server:
+        chat = OpenAIChat(["sk-mock"], model="gpt-4", client_config=OpenAIClientConfig(api_base=server.base_url))
+        chat.metrics = MetricsCollector()
+        agents = [
+            PairAgent(llm=chat, output_parser=RecommenderParser(), prompt_template="", name=f"a{i}", max_retry=0)
+            for i in range(6)
+        ]
+        agents[4].output_parser = agents[5].output_parser = BrokenParser()
+        results = StepScheduler().step(agents, return_exceptions=True)
+        chat.close()
+    # agenerate_response 返回文本列表，调度器要经由模型自己的批量接口拿到 LLMResult
+    assert all(m.content.startswith("item-") for m in results[:4])
+    assert chat.metrics.counter("llm_parse_total", parser="RecommenderParser") == 4
+    # 一组整体出错只落在本组的 agent 上
+    assert [str(e) for e in results[4:]] == ["parser bug", "parser bug"]
+    assert server.stats["chat"] == 6
+
+class BatchLLM(SlowLLM):
+    """记录每次批量调用的 prompt 与并发上限；名字以 bad 开头的永远返回无法解析的输出"""
+    batches: List[Tuple[List[str], int]] = []
+
+    async def abatch_generate_response(self, prompts, max_concurrency=None):
+        self.batches.append((list(prompts), max_concurrency))
+        return [
+            LLMResult(content="no markers" if p.startswith("bad") else f"Choice: {p}\nExplanation: ok",
+                      send_tokens=0, recv_tokens=0, total_tokens=0)
+            for p in prompts
+        ]
+
+def test_groups_are_sent_as_one_batch_per_round():
+    llm = BatchLLM(max_concurrency=4)
+    parser = RecommenderParser()
+    agents = [PairAgent(llm=llm, output_parser=parser, prompt_template="", name=f"a{i}") for i in range(10)]
+    messages = StepScheduler().step(agents, "-x")
+    assert [m.content for m in messages] == [f"a{i}-x" for i in range(10)]
+    # 整组一次批量调用，同时在途数受 LLM 的名额限制
+    assert llm.batches == [([f"a{i}-x" for i in range(10)], 4)]
+
+def test_groups_split_by_parser_instance_and_keep_own_retry():
+    llm = BatchLLM()
+    shared, other = RecommenderParser(), RecommenderParser()
+    agents = [
+        PairAgent(llm=llm, output_parser=shared, prompt_template="", name="bad0", max_retry=0),
+        PairAgent(llm=llm, output_parser=shared, prompt_template="", name="bad2", max_retry=2),
+        PairAgent(llm=llm, output_parser=other, prompt_template="", name="ok"),
+    ]
+    results = StepScheduler().step(agents, return_exceptions=True)
+    assert results[2].content == "ok"
+    # 按解析器实例分成两组（两组并发，批次先后不定）；首轮之后只有 max_retry=2 的继续重问
+    batches = sorted(prompts for prompts, _ in llm.batches)
+    assert batches == [["bad0", "bad2"], ["bad2"], ["bad2"], ["ok"]]
+    assert isinstance(results[0], Exception) and isinstance(results[1], Exception)
+
+def test_batch_hooks_must_be_implemented_together():
+    class HalfAgent(PairAgent):
+        finish_step = BatchStep.finish_step
+
+    with pytest.raises(TypeError):
+        HalfAgent(llm=SlowLLM(), output_parser=RecommenderParser(), prompt_template="", name="h")
+
+def test_llm_concurrency_respects_rpm():
+    class Pool:
+        rpm, multi_key, api_key_list = 3, True, ["k1", "k2"]
+
+    class Limited(SlowLLM):
+        pool: Optional[object] = None
+
+    assert llm_concurrency(Limited(max_concurrency=32, pool=Pool())) == 6
+    assert llm_concurrency(SlowLLM(max_concurrency=5)) == 5
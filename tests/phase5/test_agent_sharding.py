@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+import pytest
+from typing import Any, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from agentverse.agents import agent_registry
+from agentverse.agents.base import BaseAgent
+from agentverse.agents.sharding import AgentSpec, ShardedRunner, split_budget
+from agentverse.llms import llm_registry
+from agentverse.llms.base import BaseLLM, LLMResult
+from agentverse.message import Message
+
+import agentverse.tasks.recommendation.output_parser  # noqa: F401  注册解析器
+
+@llm_registry.register("sharding-test-llm")
+class EchoLLM(BaseLLM):
+    rpm: Optional[int] = None
+    max_concurrency: int = 8
+
+    def generate_response(self, prompt):
+        return LLMResult(content=prompt, send_tokens=0, recv_tokens=0, total_tokens=0)
+
+    async def agenerate_response(self, prompt):
+        return self.generate_response(prompt)
+
+@llm_registry.register("sharding-test-bad-close-llm")
+class BadCloseLLM(EchoLLM):
+    async def aclose(self):
+        raise RuntimeError("close failed")
+
+@agent_registry.register("sharding-test-agent")
+class CounterAgent(BaseAgent):
+    name: str
+    description: str = ""
+
+    def step(self, env_description=""):
+        pass
+
+    async def astep(self, env_description=""):
+        result = await self.llm.agenerate_response(env_description)
+        self.description += result.content
+        # 带上进程号、分到的 RPM 与 LLM 实例，验证分片与预算
+        return Message(content=f"{os.getpid()}|{self.llm.rpm}|{id(self.llm)}", sender=self.name)
+
+    def reset(self):
+        pass
+
+    def add_message_to_memory(self, messages):
+        pass
+
+@agent_registry.register("sharding-test-lock-agent")
+class LockAgent(CounterAgent):
+    # 不能 pickle 的字段，get_state 的回复无法发回主进程
+    lock: Any = None
+
+    def model_post_init(self, __context):
+        self.lock = threading.Lock()
+
+def make_specs(n):
+    llm = {"llm_type": "sharding-test-llm", "rpm": 100}
+    return [
+        AgentSpec(agent_type="sharding-test-agent", llm=llm, output_parser="recommender",
+                  kwargs={"name": f"a{i}", "prompt_template": ""})
+        for i in range(n)
+    ]
+
+def test_split_budget():
+    assert split_budget({"llm_type": "x", "rpm": 10, "tpm": 0, "max_concurrency": 3}, 4) == \
+        {"llm_type": "x", "rpm": 2, "tpm": 0, "max_concurrency": 1}
+
+def test_sharded_step_and_epoch_merge():
+    with ShardedRunner(make_specs(5), processes=2) as runner:
+        messages = runner.step([f"e{i}" for i in range(5)])
+        assert [m.sender for m in messages] == [f"a{i}" for i in range(5)]
+        info = [m.content.split("|") for m in messages]
+        # 轮转分片：偶数下标与奇数下标各在一个进程，每个进程一个 LLM，预算减半
+        assert len({pid for pid, _, _ in info}) == 2
+        assert info[0][0] == info[2][0] == info[4][0] != info[1][0]
+        assert {(pid, llm) for pid, _, llm in info} == {(info[0][0], info[0][2]), (info[1][0], info[1][2])}
+        assert {rpm for _, rpm, _ in info} == {"50"}
+
+        runner.step("+")
+        states = runner.end_epoch()
+        assert [s["description"] for s in states] == [f"e{i}+" for i in range(5)]
+        assert runner.epoch == 1
+
+        runner.load_states({3: {"description": "reset"}})
+        runner.step("!")
+        assert runner.end_epoch()[3]["description"] == "reset!"
+
+def test_build_errors_surface_in_parent():
+    spec = AgentSpec(agent_type="not-registered", llm={"llm_type": "sharding-test-llm"}, output_parser="recommender")
+    with pytest.raises(ValueError):
+        ShardedRunner([spec], processes=1)
+
+def test_unpicklable_state_reports_error_and_worker_survives():
+    llm = {"llm_type": "sharding-test-llm"}
+    spec = AgentSpec(agent_type="sharding-test-lock-agent", llm=llm, output_parser="recommender",
+                     kwargs={"name": "a0", "prompt_template": ""})
+    with ShardedRunner([spec], processes=1) as runner:
+        with pytest.raises(Exception, match="pickle"):
+            runner.end_epoch()
+        assert runner.step("e")[0].sender == "a0"
+
+def test_close_errors_still_shut_down_workers():
+    spec = AgentSpec(agent_type="sharding-test-agent", llm={"llm_type": "sharding-test-bad-close-llm"},
+                     output_parser="recommender", kwargs={"name": "a0", "prompt_template": ""})
+    runner = ShardedRunner([spec], processes=1)
+    procs = list(runner._procs)
+    runner.close()
+    # LLM 关闭失败也要回复并退出，不能留在命令循环里
+    assert all(p.exitcode == 0 for p in procs)
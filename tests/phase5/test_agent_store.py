@@ -0,0 +1,121 @@
+import pytest
+import sys
+import os
+from typing import Set
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from agentverse.agents.base import BaseAgent
+from agentverse.agents.store import AgentStore
+from agentverse.llms.base import BaseLLM
+from agentverse.llms.openai import OpenAIChat
+from agentverse.llms.telemetry import MetricsCollector
+from agentverse.memory import SlidingWindowMemory
+from agentverse.tasks.recommendation.output_parser import UserAgentParser
+
+class NullLLM(BaseLLM):
+    def generate_response(self, prompt):
+        pass
+
+    async def agenerate_response(self, prompt):
+        pass
+
+class UserAgent(BaseAgent):
+    name: str
+    description: str = ""
+    receiver: Set[str] = set()
+    memory: SlidingWindowMemory
+
+    def step(self, env_description=""):
+        pass
+
+    async def astep(self, env_description=""):
+        pass
+
+    def reset(self):
+        pass
+
+    def add_message_to_memory(self, messages):
+        self.memory.add_message(messages)
+
+LLM, PARSER = NullLLM(), UserAgentParser()
+
+def factory(key):
+    return UserAgent(llm=LLM, output_parser=PARSER, prompt_template="", name=key, memory=SlidingWindowMemory())
+
+def test_lru_paging_round_trip(tmp_path):
+    metrics = MetricsCollector()
+    store = AgentStore(str(tmp_path), capacity=2, factory=factory, metrics=metrics)
+    for key in ["u1", "u2", "u3"]:
+        agent = store[key]
+        agent.description = f"likes {key}"
+        agent.set_receiver({key, "all"})
+        agent.add_message_to_memory([f"{key} met item"])
+    # u1 最久未使用，已换出到磁盘
+    assert store.resident == 2 and "u1" in store
+    assert store.stats()["page_outs"] == 1 and store.stats()["created"] == 3
+
+    u1 = store["u1"]
+    assert u1.description == "likes u1" and u1.receiver == {"u1", "all"}
+    assert u1.memory.to_string() == "u1 met item"
+    # 共享的 llm / parser 不落盘，由 factory 重新注入
+    assert u1.llm is LLM and u1.output_parser is PARSER
+    stats = store.stats()
+    assert stats["page_ins"] == 1 and stats["page_outs"] == 2
+    assert metrics.counter("agent_store_page_ins_total") == 1
+    store.close()
+
+def test_checkout_pins_agents(tmp_path):
+    store = AgentStore(str(tmp_path), capacity=1, factory=factory, metrics=None)
+    with store.checkout(["a", "b"]) as (a, b):
+        # 被钉住的 agent 不会被换出，使用中的修改不会丢
+        store.get("c")
+        a.description, b.description = "A", "B"
+        assert store.stats()["pinned"] == 2
+    assert store.resident == 1
+    assert store["a"].description == "A" and store["b"].description == "B"
+    store.close()
+
+def test_get_many_counts_unique_hits_and_keeps_returned_agents(tmp_path):
+    metrics = MetricsCollector()
+    store = AgentStore(str(tmp_path), capacity=2, factory=factory, metrics=metrics)
+    store.get_many(["a", "a", "b"])
+    # 重复的 key 只新建一次，不算命中
+    assert store.stats()["created"] == 2 and store.stats()["hits"] == 0
+    assert store.get_many(["a", "a"])[0] is store["a"]
+    assert store.stats()["hits"] == 2
+    # 超过 capacity 的批次会让返回的 agent 被立即换出，直接拒绝
+    with pytest.raises(ValueError):
+        store.get_many(["a", "b", "c"])
+    with store.checkout(["a", "b"]):
+        # 其它 agent 被钉住时，本次返回的 agent 也不会被换出
+        c = store["c"]
+        c.description = "kept"
+        assert store.get_many(["c"])[0] is c
+    assert store["c"].description == "kept"
+    store.close()
+
+def test_reopen_after_close(tmp_path):
+    with AgentStore(str(tmp_path), capacity=10, factory=factory, metrics=None) as store:
+        store["u"].description = "persisted"
+    reopened = AgentStore(str(tmp_path), capacity=10, factory=factory, metrics=None)
+    assert reopened["u"].description == "persisted"
+    assert reopened.stats()["page_ins"] == 1
+    reopened.close()
+
+def test_memory_llm_handles_are_not_pickled(tmp_path):
+    # OpenAIChat 的连接池持有锁，不能 pickle；换出时不写出，换入时沿用 factory 注入的
+    chat = OpenAIChat(["sk-test"], model="gpt-4")
+
+    def chat_factory(key):
+        return UserAgent(llm=chat, output_parser=PARSER, prompt_template="", name=key,
+                         memory=SlidingWindowMemory(llm=chat))
+
+    store = AgentStore(str(tmp_path), capacity=1, factory=chat_factory, metrics=None)
+    store["a"].add_message_to_memory(["a met item"])
+    store["b"].add_message_to_memory(["b met item"])
+    a = store["a"]
+    assert a.memory.to_string() == "a met item" and a.memory.llm is chat
+    assert store.stats()["page_outs"] == 2
+    store.close()
+    chat.close()
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import pytest
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from agentverse.llms.base import BaseLLM, LLMResult
+from agentverse.memory.retrieval import RetrievalMemory
+from agentverse.memory.sliding_window import SlidingWindowMemory
+
+class SlowLLM(BaseLLM):
+    """异步调用前先让出事件循环，制造并发摘要"""
+    calls: int = 0
+
+    def generate_response(self, prompt):
+        raise AssertionError("异步路径不应调用同步接口")
+
+    async def agenerate_response(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return LLMResult(content=f"summary {self.calls}", send_tokens=0, recv_tokens=0, total_tokens=0)
+
+class CountEmbedder(BaseLLM):
+    def generate_response(self, prompt, as_array=False):
+        pass
+
+    async def agenerate_response(self, sentences):
+        pass
+
+    async def agenerate_array(self, sentences):
+        await asyncio.sleep(0.01)
+        matrix = np.array([[len(s), 1.0] for s in sentences], dtype=np.float32)
+        return LLMResult(content=matrix, send_tokens=0, recv_tokens=0, total_tokens=0)
+
+@pytest.mark.asyncio
+async def test_concurrent_writers_keep_every_message():
+    memory = SlidingWindowMemory(max_tokens=10 ** 6)
+
+    async def writer(w):
+        for i in range(50):
+            await memory.aadd_message([f"{w}-{i}"])
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(writer(w) for w in range(20)))
+    # 同步读也会先并入收件箱
+    lines = memory.to_string().split("\n")
+    assert len(lines) == 1000
+    for w in range(20):
+        assert [l for l in lines if l.startswith(f"{w}-")] == [f"{w}-{i}" for i in range(50)]
+
+def test_threads_write_while_reading():
+    memory = SlidingWindowMemory(max_tokens=10 ** 6)
+    stop = threading.Event()
+
+    def writer(w):
+        async def run():
+            for i in range(300):
+                await memory.aadd_message([f"{w}-{i}"])
+        asyncio.run(run())
+
+    def reader():
+        while not stop.is_set():
+            memory.to_string()
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    writers = [threading.Thread(target=writer, args=(w,)) for w in range(8)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    stop.set()
+    for t in readers:
+        t.join()
+    assert len(memory.to_string().split("\n")) == 2400
+
+@pytest.mark.asyncio
+async def test_sync_write_after_async_write_keeps_order():
+    memory = SlidingWindowMemory(max_tokens=10 ** 6)
+    await memory.aadd_message(["a"])
+    await memory.aadd_message(["b"])
+    memory.add_message(["c"])
+    assert memory.messages == ["a", "b", "c"]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("memory_type", [SlidingWindowMemory, RetrievalMemory])
+async def test_reset_drops_queued_messages(memory_type):
+    memory = memory_type()
+    await memory.aadd_message(["stale"])
+    memory.reset()
+    memory.add_message(["fresh"])
+    assert memory.to_string() == "fresh"
+
+@pytest.mark.asyncio
+async def test_concurrent_ato_string_first_summary_wins():
+    llm = SlowLLM()
+    memory = SlidingWindowMemory(llm=llm, max_tokens=20)
+    await memory.aadd_message(["a" * 40, "b" * 40, "c" * 40])
+    first, second = await asyncio.gather(memory.ato_string(), memory.ato_string())
+    # 两个请求基于同一份待摘要内容各发一次，只有先返回的那个生效（summary_version 只加 1）
+    assert llm.calls == 2
+    assert memory.pending == [] and memory.summary_version == 1
+    assert first == second == memory.summary + "\n" + "c" * 40
+
+class FailingLLM(SlowLLM):
+    async def agenerate_response(self, prompt):
+        raise RuntimeError("upstream")
+
+@pytest.mark.asyncio
+async def test_ato_string_raises_async_error_without_sync_fallback():
+    memory = SlidingWindowMemory(llm=FailingLLM(), max_tokens=20)
+    await memory.aadd_message(["a" * 40, "b" * 40, "c" * 40])
+    # SlowLLM.generate_response 被调用时抛 AssertionError
+    with pytest.raises(RuntimeError, match="upstream"):
+        await memory.ato_string()
+    assert memory.pending == ["a" * 40, "b" * 40]
+
+@pytest.mark.asyncio
+async def test_ato_string_summarizes_messages_written_while_waiting():
+    llm = SlowLLM()
+    memory = SlidingWindowMemory(llm=llm, max_tokens=20)
+    await memory.aadd_message(["a" * 40, "b" * 40, "c" * 40])
+
+    async def late_writer():
+        await asyncio.sleep(0.005)
+        await memory.aadd_message(["d" * 40, "e" * 40])
+
+    text, _ = await asyncio.gather(memory.ato_string(), late_writer())
+    # 等待期间写入并被移出的消息也在异步路径上摘要
+    assert memory.pending == [] and llm.calls == 2
+    assert text == memory.summary + "\n" + "e" * 40
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_embed_each_message_once():
+    memory = RetrievalMemory(embedder=CountEmbedder(), k=2)
+    await memory.aadd_message(["x", "yy", "zzz"])
+    results = await asyncio.gather(*(memory.ato_string(query="q" * n) for n in range(1, 5)))
+    assert memory.embedded == 3 and memory.vectors.shape == (3, 2)
+    assert all(len(r.split("\n")) == 2 for r in results)
+
+@pytest.mark.asyncio
+async def test_pickle_keeps_queued_messages():
+    # ShardedRunner 在进程间传递 agent 状态，记忆需要能 pickle
+    import pickle
+    memory = SlidingWindowMemory()
+    await memory.aadd_message(["a", "b"])
+    assert pickle.loads(pickle.dumps(memory)).to_string() == "a\nb"
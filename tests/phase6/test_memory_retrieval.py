@@ -0,0 +1,75 @@
+import pytest
+import sys
+import os
+from typing import List
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from agentverse.llms.base import BaseLLM, LLMResult
+from agentverse.memory import memory_registry
+
+TOPICS = ["jazz", "rock", "folk", "metal"]
+
+class TopicEmbedder(BaseLLM):
+    """按主题词出现次数编码，末尾加一维常数避免零向量；记录每次请求的条数"""
+    calls: List[int] = []
+
+    def _embed(self, texts):
+        self.calls.append(len(texts))
+        matrix = np.array([[t.count(w) for w in TOPICS] + [1] for t in texts], dtype=np.float32)
+        return LLMResult(content=matrix, send_tokens=0, recv_tokens=0, total_tokens=0)
+
+    def generate_response(self, prompt, as_array=False):
+        return self._embed([prompt])
+
+    def generate_batch_response(self, sentences, as_array=False):
+        return self._embed(sentences)
+
+    async def agenerate_response(self, sentences):
+        pass
+
+    async def agenerate_array(self, sentences):
+        return self._embed(sentences)
+
+def query(topic):
+    return " ".join([topic] * 10)
+
+def make_memory(**kwargs):
+    memory = memory_registry.build("retrieval", embedder=TopicEmbedder(), initial_capacity=2, **kwargs)
+    # 主题词重复越多与 query 越接近：第 i 条重复 i // 4 + 1 次
+    memory.add_message([f"{i}: " + " ".join([TOPICS[i % 4]] * (i // 4 + 1)) for i in range(12)])
+    return memory
+
+def test_deferred_batched_embedding():
+    memory = make_memory()
+    assert memory.embedded == 0 and memory.embedder.calls == []
+    memory.retrieve(query("jazz"))
+    # 12 条消息与 query 合成一次请求，矩阵扩容后行数正确
+    assert memory.embedder.calls == [13] and memory.embedded == 12
+    memory.add_message(["12: jazz"])
+    memory.retrieve(query("rock"))
+    assert memory.embedder.calls == [13, 2]
+    assert memory.vectors.shape == (13, 5)
+    assert np.allclose(np.linalg.norm(memory.vectors, axis=1), 1.0)
+
+def test_top_k_in_write_order_within_budget():
+    memory = make_memory(k=3)
+    assert memory.to_string(query=query("rock")) == "1: rock\n5: rock rock\n9: rock rock rock"
+    # 相关性 10 > 6 > 2，token 数 5 / 3 / 2
+    assert memory.retrieve(query("folk"), max_tokens=8) == ["6: folk folk", "10: folk folk folk"]
+    # 装不下第二相关的，跳过后继续装更短的
+    assert memory.retrieve(query("folk"), max_tokens=7) == ["2: folk", "10: folk folk folk"]
+
+def test_recent_without_query_needs_no_embedding():
+    memory = make_memory(max_tokens=11)
+    assert memory.to_string() == "10: folk folk folk\n11: metal metal metal"
+    assert memory.embedder.calls == []
+
+@pytest.mark.asyncio
+async def test_aretrieve_and_reset():
+    memory = make_memory(k=2)
+    assert await memory.aretrieve(query("metal")) == ["7: metal metal", "11: metal metal metal"]
+    memory.reset()
+    assert memory.embedded == 0 and await memory.aretrieve(query("metal")) == []
@@ -0,0 +1,94 @@
+import pytest
+import sys
+import os
+from typing import List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from agentverse.llms.base import BaseLLM, LLMResult
+from agentverse.memory import memory_registry
+from agentverse.memory.sliding_window import SlidingWindowMemory, asummarize
+
+class SummaryLLM(BaseLLM):
+    """摘要为新并入消息的首字母拼接，记录每批 prompt 数"""
+    batches: List[int] = []
+
+    def _summarize(self, prompt):
+        newer = prompt.split("Newer interactions:\n")[1].split("\n\n")[0]
+        previous = prompt.split("Previous summary:\n")[1].split("\n\n")[0]
+        previous = "" if previous == "(none)" else previous
+        return LLMResult(content="\n\n " + previous + "".join(m[0] for m in newer.split("\n")) + " \n",
+                         send_tokens=0, recv_tokens=0, total_tokens=0)
+
+    def generate_response(self, prompt):
+        self.batches.append(1)
+        return self._summarize(prompt)
+
+    async def agenerate_response(self, prompt):
+        return self._summarize(prompt)
+
+    async def abatch_generate_response(self, prompts, max_concurrency=None):
+        self.batches.append(len(prompts))
+        return [self._summarize(p) for p in prompts]
+
+class TextListLLM(BaseLLM):
+    """与 OpenAIChat 一样 agenerate_response 返回文本列表，且没有批量接口"""
+
+    def generate_response(self, prompt):
+        return SummaryLLM._summarize(self, prompt)
+
+    async def agenerate_response(self, prompt):
+        return [SummaryLLM._summarize(self, prompt).content]
+
+def msg(letter):
+    # 40 个字符，按 estimate_tokens 计 10 个 token
+    return letter * 40
+
+def test_registered_and_pure_window_without_llm():
+    memory = memory_registry.build("sliding_window", max_tokens=35)
+    memory.add_message([msg(c) for c in "abcdef"])
+    # 超出预算后一次移出到 max_tokens * low_watermark 以下
+    assert memory.messages == [msg("f")] and memory.window_tokens == 10
+    assert memory.summary == "" and memory.pending == []
+
+def test_fold_into_summary_and_cache():
+    llm = SummaryLLM()
+    memory = SlidingWindowMemory(llm=llm, max_tokens=35)
+    memory.add_message([msg(c) for c in "abcd"])
+    # 写入时只移出，不调用 LLM
+    assert memory.pending == [msg(c) for c in "abc"] and llm.batches == []
+    text = memory.to_string()
+    # 摘要经 parse_summary 清洗，放在窗口之前
+    assert text == "abc\n" + msg("d")
+    assert memory.pending == [] and llm.batches == [1]
+    # 内容未变时直接返回缓存
+    assert memory.to_string() is text
+    memory.add_message(["z"])
+    assert memory.to_string() is not text and memory.to_string().endswith("z")
+
+@pytest.mark.asyncio
+async def test_batched_summarization_across_memories():
+    llm = SummaryLLM()
+    memories = [SlidingWindowMemory(llm=llm, max_tokens=25) for _ in range(5)]
+    for i, memory in enumerate(memories):
+        memory.add_message([msg(c) for c in "pqrs"[: 1 + i % 4]])
+    assert [len(m.pending) for m in memories] == [0, 0, 2, 3, 0]
+    assert await asummarize(memories) == []
+    # 两个需要摘要的记忆合成一批
+    assert llm.batches == [2]
+    assert [m.summary for m in memories] == ["", "", "pq", "pqr", ""]
+    assert all(not m.pending for m in memories)
+
+@pytest.mark.asyncio
+async def test_summarize_without_batch_interface():
+    memory = SlidingWindowMemory(llm=TextListLLM(), max_tokens=25)
+    memory.add_message([msg(c) for c in "xyz"])
+    assert await asummarize([memory]) == []
+    assert memory.summary == "xy" and memory.pending == []
+
+def test_reset():
+    memory = SlidingWindowMemory(llm=SummaryLLM(), max_tokens=20)
+    memory.add_message([msg(c) for c in "abc"])
+    memory.to_string()
+    memory.reset()
+    assert memory.to_string() == "" and memory.window_tokens == 0